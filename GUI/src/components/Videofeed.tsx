@@ -1,51 +1,60 @@
 import { useState, useEffect } from "react";
 import { useNavigate } from "react-router-dom";
 
+type GestureEvent = {
+  gesture?: string;
+  direction?: string;
+  stable_gesture?: string;
+  motion_detected?: string;
+  motion_last_detected?: string;
+  confidence?: number;
+  action_last?: string | null;
+  latency_ms?: number | null;
+};
+
 const VideoFeed = () => {
   const [gesture, setGesture] = useState<string>("No gesture detected");
   const [motionDetected, setMotionDetected] = useState<string>("N/A");
   const [motionLastDetected, setMotionLastDetected] = useState<string>("N/A");
   const [direction, setDirection] = useState<string>("N/A");
-  const [loading, setLoading] = useState<boolean>(false); // Keep loading to control state
+  const [stableGesture, setStableGesture] = useState<string>("N/A");
+  const [confidence, setConfidence] = useState<number>(0);
+  const [lastAction, setLastAction] = useState<string>("N/A");
+  const [latency, setLatency] = useState<number | null>(null);
+  const [connected, setConnected] = useState<boolean>(false);
 
   const navigate = useNavigate();
   const handleNavigate = () => {
-    navigate("/"); 
+    navigate("/");
   };
 
   useEffect(() => {
-    // Function to fetch gesture data
-    const fetchGesture = async () => {
-      try {
-        setLoading(true); // Set loading to true when fetching
-        const response = await fetch(
-          "http://localhost:5000/recognize_gesture",
-          {
-            method: "POST",
-          }
-        );
-        const data = await response.json();
-        
-        // Set the data from the response
-        setGesture(data.gesture || gesture); // Retain previous gesture if no new gesture is fetched
-        setMotionDetected(data.motion_detected || motionDetected);
-        setMotionLastDetected(data.motion_last_detected || motionLastDetected);
-        setDirection(data.direction || direction);
-        setLoading(false); // Set loading to false after fetching is complete
-      } catch (error) {
-        console.error("Error fetching gesture:", error);
-        setLoading(false); // Ensure loading is set to false if an error occurs
-      }
+    // The server pushes an event whenever the gesture, direction or motion changes
+    // or an action fires, the current state is sent right after connecting
+    const events = new EventSource("http://localhost:5000/events");
+
+    const handleEvent = (event: MessageEvent) => {
+      const data: GestureEvent = JSON.parse(event.data);
+      // Retain the previous values for the fields an event does not carry
+      setGesture((previous) => data.gesture || previous);
+      setMotionDetected((previous) => data.motion_detected || previous);
+      setMotionLastDetected((previous) => data.motion_last_detected || previous);
+      setDirection((previous) => data.direction || previous);
+      setStableGesture((previous) => data.stable_gesture || previous);
+      setConfidence((previous) => data.confidence ?? previous);
+      setLastAction((previous) => data.action_last || previous);
+      setLatency((previous) => data.latency_ms ?? previous);
     };
 
-    // Set up polling every 500ms to keep fetching gesture data
-    const intervalId = setInterval(() => {
-      fetchGesture();
-    }, 500);
+    events.addEventListener("gesture", handleEvent);
+    events.addEventListener("action", handleEvent);
+    events.onopen = () => setConnected(true);
+    // EventSource reconnects on its own, only show that the feed is down meanwhile
+    events.onerror = () => setConnected(false);
 
-    // Cleanup function to stop polling when the component unmounts
-    return () => clearInterval(intervalId);
-  }, [gesture, motionDetected, motionLastDetected, direction]); // Depend on state to retain last values
+    // Close the stream when the component unmounts
+    return () => events.close();
+  }, []);
 
   return (
     <div>
@@ -57,14 +66,19 @@ const VideoFeed = () => {
       /> */}
       <div>
         <h1>Gesture Recognition</h1>
-       
+
           <div className="flex flex-row gap-4">
             <p>Detected Gesture: {gesture}</p>
+            <p>Confidence: {Math.round(confidence * 100)}%</p>
+            <p>Held Gesture: {stableGesture}</p>
             <p>Motion Detected: {motionDetected}</p>
             <p>Last Motion Detected: {motionLastDetected}</p>
             <p>Direction: {direction}</p>
+            <p>Last Action: {lastAction}</p>
+            <p>Latency: {latency !== null ? `${latency.toFixed(0)} ms` : "N/A"}</p>
           </div>
-       
+          {!connected && <p>Connecting to the recognition server...</p>}
+
       </div>
       <button
         onClick={handleNavigate}
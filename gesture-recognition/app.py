@@ -1,11 +1,19 @@
 import json
+import math
 from flask import Flask, Response, jsonify, request
 import cv2
 import threading
 from flask_cors import CORS
 import base64
 
-from opencvExp import gesture_recognition_loop
+from engineFunc import RecognitionEngine
+from configFunc import ConfigStore
+from systemActions import MAPPING_GROUPS, validate_mappings
+from streamFunc import EventBroadcaster, FrameBroadcaster
+from skinFunc import DEFAULT_SKIN_BOUNDS, get_skin_classifier, set_skin_bounds
+from morphFunc import DEFAULT_MORPHOLOGY_PRESET, MORPHOLOGY_PRESETS
+from lightingFunc import DEFAULT_LIGHTING_NORMALIZATION, LIGHTING_NORMALIZATIONS
+from handsFunc import DOMINANT_HANDS
 app = Flask(__name__)
 CORS(app)
 
@@ -25,11 +33,53 @@ def save_json_file(file_path, data):
         json.dump(data, file, indent=4)
 
 # Load settings and gesture mappings
-settings = load_json_file(SETTINGS_FILE, {
+DEFAULT_SETTINGS = {
     "camera": 0,
     "color_mode": "HSV",
-    "bounded_ratio": 0.25
-})
+    "bounded_ratio": 0.25,
+    "tracking_mode": False,
+    "tracking_keyframe_interval": 15,
+    "tracking_search_margin": 0.5,
+    "tracking_max_area_change": 2.0,
+    "processing_scale": 1.0,
+    "adaptive_skin": False,
+    "adaptive_skin_decay": 0.05,
+    "morphology_preset": DEFAULT_MORPHOLOGY_PRESET,
+    "lighting_normalization": DEFAULT_LIGHTING_NORMALIZATION,
+    "motion_gate": False,
+    "motion_gate_idle_after": 3.0,
+    "motion_gate_idle_fps": 5,
+    "background_subtraction": False,
+    "background_learning_rate": 0.02,
+    "gesture_vote_window": 5,
+    "gesture_min_votes": 3,
+    "gesture_enter_dwell": 0.1,
+    "gesture_exit_dwell": 0.25,
+    "gesture_repeat_on_hold": True,
+    "gesture_repeat_delay": 0.5,
+    "multi_hand": False,
+    "max_hands": 2,
+    "dominant_hand": "first",
+    "stream_quality": 80,
+    "stream_max_width": 640,
+    "skin_bounds": {mode: [lower, upper] for mode, (lower, upper) in DEFAULT_SKIN_BOUNDS.items()}
+}
+# Settings saved by an older version may miss the newer keys
+settings = {**DEFAULT_SETTINGS, **load_json_file(SETTINGS_FILE, DEFAULT_SETTINGS)}
+set_skin_bounds(settings["skin_bounds"])
+
+def warm_skin_classifier(color_mode):
+    """Builds (or loads from the disk cache) the skin lookup table of a colour mode off the request thread."""
+    threading.Thread(target=get_skin_classifier, args=(color_mode,), daemon=True).start()
+
+warm_skin_classifier(settings["color_mode"])
+
+# Annotated frames of the recognition loop, streamed to every /video_feed client
+video_broadcaster = FrameBroadcaster(settings["stream_quality"], settings["stream_max_width"])
+# Changes of gesture, direction and motion and the fired actions, pushed to every /events client
+gesture_events = EventBroadcaster()
+# Owns the camera and runs the recognition loop in the background, started by the GUI or /engine/start
+engine = RecognitionEngine(video_broadcaster, gesture_events)
 
 mappings = load_json_file(GESTURE_MAPPINGS_FILE, {
     "gestureMappings": {
@@ -55,36 +105,269 @@ mappings = load_json_file(GESTURE_MAPPINGS_FILE, {
     }
 })
 
-gesture_mappings = {"gestureMappings": mappings.get("gestureMappings", {})}
-direction_mappings = {"directionMappings": mappings.get("directionMappings", {})}
-motion_mappings = {"motionMappings": mappings.get("motionMappings", {})}
+# Settings and mappings shared with the running recognition loop, which applies their changes between two frames
+config = ConfigStore(settings, {
+    "gestureMappings": mappings.get("gestureMappings", {}),
+    "directionMappings": mappings.get("directionMappings", {}),
+    "motionMappings": mappings.get("motionMappings", {}),
+    # only in the file when the other hands of multi hand mode were given actions
+    **{group: mappings[group] for group in MAPPING_GROUPS if group.startswith("secondary") and group in mappings},
+})
+# Entries bound to unknown actions stay unmapped, the file may have been edited by hand
+for error in validate_mappings(config.mappings()):
+    print(f"Ignoring gesture mapping, {error}")
+
+def loop_arguments():
+    """The gesture_recognition_loop arguments, the settings and mappings are read from the config store."""
+    # the engine runs on a background thread, HighGUI windows and keys only work on the main one.
+    # It only recognizes and publishes, actions (of every hand) are fired by the noGUI.py loop
+    return dict(debug=False, frame=None, config=config)
 
 @app.route('/recognize_gesture', methods=['POST'])
 def recognize_gesture():
-    """Process the current frame for gesture recognition."""
+    """Return the latest recognition result, the engine is started on the first call unless it was stopped."""
     try:
-        print(gesture_mappings)
-        gesture_recognition_loop(safe_to_run=True, debug=True, frame=None, current_camera=settings["camera"], color_mode=settings["color_mode"], increased_ratio=settings["bounded_ratio"],gesture_mappings=gesture_mappings['gestureMappings'],direction_mappings=direction_mappings['directionMappings'],motion_mappings=motion_mappings['motionMappings'])
+        if not engine.is_running() and not engine.stopped_by_user:
+            engine.start(**loop_arguments())
+        return jsonify({**engine.state.snapshot(), "running": engine.is_running()})
     except Exception as e:
         print(f"Error processing gesture: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
+@app.route('/engine/start', methods=['POST'])
+def start_engine():
+    """Start the recognition engine with the current settings and mappings."""
+    try:
+        if not engine.start(**loop_arguments()):
+            return jsonify({"message": "Engine already running", "status": engine.status()}), 409
+        return jsonify({"message": "Engine started", "status": engine.status()})
+    except Exception as e:
+        print(f"Error starting the engine: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/engine/stop', methods=['POST'])
+def stop_engine():
+    """Stop the recognition engine and release the camera."""
+    try:
+        engine.stop()
+        return jsonify({"message": "Engine stopped", "status": engine.status()})
+    except Exception as e:
+        print(f"Error stopping the engine: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/engine/status', methods=['GET'])
+def engine_status():
+    """Whether the engine is running, since when, and its last error."""
+    try:
+        return jsonify(engine.status())
+    except Exception as e:
+        print(f"Error retrieving the engine status: {e}")
+        return jsonify({"error": "Internal server error"}), 500
+
+@app.route('/video_feed')
+def video_feed():
+    """MJPEG stream of the annotated frames of the running recognition loop."""
+    return Response(video_broadcaster.stream(), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/events')
+def events():
+    """Server-Sent Events stream of the recognition, starts the engine like /recognize_gesture does.
+
+    Event types: "gesture" when the gesture, direction or motion changes, "action" when an action
+    fires and "engine" when the engine starts or stops. The current state is sent on connect.
+    """
+    if not engine.is_running() and not engine.stopped_by_user:
+        engine.start(**loop_arguments())
+    initial = [EventBroadcaster.format("gesture", {**engine.state.snapshot(), "running": engine.is_running()})]
+    return Response(gesture_events.stream(initial), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+class InvalidSetting(ValueError):
+    """A value of an /update-settings request that cannot be applied, answered with a 400."""
+
+
+def number_setting(data, key, cast=float, minimum=None, maximum=None, above=None):
+    """
+    Reads a numeric setting of an /update-settings request.
+
+    Args:
+        data: The request body.
+        key: The setting.
+        cast: int or float, an int setting rejects fractions.
+        minimum, maximum: Inclusive bounds, None for unbounded.
+        above: Exclusive lower bound, for settings that must be positive.
+
+    Returns:
+        int or float: The value.
+
+    Raises:
+        InvalidSetting: The value is not a finite number of that type or out of range.
+    """
+    value = data[key]
+    kind = "an integer" if cast is int else "a number"
+    ## true / false are ints in Python, not numbers of the client
+    if isinstance(value, bool):
+        raise InvalidSetting(f"{key} must be {kind}")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise InvalidSetting(f"{key} must be {kind}")
+    if not math.isfinite(number) or (cast is int and not number.is_integer()):
+        raise InvalidSetting(f"{key} must be {kind}")
+    number = cast(number)
+
+    lower = f"({above}" if above is not None else f"[{minimum}" if minimum is not None else None
+    upper = f"{maximum}]" if maximum is not None else None
+    if ((above is not None and number <= above) or (minimum is not None and number < minimum)
+            or (maximum is not None and number > maximum)):
+        if lower and upper:
+            raise InvalidSetting(f"{key} must be in {lower}, {upper}")
+        if upper:
+            raise InvalidSetting(f"{key} must be at most {maximum}")
+        raise InvalidSetting(f"{key} must be {'greater than ' + str(above) if above is not None else 'at least ' + str(minimum)}")
+    return number
+
+
+def bool_setting(data, key):
+    """Reads a true / false setting, anything else (e.g. the string "false") is rejected."""
+    if not isinstance(data[key], bool):
+        raise InvalidSetting(f"{key} must be true or false")
+    return data[key]
+
+
+def choice_setting(data, key, choices):
+    """Reads a setting that must be one of choices."""
+    if data[key] not in choices:
+        raise InvalidSetting(f"{key} must be one of {list(choices)}")
+    return data[key]
+
+
+def skin_bounds_setting(data):
+    """
+    Reads skin_bounds: {mode: [lower, upper]} with three channel values in [0, 255] each.
+
+    Returns:
+        dict: The current bounds with the given modes replaced.
+    """
+    bounds = data['skin_bounds']
+    if not isinstance(bounds, dict):
+        raise InvalidSetting("skin_bounds must be an object of colour modes")
+    current = dict(config.settings()["skin_bounds"])
+    for mode, value in bounds.items():
+        if mode not in DEFAULT_SKIN_BOUNDS:
+            raise InvalidSetting(f"skin_bounds: unknown colour mode {mode}, must be one of {list(DEFAULT_SKIN_BOUNDS)}")
+        if not isinstance(value, (list, tuple)) or len(value) != 2 or not all(
+                isinstance(bound, (list, tuple)) and len(bound) == 3 and all(
+                    isinstance(channel, int) and not isinstance(channel, bool) and 0 <= channel <= 255 for channel in bound)
+                for bound in value):
+            raise InvalidSetting(f"skin_bounds.{mode} must be [lower, upper], each three integers in [0, 255]")
+        lower, upper = value
+        if any(low > high for low, high in zip(lower, upper)):
+            raise InvalidSetting(f"skin_bounds.{mode}: lower must not be above upper")
+        current[mode] = [list(lower), list(upper)]
+    return current
+
+
+def read_settings(data):
+    """
+    Validates every setting of an /update-settings request.
+
+    Returns:
+        dict: The changes, only once all of them are valid.
+
+    Raises:
+        InvalidSetting: The first invalid setting.
+    """
+    changes = {}
+    if 'camera' in data:
+        changes["camera"] = number_setting(data, 'camera', int, minimum=0)
+    if 'color_mode' in data:
+        ## the GUI and the older settings files spell YCrCb in several ways
+        if not isinstance(data['color_mode'], str) or data['color_mode'].lower() not in (mode.lower() for mode in DEFAULT_SKIN_BOUNDS):
+            raise InvalidSetting(f"color_mode must be one of {list(DEFAULT_SKIN_BOUNDS)}")
+        changes["color_mode"] = data['color_mode']
+    if 'bounded_ratio' in data:
+        changes["bounded_ratio"] = number_setting(data, 'bounded_ratio', minimum=0)
+    if 'tracking_mode' in data:
+        changes["tracking_mode"] = bool_setting(data, 'tracking_mode')
+    if 'tracking_keyframe_interval' in data:
+        changes["tracking_keyframe_interval"] = number_setting(data, 'tracking_keyframe_interval', int, minimum=1)
+    if 'tracking_search_margin' in data:
+        changes["tracking_search_margin"] = number_setting(data, 'tracking_search_margin', minimum=0)
+    if 'tracking_max_area_change' in data:
+        changes["tracking_max_area_change"] = number_setting(data, 'tracking_max_area_change', minimum=1)
+    if 'processing_scale' in data:
+        changes["processing_scale"] = number_setting(data, 'processing_scale', above=0, maximum=1)
+    if 'adaptive_skin' in data:
+        changes["adaptive_skin"] = bool_setting(data, 'adaptive_skin')
+    if 'adaptive_skin_decay' in data:
+        changes["adaptive_skin_decay"] = number_setting(data, 'adaptive_skin_decay', above=0, maximum=1)
+    if 'morphology_preset' in data:
+        changes["morphology_preset"] = choice_setting(data, 'morphology_preset', MORPHOLOGY_PRESETS)
+    if 'lighting_normalization' in data:
+        changes["lighting_normalization"] = choice_setting(data, 'lighting_normalization', LIGHTING_NORMALIZATIONS)
+    if 'motion_gate' in data:
+        changes["motion_gate"] = bool_setting(data, 'motion_gate')
+    if 'motion_gate_idle_after' in data:
+        changes["motion_gate_idle_after"] = number_setting(data, 'motion_gate_idle_after', minimum=0)
+    if 'motion_gate_idle_fps' in data:
+        changes["motion_gate_idle_fps"] = number_setting(data, 'motion_gate_idle_fps', above=0)
+    if 'background_subtraction' in data:
+        changes["background_subtraction"] = bool_setting(data, 'background_subtraction')
+    if 'background_learning_rate' in data:
+        changes["background_learning_rate"] = number_setting(data, 'background_learning_rate', above=0, maximum=1)
+    if 'gesture_vote_window' in data:
+        changes["gesture_vote_window"] = number_setting(data, 'gesture_vote_window', int, minimum=1)
+    if 'gesture_min_votes' in data:
+        changes["gesture_min_votes"] = number_setting(data, 'gesture_min_votes', int, minimum=1)
+    if 'gesture_vote_window' in data or 'gesture_min_votes' in data:
+        ## either one may change alone, they are checked against each other
+        votes = {**config.settings(), **changes}
+        if votes["gesture_min_votes"] > votes["gesture_vote_window"]:
+            raise InvalidSetting("gesture_min_votes must be in [1, gesture_vote_window]")
+    for key in ('gesture_enter_dwell', 'gesture_exit_dwell', 'gesture_repeat_delay'):
+        if key in data:
+            changes[key] = number_setting(data, key, minimum=0)
+    if 'gesture_repeat_on_hold' in data:
+        changes["gesture_repeat_on_hold"] = bool_setting(data, 'gesture_repeat_on_hold')
+    if 'multi_hand' in data:
+        changes["multi_hand"] = bool_setting(data, 'multi_hand')
+    if 'max_hands' in data:
+        changes["max_hands"] = number_setting(data, 'max_hands', int, minimum=1)
+    if 'dominant_hand' in data:
+        changes["dominant_hand"] = choice_setting(data, 'dominant_hand', DOMINANT_HANDS)
+    if 'stream_quality' in data:
+        changes["stream_quality"] = number_setting(data, 'stream_quality', int, minimum=0, maximum=100)
+    if 'stream_max_width' in data:
+        changes["stream_max_width"] = number_setting(data, 'stream_max_width', int, minimum=0)
+    if 'skin_bounds' in data:
+        changes["skin_bounds"] = skin_bounds_setting(data)
+    return changes
+
 @app.route('/update-settings', methods=['POST'])
 def update_system_settings():
     """Update the system settings based on the request."""
-    global settings
     try:
         if request.content_type != 'application/json':
             return jsonify({"error": "Unsupported Media Type: Content-Type must be application/json"}), 415
 
-        data = request.get_json()  
-        
-        if 'camera' in data:
-            settings["camera"] = data['camera']
-        if 'color_mode' in data:
-            settings["color_mode"] = data['color_mode']
-        if 'bounded_ratio' in data:
-            settings["bounded_ratio"] = data['bounded_ratio']
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "The settings must be a JSON object"}), 400
+        # everything is validated first, then applied at once so the loop never sees half of an update
+        try:
+            changes = read_settings(data)
+        except InvalidSetting as e:
+            return jsonify({"error": str(e)}), 400
+
+        settings = config.update_settings(changes)
+        if 'stream_quality' in data or 'stream_max_width' in data:
+            video_broadcaster.configure(settings["stream_quality"], settings["stream_max_width"])
+        if 'skin_bounds' in data:
+            set_skin_bounds(settings["skin_bounds"])
+        # The skin lookup table depends on the colour mode and its bounds, have it ready for the next frames
+        if 'color_mode' in data or 'skin_bounds' in data:
+            warm_skin_classifier(settings["color_mode"])
 
         # print(f"Updated settings: Camera: {settings["camera"]}, Color Mode: {settings["color_mode"]}, Bounded Ratio: {settings["bounded_ratio"]}")
 
@@ -101,44 +384,39 @@ def update_system_settings():
 def get_system_settings():
     """Retrieve the current system settings."""
     try:
-        return jsonify(settings)
+        return jsonify(config.settings())
     except Exception as e:
         print(f"Error retrieving settings: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route('/update-gesture-mappings', methods=['POST'])
 def update_gesture_mappings():
-    """Update the gesture mappings based on the request."""
-    global gesture_mappings, direction_mappings, motion_mappings
+    """Update the gesture mappings based on the request, the running loop picks them up on its next frame."""
     try:
         if request.content_type != 'application/json':
             return jsonify({"error": "Unsupported Media Type: Content-Type must be application/json"}), 415
 
         data = request.get_json()  
         
-        if 'gestureMappings' in data:
-            gesture_mappings['gestureMappings'] = data['gestureMappings']
-        if 'directionMappings' in data:
-            direction_mappings['directionMappings'] = data['directionMappings']
-        if 'motionMappings' in data:
-            motion_mappings['motionMappings'] = data['motionMappings']
+        changes = {group: data[group] for group in MAPPING_GROUPS if group in data}
+        # every action is checked against the registry before anything is applied
+        errors = validate_mappings(changes)
+        if errors:
+            return jsonify({"error": "Invalid gesture mappings", "details": errors}), 400
+        mappings = config.update_mappings(changes)
         
-        print(f"Updated gesture mappings: {gesture_mappings}")
-        print(f"Updated direction mappings: {direction_mappings}")
-        print(f"Updated motion mappings: {motion_mappings}")
+        print(f"Updated gesture mappings: {mappings['gestureMappings']}")
+        print(f"Updated direction mappings: {mappings['directionMappings']}")
+        print(f"Updated motion mappings: {mappings['motionMappings']}")
 
         # Save the updated mappings to the configuration file
-        save_json_file(GESTURE_MAPPINGS_FILE, {
-            "gestureMappings": gesture_mappings['gestureMappings'],
-            "directionMappings": direction_mappings['directionMappings'],
-            "motionMappings": motion_mappings['motionMappings']
-        })
+        save_json_file(GESTURE_MAPPINGS_FILE, mappings)
         
         return jsonify({
             "message": "Gesture mappings updated successfully",
-            "gesture_mappings": gesture_mappings,
-            "direction_mappings": direction_mappings,
-            "motion_mappings": motion_mappings
+            "gesture_mappings": {"gestureMappings": mappings['gestureMappings']},
+            "direction_mappings": {"directionMappings": mappings['directionMappings']},
+            "motion_mappings": {"motionMappings": mappings['motionMappings']}
         })
     except Exception as e:
         print(f"Error updating gesture mappings: {e}")
@@ -148,18 +426,14 @@ def update_gesture_mappings():
 def get_gesture_mappings():
     """Retrieve the current gesture mappings."""
     try:
-        return jsonify({
-            "gestureMappings": gesture_mappings['gestureMappings'],
-            "directionMappings": direction_mappings['directionMappings'],
-            "motionMappings": motion_mappings['motionMappings']
-        })
+        return jsonify(config.mappings())
     except Exception as e:
         print(f"Error retrieving gesture mappings: {e}")
         return jsonify({"error": "Internal server error"}), 500
 
 @app.route('/')
 def index():
-    return "API is running. Endpoints: /video_feed, /recognize_gesture, /update-settings, /settings, /update-gesture-mappings, /gesture-mappings"
+    return "API is running. Endpoints: /video_feed, /events, /recognize_gesture, /engine/start, /engine/stop, /engine/status, /update-settings, /settings, /update-gesture-mappings, /gesture-mappings"
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,1061 @@
+"""
+Micro benchmarks and parity checks for the recognition pipeline.
+
+Usage:
+    python benchmarks.py defects [--contours 200] [--repeat 20]
+    python benchmarks.py fingertips [--sizes 200 500 1000 2000] [--repeat 200]
+    python benchmarks.py scales [--video path] [--frames 60] [--scales 1.0 0.5 0.25]
+    python benchmarks.py adaptive [--video path] [--frames 120] [--no-desk]
+    python benchmarks.py morphology [--video path] [--frames 60] [--repeat 5]
+    python benchmarks.py clahe [--video path] [--frames 30] [--repeat 5] [--workers 1 2 4]
+    python benchmarks.py temporal [--video path] [--frames 120]
+    python benchmarks.py background [--frames 120]
+    python benchmarks.py actions [--frames 200] [--fps 30] [--key-delay 0.1]
+    python benchmarks.py motion [--trials 200] [--fps 30]
+    python benchmarks.py tracking [--frames 300] [--speed 25] [--margin 0.5] [--dropout-every 40]
+    python benchmarks.py stabilizer [--seconds 600] [--fps 30] [--flicker 0.3]
+    python benchmarks.py contours [--frames 300] [--blobs 20] [--jagged] [--repeat 5]
+"""
+import argparse
+import contextlib
+import io
+import time
+from math import ceil
+
+import cv2
+import numpy as np
+
+from customAlgos import ContourFeatures, classify_gesture, convexity_defects, detect_pointing_direction, is_rock_on, largest_contour
+from lightingFunc import DEFAULT_LIGHTING_NORMALIZATION, LIGHTING_NORMALIZATIONS, ClaheEngine, TemporalNormalizer, set_lighting_normalization
+from motionFunc import MotionRecognizer
+from morphFunc import DEFAULT_MORPHOLOGY_PRESET, MORPHOLOGY_PRESETS, get_morphology_pipeline, set_morphology_preset
+from sceneFunc import BackgroundModel
+from segmenterFunc import RoiTracker, enhance_frame, grow_box, locate_hand, normalize_lighting_histogram, preprocess_frame, segmenter
+from stabilizerFunc import GestureStabilizer
+from skinFunc import AdaptiveSkinModel, get_skin_classifier, set_adaptive_model
+from systemActions import ACTIONS, ActionDispatcher, RecordingBackend
+
+
+def synthetic_hand_mask(rng, shape=(480, 640), fingers=None, jagged=True):
+    """
+    Draws a random hand-like blob (palm + fingers) on a black mask.
+
+    Args:
+        rng: numpy random Generator.
+        shape: (rows, cols) of the mask.
+        fingers: Number of extended fingers, random if None.
+        jagged: Roughen the edges so the contour has as many points as a real mask.
+
+    Returns:
+        numpy.ndarray: uint8 mask with the hand in 255.
+    """
+    rows, cols = shape
+    mask = np.zeros(shape, np.uint8)
+    cx = int(rng.integers(cols // 4, 3 * cols // 4))
+    cy = int(rng.integers(rows // 2, 3 * rows // 4))
+    radius = int(rng.integers(min(shape) // 10, min(shape) // 6))
+    cv2.ellipse(mask, (cx, cy), (radius, int(radius * 1.2)), 0, 0, 360, 255, -1)
+
+    if fingers is None:
+        fingers = int(rng.integers(0, 6))
+    for angle in np.linspace(-70, 70, 5)[:fingers] + rng.normal(0, 5, fingers):
+        length = radius * rng.uniform(1.6, 2.3)
+        theta = np.deg2rad(angle - 90)
+        tip = (int(cx + length * np.cos(theta)), int(cy + length * np.sin(theta)))
+        cv2.line(mask, (cx, cy), tip, 255, max(4, radius // 4))
+
+    if not jagged:
+        return mask
+
+    ## jagged edges so the contours have a realistic number of points
+    noise = rng.random(shape) < 0.02
+    mask[cv2.dilate(noise.astype(np.uint8), None) > 0] ^= 255
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    return mask
+
+
+def synthetic_frame(rng, shape=(480, 640), fingers=None):
+    """A BGR frame with a skin coloured synthetic hand on a noisy background."""
+    mask = synthetic_hand_mask(rng, shape, fingers, jagged=False)
+    ## a smooth, mostly non skin coloured background so histogram equalization behaves like on a real scene
+    coarse = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+    coarse[..., 0] = np.maximum(coarse[..., 0], 150)
+    frame = cv2.resize(coarse, (shape[1], shape[0]), interpolation=cv2.INTER_CUBIC)
+    ## shaded skin
+    shade = cv2.resize(rng.uniform(0.8, 1.1, (4, 4)), (shape[1], shape[0]), interpolation=cv2.INTER_CUBIC)
+    skin = np.clip(np.array([120, 150, 200]) * shade[..., None], 0, 255).astype(np.uint8)
+    frame[mask > 0] = skin[mask > 0]
+    return cv2.add(frame, rng.integers(0, 12, frame.shape, dtype=np.uint8))
+
+
+## gesture expected for a synthetic hand with i extended fingers
+SYNTHETIC_GESTURES = ["fist", "oneFinger", "twoFinger", "threeFinger", "fourFinger", "fiveFinger"]
+
+
+def load_frames(video, count, seed=0):
+    """
+    Reads count frames from a video file, or makes synthetic ones when no video is given.
+
+    Returns:
+        tuple: (frames, expected gestures), the expected gestures are None for a video.
+    """
+    if video is None:
+        rng = np.random.default_rng(seed)
+        frames = [synthetic_frame(rng, fingers=i % 6) for i in range(count)]
+        return frames, [SYNTHETIC_GESTURES[i % 6] for i in range(count)]
+    cap = cv2.VideoCapture(video)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.flip(frame, 1))
+    cap.release()
+    return frames, None
+
+
+def dense_contour(mask):
+    """Largest contour of a mask with every boundary point (CHAIN_APPROX_NONE)."""
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+    if not contours:
+        return None
+    return max(contours, key=cv2.contourArea)
+
+
+def synthetic_contours(count, seed=0, shape=(480, 640)):
+    rng = np.random.default_rng(seed)
+    contours = []
+    while len(contours) < count:
+        contour = dense_contour(synthetic_hand_mask(rng, shape))
+        if contour is not None and len(contour) > 3:
+            contours.append(contour)
+    return contours
+
+
+def convexity_defects_reference(points, hull):
+    """The original point by point implementation of customAlgos.convexity_defects, kept for parity checks."""
+    points = np.array(points, dtype=np.int32)
+    hull = np.array(hull, dtype=np.int32)
+    npoints = len(points)
+    hpoints = len(hull)
+    if npoints <= 3 or hpoints < 3:
+        return []
+
+    defects = []
+    rev_orientation = ((hull[1] > hull[0]) + (hull[2] > hull[1]) + (hull[0] > hull[2])) != 2
+    hcurr = hull[0] if rev_orientation else hull[-1]
+
+    for i in range(hpoints):
+        hnext = hull[hpoints - i - 1] if rev_orientation else hull[i]
+        pt0 = points[hcurr]
+        pt1 = points[hnext]
+        dx0 = pt1[0] - pt0[0]
+        dy0 = pt1[1] - pt0[1]
+        scale = 0. if dx0 == 0 and dy0 == 0 else 1. / np.sqrt(dx0 * dx0 + dy0 * dy0)
+
+        defect_deepest_point = -1
+        defect_depth = 0
+        is_defect = False
+        j = hcurr
+        while True:
+            j += 1
+            if j >= npoints:
+                j = 0
+            if j == hnext:
+                break
+            dx = points[j][0] - pt0[0]
+            dy = points[j][1] - pt0[1]
+            dist = abs(-dy0 * dx + dx0 * dy) * scale
+            if dist > defect_depth:
+                defect_depth = dist
+                defect_deepest_point = j
+                is_defect = True
+
+        if is_defect:
+            defects.append([hcurr, hnext, defect_deepest_point, int(round(defect_depth * 256))])
+        hcurr = hnext
+
+    return defects
+
+
+def resample_contour(contour, npoints):
+    """Picks npoints evenly spaced points of a contour, keeping their order."""
+    idx = np.linspace(0, len(contour) - 1, npoints).astype(np.int64)
+    return np.ascontiguousarray(contour[idx])
+
+
+def pointing_direction_reference(contour):
+    """The original per point fingertip search of customAlgos.detect_pointing_direction (without drawing)."""
+    moments = cv2.moments(contour)
+    if moments['m00'] == 0:
+        return None
+    palm_center = (int(moments['m10'] / moments['m00']), int(moments['m01'] / moments['m00']))
+    fingertip = None
+    max_distance = 0
+    for point in contour:
+        point = tuple(point[0])
+        distance = np.linalg.norm(np.array(point) - np.array(palm_center))
+        if distance > max_distance:
+            max_distance = distance
+            fingertip = point
+    if not fingertip:
+        return None
+    pointing_vector = np.array([fingertip[0] - palm_center[0], fingertip[1] - palm_center[1]])
+    pointing_vector = pointing_vector / np.linalg.norm(pointing_vector)
+    if abs(pointing_vector[0]) > abs(pointing_vector[1]):
+        return "oneFingerRight" if pointing_vector[0] > 0 else "oneFingerLeft"
+    return "oneFingerDown" if pointing_vector[1] > 0 else "oneFingerUp"
+
+
+def rock_on_reference(contour, count_defects):
+    """The original per point search of customAlgos.is_rock_on (without drawing)."""
+    if count_defects > 1:
+        return False
+    moments = cv2.moments(contour)
+    cx, cy = int(moments['m10'] / moments['m00']), int(moments['m01'] / moments['m00'])
+    palm_center = (cx, cy)
+    left_furthest = right_furthest = None
+    max_left_dist = max_right_dist = 0
+    for point in contour:
+        point = tuple(point[0])
+        dist_to_palm = np.linalg.norm(np.array(point) - np.array(palm_center))
+        if point[1] < palm_center[1]:
+            if point[0] < cx:
+                if dist_to_palm > max_left_dist:
+                    max_left_dist = dist_to_palm
+                    left_furthest = point
+            else:
+                if dist_to_palm > max_right_dist:
+                    max_right_dist = dist_to_palm
+                    right_furthest = point
+    return bool(
+        left_furthest and right_furthest
+        and max_left_dist > 100 and max_right_dist > 100
+        and left_furthest[0] < palm_center[0]
+        and right_furthest[0] > palm_center[0]
+        and right_furthest[0] - left_furthest[0] > 100
+        and right_furthest[1] > left_furthest[1]
+    )
+
+
+def time_call(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def bench_defects(args):
+    """Checks convexity_defects against cv2.convexityDefects and the original loop, then times all three."""
+    contours = synthetic_contours(args.contours, args.seed)
+    hulls = [cv2.convexHull(c, returnPoints=False) for c in contours]
+
+    mismatches_cv2 = 0
+    mismatches_reference = 0
+    for contour, hull in zip(contours, hulls):
+        ours = convexity_defects(contour[:, 0, :], hull.flatten())
+        expected = cv2.convexityDefects(contour, hull)
+        expected = [] if expected is None else expected.reshape(-1, 4).tolist()
+        reference = [[int(v) for v in d] for d in convexity_defects_reference(contour[:, 0, :], hull.flatten())]
+        ## OpenCV does not report defects of depth 0, neither do we
+        if sorted(ours) != sorted(expected):
+            mismatches_cv2 += 1
+        if ours != reference:
+            mismatches_reference += 1
+
+    points = np.array([len(c) for c in contours])
+    print(f"{len(contours)} contours, {points.min()}-{points.max()} points (mean {points.mean():.0f})")
+    print(f"parity vs cv2.convexityDefects: {len(contours) - mismatches_cv2}/{len(contours)} identical")
+    print(f"parity vs original loop:        {len(contours) - mismatches_reference}/{len(contours)} identical")
+
+    sample = contours[: min(len(contours), 50)]
+    sample_hulls = hulls[: len(sample)]
+    timings = {
+        "vectorized": lambda: [convexity_defects(c[:, 0, :], h.flatten()) for c, h in zip(sample, sample_hulls)],
+        "original loop": lambda: [convexity_defects_reference(c[:, 0, :], h.flatten()) for c, h in zip(sample, sample_hulls)],
+        "cv2.convexityDefects": lambda: [cv2.convexityDefects(c, h) for c, h in zip(sample, sample_hulls)],
+    }
+    for name, func in timings.items():
+        per_call = time_call(func, args.repeat) / len(sample)
+        print(f"{name:>22}: {per_call * 1e6:9.1f} us per contour")
+
+    return mismatches_cv2 == 0 and mismatches_reference == 0
+
+
+def bench_fingertips(args):
+    """Times detect_pointing_direction + is_rock_on against the original per point loops."""
+    ## drawn at twice the camera resolution so every contour can be resampled down to the largest size
+    contours = [c for c in synthetic_contours(40, args.seed, shape=(960, 1280)) if len(c) >= max(args.sizes)]
+    if not contours:
+        print("No synthetic contour is large enough, lower --sizes")
+        return False
+
+    mismatches = 0
+    for size in args.sizes:
+        sample = [resample_contour(c, size) for c in contours[:20]]
+        for contour in sample:
+            features = ContourFeatures(contour)
+            if detect_pointing_direction(features) != pointing_direction_reference(contour):
+                mismatches += 1
+            ## count_defects 0 so the rock on search always runs
+            if is_rock_on(features, 0) != rock_on_reference(contour, 0):
+                mismatches += 1
+
+        ## a fresh ContourFeatures per call so nothing is served from the cache of a previous run
+        vectorized = lambda: [(detect_pointing_direction(f), is_rock_on(f, 0)) for f in map(ContourFeatures, sample)]
+        original = lambda: [(pointing_direction_reference(c), rock_on_reference(c, 0)) for c in sample]
+        new_time = time_call(vectorized, args.repeat) / len(sample)
+        old_time = time_call(original, max(1, args.repeat // 20)) / len(sample)
+        print(f"{size:5d} points: vectorized {new_time * 1e6:8.1f} us, original loop {old_time * 1e6:9.1f} us per call ({old_time / new_time:.0f}x)")
+
+    print(f"results identical to the original loops: {'yes' if mismatches == 0 else f'no, {mismatches} mismatches'}")
+    return mismatches == 0
+
+
+def recognize_gesture(frame, processing_scale):
+    """The segmentation and classification steps of gesture_recognition_loop for one frame."""
+    frame = cv2.GaussianBlur(frame, (5, 5), 0)
+    thresh = segmenter(frame, "HSV", 0.25, None, processing_scale)[0]
+    contour = largest_contour(thresh)
+    if contour is None:
+        return "UNKNOWN"
+    features = ContourFeatures(contour)
+    if features.palm_center is None:
+        return "UNKNOWN"
+    gesture, _ = classify_gesture(features)
+    return gesture
+
+
+def bench_scales(args):
+    """Reports fps and gesture agreement with full resolution for each processing_scale."""
+    frames, expected = load_frames(args.video, args.frames, args.seed)
+    if not frames:
+        print(f"Could not read frames from {args.video}")
+        return False
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}")
+
+    reference = None
+    for scale in [1.0] + [s for s in args.scales if s != 1.0]:
+        ## the segmenter is chatty, keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            gestures = [recognize_gesture(frame, scale) for frame in frames]
+            elapsed = time.perf_counter() - start
+        if reference is None:
+            reference = gestures
+        agreement = sum(a == b for a, b in zip(gestures, reference)) / len(frames)
+        report = f"scale {scale:4.2f}: {len(frames) / elapsed:6.1f} fps, gesture agreement with full resolution {agreement * 100:5.1f}%"
+        if expected is not None:
+            accuracy = sum(a == b for a, b in zip(gestures, expected)) / len(frames)
+            report += f", matches the synthetic finger count {accuracy * 100:5.1f}%"
+        print(report)
+    return True
+
+
+def add_desk(frame):
+    """Covers the bottom of a frame with a wood coloured desk that the generic skin bounds accept."""
+    frame = frame.copy()
+    frame[int(frame.shape[0] * 0.85):] = (60, 110, 170)
+    return frame
+
+
+def bench_adaptive(args):
+    """Learns an AdaptiveSkinModel on the first half of the frames and compares it to the bounds alone on the rest."""
+    frames, expected = load_frames(args.video, args.frames, args.seed)
+    if not frames:
+        print(f"Could not read frames from {args.video}")
+        return False
+    if not args.no_desk:
+        frames = [add_desk(frame) for frame in frames]
+    half = len(frames) // 2
+
+    model = AdaptiveSkinModel(min_updates=1, path=None)
+    set_adaptive_model(model)
+    ## same rule as gesture_recognition_loop: learn from frames with a recognised gesture
+    with contextlib.redirect_stdout(io.StringIO()):
+        for frame in frames[:half]:
+            results = segmenter(cv2.GaussianBlur(frame, (5, 5), 0), "HSV")
+            if len(results) == 2:
+                model.miss()
+                continue
+            thresh, _, preprocessed, hand_mask, _ = results
+            contour = largest_contour(thresh)
+            if contour is not None and classify_gesture(ContourFeatures(contour))[0] != "UNKNOWN":
+                model.update(preprocessed, hand_mask)
+    model.rebuild()
+    print(f"learned from {model.updates} of {half} frames")
+
+    for name, active in (("bounds only", None), ("adaptive", model)):
+        set_adaptive_model(active)
+        coverage = candidates = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            gestures = [recognize_gesture(frame, 1.0) for frame in frames[half:]]
+            elapsed = time.perf_counter() - start
+            for frame in frames[half:]:
+                mask = preprocess_frame(cv2.GaussianBlur(frame, (5, 5), 0), "HSV")[1]
+                coverage += np.count_nonzero(mask) / mask.size
+                candidates += len(cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0])
+        count = len(frames) - half
+        report = f"{name:12s}: {count / elapsed:6.1f} fps, candidate mask {coverage / count * 100:5.1f}% of the frame, {candidates / count:4.1f} candidate contours"
+        if expected is not None:
+            accuracy = sum(a == b for a, b in zip(gestures, expected[half:])) / count
+            report += f", matches the synthetic finger count {accuracy * 100:5.1f}%"
+        print(report)
+    set_adaptive_model(None)
+    return True
+
+
+def mask_iou(a, b):
+    """Intersection over union of the non zero pixels of two masks."""
+    a, b = a > 0, b > 0
+    union = np.count_nonzero(a | b)
+    return np.count_nonzero(a & b) / union if union else 1.0
+
+
+def original_frame_chain(mask):
+    """The clean-up of the frame skin mask as preprocess_frame did it before the morphology pipelines."""
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (11, 11))
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=4)
+    return cv2.GaussianBlur(mask, (5, 5), 0)
+
+
+def original_hand_chain(mask):
+    """The clean-up of the hand skin mask as skin_thresholding did it before the morphology pipelines."""
+    mask = cv2.medianBlur(mask, 5)
+    mask = cv2.GaussianBlur(mask, (5, 5), 0)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_ERODE, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5)), iterations=2)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_DILATE, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5)), iterations=3)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_ERODE, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5)), iterations=2)
+    return cv2.morphologyEx(mask, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)), iterations=6)
+
+
+def bench_morphology(args):
+    """Compares every morphology preset with the original chains: mask IoU, time and gestures."""
+    frames, expected = load_frames(args.video, args.frames, args.seed)
+    if not frames:
+        print(f"Could not read frames from {args.video}")
+        return False
+
+    ## raw skin masks of the frames and of the hand ROIs, as the pipelines receive them
+    frame_masks, hand_masks = [], []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for frame in frames:
+            results = segmenter(cv2.GaussianBlur(frame, (5, 5), 0), "HSV")
+            frame_masks.append(get_skin_classifier("HSV").classify(enhance_frame(cv2.GaussianBlur(frame, (5, 5), 0))))
+            if len(results) != 2:
+                hand_masks.append(get_skin_classifier("Ycrcb").classify(results[1]))
+
+    for stage, masks, original in (("frame", frame_masks, original_frame_chain), ("hand", hand_masks, original_hand_chain)):
+        if not masks:
+            print(f"{stage} masks: none, no hand was found on the frames")
+            continue
+        references = [original(mask) for mask in masks]
+        elapsed = time_call(lambda: [original(mask) for mask in masks], args.repeat)
+        print(f"{stage} masks ({len(masks)}): original chain {elapsed / len(masks) * 1000:.2f} ms")
+        for preset in MORPHOLOGY_PRESETS:
+            pipeline = get_morphology_pipeline(stage, preset=preset)
+            elapsed = time_call(lambda: [pipeline.run(mask) for mask in masks], args.repeat)
+            results = [pipeline.run(mask) for mask in masks]
+            iou = np.mean([mask_iou(a, b) for a, b in zip(results, references)])
+            exact = all(np.array_equal(a, b) for a, b in zip(results, references))
+            print(f"  {preset:12s}: {elapsed / len(masks) * 1000:.2f} ms, IoU with the original {iou:.4f}{' (identical)' if exact else ''}")
+
+    reference = None
+    for preset in MORPHOLOGY_PRESETS:
+        set_morphology_preset(preset)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            gestures = [recognize_gesture(frame, 1.0) for frame in frames]
+            elapsed = time.perf_counter() - start
+        if reference is None:
+            reference = gestures
+        agreement = sum(a == b for a, b in zip(gestures, reference)) / len(frames)
+        report = f"pipeline with {preset:12s}: {len(frames) / elapsed:6.1f} fps, gesture agreement with {next(iter(MORPHOLOGY_PRESETS))} {agreement * 100:5.1f}%"
+        if expected is not None:
+            accuracy = sum(a == b for a, b in zip(gestures, expected)) / len(frames)
+            report += f", matches the synthetic finger count {accuracy * 100:5.1f}%"
+        print(report)
+    set_morphology_preset(DEFAULT_MORPHOLOGY_PRESET)
+    return True
+
+
+def manual_clahe_reference(channel, tileGridSize=4, clipLimit=2.0):
+    """The tile by tile CLAHE segmenterFunc.manual_clahe used to be, without blending between tiles."""
+    height, width = channel.shape
+    tileHeight = ceil(height / tileGridSize)
+    tileWidth = ceil(width / tileGridSize)
+    output = np.zeros_like(channel, dtype=np.uint8)
+
+    for ty in range(tileGridSize):
+        for tx in range(tileGridSize):
+            y1, y2 = ty * tileHeight, min((ty + 1) * tileHeight, height)
+            x1, x2 = tx * tileWidth, min((tx + 1) * tileWidth, width)
+            subregion = channel[y1:y2, x1:x2]
+            hist, _ = np.histogram(subregion, bins=256, range=(0, 256))
+
+            limit = int(clipLimit * (subregion.size / 256.0))
+            excess = np.maximum(hist - limit, 0).sum()
+            hist = np.minimum(hist, limit)
+            spread = excess // 256
+            hist += spread
+            remainder = excess % 256
+            hist[:remainder] += 1
+
+            cdf = np.cumsum(hist).astype(np.float32)
+            cdf = (cdf / cdf[-1]) * 255
+            eq = np.interp(subregion.flatten(), np.arange(256), cdf).reshape(subregion.shape).astype(np.uint8)
+            output[y1:y2, x1:x2] = eq
+
+    return output
+
+
+def bench_clahe(args):
+    """Times the CLAHE engine against the old tile loop and cv2.createCLAHE, and the pipeline with each normalization."""
+    frames, expected = load_frames(args.video, args.frames, args.seed)
+    if not frames:
+        print(f"Could not read frames from {args.video}")
+        return False
+    channels = [cv2.cvtColor(frame, cv2.COLOR_BGR2YCrCb)[:, :, 0].copy() for frame in frames]
+    per_frame = lambda func: time_call(lambda: [func(channel) for channel in channels], args.repeat) / len(channels) * 1000
+
+    opencv = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    references = [opencv.apply(channel) for channel in channels]
+    print(f"{len(channels)} channels of {channels[0].shape[1]}x{channels[0].shape[0]}, 8x8 tiles, clip limit 2")
+    print(f"  tile loop (no blending): {per_frame(lambda c: manual_clahe_reference(c, 8, 2.0)):6.2f} ms")
+    print(f"  cv2.createCLAHE:         {per_frame(opencv.apply):6.2f} ms")
+    for workers in args.workers:
+        engine = ClaheEngine(8, 2.0, workers)
+        difference = [np.abs(engine.apply(c).astype(np.int16) - r) for c, r in zip(channels, references)]
+        print(f"  ClaheEngine, {workers} band(s): {per_frame(engine.apply):6.2f} ms, "
+              f"difference with cv2 mean {np.mean([d.mean() for d in difference]):.2f} max {max(d.max() for d in difference)}")
+
+    for mode in LIGHTING_NORMALIZATIONS:
+        set_lighting_normalization(mode)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            gestures = [recognize_gesture(frame, 1.0) for frame in frames]
+            elapsed = time.perf_counter() - start
+        report = f"pipeline with {mode:9s} normalization: {len(frames) / elapsed:6.1f} fps"
+        if expected is not None:
+            accuracy = sum(a == b for a, b in zip(gestures, expected)) / len(frames)
+            report += f", matches the synthetic finger count {accuracy * 100:5.1f}%"
+        print(report)
+    set_lighting_normalization(DEFAULT_LIGHTING_NORMALIZATION)
+    return True
+
+
+def drifting_frames(count, seed=0):
+    """A synthetic scene whose brightness slowly drifts up and down while the hand moves a little."""
+    rng = np.random.default_rng(seed)
+    base = synthetic_frame(rng, fingers=5).astype(np.float32)
+    frames = []
+    for i in range(count):
+        gain = 1.0 + 0.25 * np.sin(2 * np.pi * i / count)
+        shifted = np.roll(base, (i % 20) - 10, axis=1)
+        noise = rng.normal(0, 2, base.shape)
+        frames.append(np.clip(shifted * gain + noise, 0, 255).astype(np.uint8))
+    return frames
+
+
+def bench_temporal(args):
+    """Compares the temporal normalizer with equalizing every frame: time, refreshes and skin mask stability."""
+    if args.video is None:
+        frames = drifting_frames(args.frames, args.seed)
+    else:
+        frames = load_frames(args.video, args.frames, args.seed)[0]
+    if not frames:
+        print(f"Could not read frames from {args.video}")
+        return False
+
+    classifier = get_skin_classifier("HSV")
+    references = [normalize_lighting_histogram(frame) for frame in frames]
+    elapsed = time_call(lambda: [normalize_lighting_histogram(frame) for frame in frames], 3)
+    print(f"{len(frames)} frames, equalizing every frame: {elapsed / len(frames) * 1000:.2f} ms per frame")
+
+    normalizer = TemporalNormalizer()
+    start = time.perf_counter()
+    results = [normalizer.normalize(frame) for frame in frames]
+    elapsed = time.perf_counter() - start
+    difference = np.mean([np.abs(a.astype(np.int16) - b).mean() for a, b in zip(results, references)])
+    print(f"temporal normalizer: {elapsed / len(frames) * 1000:.2f} ms per frame, {normalizer.refreshes} table refreshes, "
+          f"mean difference with equalizing every frame {difference:.2f} grey levels")
+
+    masks = [classifier.classify(frame) for frame in results]
+    reference_masks = [classifier.classify(frame) for frame in references]
+    iou = np.mean([mask_iou(a, b) for a, b in zip(masks, reference_masks)])
+    ## how much the skin mask flickers between consecutive frames
+    stability = lambda m: np.mean([mask_iou(a, b) for a, b in zip(m[:-1], m[1:])])
+    print(f"skin mask IoU with equalizing every frame {iou:.4f}, frame to frame IoU {stability(masks):.4f} "
+          f"(equalizing every frame {stability(reference_masks):.4f})")
+    return True
+
+
+def static_distractor_frames(count, seed=0):
+    """
+    A fixed scene with a skin coloured face-like blob and a hand changing gesture and position every frame.
+
+    Returns:
+        tuple: (frames, expected gestures).
+    """
+    rng = np.random.default_rng(seed)
+    shape = (480, 640)
+    coarse = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+    coarse[..., 0] = np.maximum(coarse[..., 0], 150)
+    scene = cv2.resize(coarse, (shape[1], shape[0]), interpolation=cv2.INTER_CUBIC)
+    cv2.ellipse(scene, (90, 110), (55, 75), 0, 0, 360, (115, 145, 195), -1)
+    frames, expected = [], []
+    for i in range(count):
+        mask = synthetic_hand_mask(rng, shape, i % 6, jagged=False)
+        frame = scene.copy()
+        frame[mask > 0] = (120, 150, 200)
+        frames.append(cv2.add(frame, rng.integers(0, 12, frame.shape, dtype=np.uint8)))
+        expected.append(SYNTHETIC_GESTURES[i % 6])
+    return frames, expected
+
+
+def bench_background(args):
+    """Candidate contours, time and accuracy with and without the background model on a scene with a static distractor."""
+    frames, expected = static_distractor_frames(args.frames, args.seed)
+    for name, background in (("skin mask only", None), ("with background", BackgroundModel())):
+        candidates = 0
+        gestures = []
+        elapsed = 0.0
+        with contextlib.redirect_stdout(io.StringIO()):
+            for frame in frames:
+                frame = cv2.GaussianBlur(frame, (5, 5), 0)
+                start = time.perf_counter()
+                results = segmenter(frame, "HSV", 0.25, None, 1.0, background)
+                gesture = "UNKNOWN"
+                if len(results) == 5:
+                    contour = largest_contour(results[0])
+                    if contour is not None:
+                        features = ContourFeatures(contour)
+                        if features.palm_center is not None:
+                            gesture, _ = classify_gesture(features)
+                elapsed += time.perf_counter() - start
+                gestures.append(gesture)
+                ## the candidates segment_hand scored in this frame, without feeding the model a second time
+                mask = preprocess_frame(frame, "HSV")[1]
+                if background is not None and background.last_foreground is not None:
+                    mask = cv2.bitwise_and(mask, background.last_foreground)
+                candidates += len(cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0])
+        accuracy = sum(a == b for a, b in zip(gestures, expected)) / len(frames)
+        print(f"{name:16s}: {len(frames) / elapsed:6.1f} fps, {candidates / len(frames):4.1f} candidate contours per frame, "
+              f"matches the synthetic finger count {accuracy * 100:5.1f}%")
+    return True
+
+
+class SlowBackend(RecordingBackend):
+    """RecordingBackend that takes as long as pyautogui (its pause plus the OS) to send every key."""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+
+    def press(self, key, presses=1):
+        time.sleep(self.delay * presses)
+        super().press(key, presses)
+
+    def hotkey(self, *keys):
+        time.sleep(self.delay)
+        super().hotkey(*keys)
+
+
+def bench_actions(args):
+    """Time the loop spends on actions, run inline against queued on the dispatcher, for a hand held on volume up."""
+    period = 1.0 / args.fps
+    volume_up = ACTIONS["volume_up"]
+    for name in ("inline", "dispatcher"):
+        backend = SlowBackend(args.key_delay)
+        dispatcher = ActionDispatcher(backend)
+        last_fired = float("-inf")
+        stalls = []
+        for _ in range(args.frames):
+            start = time.perf_counter()
+            if name == "inline":
+                ## the old behaviour: one global cooldown, keys sent on the loop thread
+                if start - last_fired >= 1.5:
+                    volume_up.run(backend)
+                    last_fired = start
+            else:
+                dispatcher.submit(volume_up)
+            elapsed = time.perf_counter() - start
+            stalls.append(elapsed * 1000.0)
+            time.sleep(max(0.0, period - elapsed))
+        time.sleep(args.key_delay * 2)
+        presses = sum(call[2] for call in backend.calls)
+        print(f"{name:10s}: loop time per frame mean {np.mean(stalls):7.3f} ms, max {np.max(stalls):7.2f} ms, "
+              f"{presses} volume steps in {args.frames * period:.1f} s")
+    return True
+
+
+def original_motion_detector(points, buffer_limit=40, threshold=120):
+    """The point buffer of the original motionFunc: the first consecutive jump above threshold pixels, per frame."""
+    buffer = []
+    for point in points:
+        buffer.append(point)
+        if len(buffer) > buffer_limit:
+            buffer = buffer[-4:]
+        for previous, current in zip(buffer, buffer[1:]):
+            dx, dy = current[0] - previous[0], current[1] - previous[1]
+            if abs(dx) > threshold or abs(dy) > threshold:
+                buffer.clear()
+                if abs(dx) > threshold:
+                    yield "RIGHT" if dx > 0 else "LEFT"
+                else:
+                    yield "DOWN" if dy > 0 else "UP"
+                break
+        else:
+            yield None
+
+
+def swipe_trajectory(rng, kind, fps, size=(640, 480)):
+    """
+    Palm centers of a synthetic clip: still, a swipe, then still again, with a few pixels of jitter.
+
+    kind is "fast" (a swipe over 0.05 s), "slow" (over 0.4 s), "still" (no swipe),
+    "glitch" (still, with one frame where the palm is found on another blob 150 px away),
+    "glitch2" (the same for two frames) or "dropout" (a slow swipe where the hand is not
+    found on 3 frames, those points are None).
+    Returns the points and the expected motion.
+    """
+    width, height = size
+    frames = int(fps * 1.5)
+    start = np.array((width * rng.uniform(0.3, 0.4), height * rng.uniform(0.4, 0.6)))
+    points = np.repeat(start[None, :], frames, axis=0)
+    expected = None
+    if kind in ("fast", "slow", "dropout"):
+        duration = 0.05 if kind == "fast" else 0.4
+        first = int(fps * 0.5)
+        steps = max(1, int(round(duration * fps)))
+        distance = width * rng.uniform(0.3, 0.4)
+        progress = np.clip((np.arange(frames) - first + 1) / steps, 0, 1)
+        points[:, 0] += distance * progress
+        expected = "RIGHT"
+    elif kind == "glitch":
+        points[int(fps * 0.7), 0] += 150
+    elif kind == "glitch2":
+        points[int(fps * 0.7):int(fps * 0.7) + 2, 0] += 150
+    points += rng.normal(0, 3, points.shape)
+    points = [tuple(p) for p in points]
+    if kind == "dropout":
+        middle = int(fps * 0.6)
+        points[middle:middle + 3] = [None] * 3
+    return points, expected
+
+
+def bench_motion(args):
+    """Swipes found by the original point buffer and by MotionRecognizer (raw and filtered points) on synthetic trajectories."""
+    rng = np.random.default_rng(args.seed)
+    period = 1.0 / args.fps
+    recognizers = {"unfiltered": dict(alpha=1.0, beta=0.0), "filtered": {}}
+    results = {name: {} for name in ["original"] + list(recognizers)}
+    elapsed = 0.0
+    calls = 0
+    for kind in ("fast", "slow", "still", "glitch", "glitch2", "dropout"):
+        for name in results:
+            results[name][kind] = 0
+        for _ in range(args.trials):
+            points, expected = swipe_trajectory(rng, kind, args.fps)
+            found = {"original": [m for m in original_motion_detector([p for p in points if p is not None]) if m is not None]}
+            for name, parameters in recognizers.items():
+                recognizer = MotionRecognizer(**parameters)
+                found[name] = []
+                with contextlib.redirect_stdout(io.StringIO()):
+                    for i, point in enumerate(points):
+                        start = time.perf_counter()
+                        if point is None:
+                            recognizer.miss()
+                            motion = None
+                        else:
+                            motion = recognizer.add(point, (640, 480), i * period)
+                        elapsed += time.perf_counter() - start
+                        calls += 1
+                        if motion is not None:
+                            found[name].append(motion)
+            ## a trial is right when it reports exactly the expected swipe, or nothing when there is none
+            for name, motions in found.items():
+                if motions == ([expected] if expected else []):
+                    results[name][kind] += 1
+    for name, counts in results.items():
+        print(f"{name:10s}: " + ", ".join(f"{kind} {count * 100 / args.trials:5.1f}%" for kind, count in counts.items()) + " right")
+    print(f"MotionRecognizer.add: {elapsed / calls * 1e6:.1f} us per frame")
+    return True
+
+
+def moving_hand_masks(rng, count, speed, dropout_every, shape=(480, 640)):
+    """
+    Masks of one hand swinging left and right across the frame, speed is its peak speed in px per frame.
+    Every dropout_every frames the hand is missing for 2 frames (an empty mask).
+    """
+    rows, cols = shape
+    hand = synthetic_hand_mask(rng, shape, 5, jagged=False)
+    x, y, w, h = cv2.boundingRect(hand)
+    hand = cv2.resize(hand[y:y + h, x:x + w], None, fx=0.6, fy=0.6, interpolation=cv2.INTER_NEAREST)
+    h, w = hand.shape
+    amplitude = (cols - w) / 2
+    masks = []
+    for i in range(count):
+        mask = np.zeros(shape, np.uint8)
+        if not (dropout_every and i % dropout_every >= dropout_every - 2):
+            left = int(round(amplitude + amplitude * np.sin(i * speed / amplitude)))
+            mask[y:y + h, left:left + w] = hand
+        masks.append(mask)
+    return masks
+
+
+def bench_tracking(args):
+    """Full frame searches of RoiTracker with the filtered prediction against searching around the previous box."""
+    masks = moving_hand_masks(np.random.default_rng(args.seed), args.frames, args.speed, args.dropout_every)
+    trackers = {
+        "previous box": RoiTracker(search_margin=args.margin, alpha=1.0, beta=0.0, max_coast=0),
+        "filtered": RoiTracker(search_margin=args.margin),
+    }
+    for name, tracker in trackers.items():
+        found = 0
+        elapsed = 0.0
+        with contextlib.redirect_stdout(io.StringIO()):
+            for mask in masks:
+                start = time.perf_counter()
+                if locate_hand(mask, mask, 0.25, tracker) is not None:
+                    found += 1
+                elapsed += time.perf_counter() - start
+        print(f"{name:12s}: {elapsed / len(masks) * 1e3:5.2f} ms per frame, full frame searches {tracker.full_searches}, "
+              f"hand lost {tracker.losses} times, coasted frames {tracker.coasted_frames}, hand found on {found}/{len(masks)} frames")
+    return True
+
+
+# Gestures the classifier confuses with each other when the hand is between two shapes
+CONFUSABLE_GESTURES = {
+    "oneFinger": "twoFinger", "twoFinger": "oneFinger", "threeFinger": "fourFinger",
+    "fourFinger": "threeFinger", "fiveFinger": "fourFinger", "fist": "UNKNOWN", "rockOn": "twoFinger",
+}
+
+
+def held_gesture_labels(rng, seconds, fps, flicker):
+    """
+    Per frame labels of a user holding gestures for 1 to 3 s each, with hand-less pauses in between.
+    A frame is classified as the confusable neighbour with probability flicker, and misses the hand with flicker / 4.
+
+    Returns:
+        tuple: (labels, true gesture of every frame).
+    """
+    labels, truth = [], []
+    gestures = list(CONFUSABLE_GESTURES)
+    while len(labels) < seconds * fps:
+        gesture = gestures[int(rng.integers(len(gestures)))]
+        for _ in range(int(rng.uniform(1, 3) * fps)):
+            draw = rng.random()
+            labels.append(CONFUSABLE_GESTURES[gesture] if draw < flicker else "UNKNOWN" if draw < flicker * 1.25 else gesture)
+            truth.append(gesture)
+        for _ in range(int(rng.uniform(0.3, 1) * fps)):
+            labels.append("UNKNOWN")
+            truth.append("UNKNOWN")
+    return labels, truth
+
+
+def bench_stabilizer(args):
+    """Actions fired on noisy held gestures by the per frame cooldown against GestureStabilizer enter events."""
+    labels, truth = held_gesture_labels(np.random.default_rng(args.seed), args.seconds, args.fps, args.flicker)
+    period = 1.0 / args.fps
+    # the gesture held on every frame, as segments of (start frame, gesture)
+    segments = [(i, gesture) for i, gesture in enumerate(truth)
+                if gesture != "UNKNOWN" and (i == 0 or truth[i - 1] != gesture)]
+
+    ## the gesture loop before the stabilizer: the first frame after the 1.5 s cooldown fires its label
+    cooldown_fired = []
+    last_fired = float("-inf")
+    for i, label in enumerate(labels):
+        if label != "UNKNOWN" and i * period - last_fired >= 1.5:
+            cooldown_fired.append((i, label))
+            last_fired = i * period
+
+    stabilizer = GestureStabilizer()
+    stabilizer_fired = []
+    elapsed = 0.0
+    for i, label in enumerate(labels):
+        start = time.perf_counter()
+        events = stabilizer.update(label, None, i * period)
+        elapsed += time.perf_counter() - start
+        stabilizer_fired.extend((i, event.gesture) for event in events if event.kind == "enter")
+
+    for name, fired in (("cooldown", cooldown_fired), ("stabilizer", stabilizer_fired)):
+        wrong = sum(truth[i] != gesture for i, gesture in fired)
+        first = {}
+        for i, gesture in fired:
+            if truth[i] == gesture:
+                ## the segment the action belongs to is the last one started before it
+                start = max(s for s, _ in segments if s <= i)
+                first.setdefault(start, i)
+        missed = len(segments) - len(first)
+        repeats = len(fired) - wrong - len(first)
+        delay = np.mean([(i - start) * period * 1000 for start, i in first.items()]) if first else float("nan")
+        print(f"{name:10s}: {len(fired)} actions for {len(segments)} gestures, wrong {wrong}, repeated {repeats}, "
+              f"missed {missed}, {delay:4.0f} ms from the start of a gesture to its action")
+    print(f"GestureStabilizer.update: {elapsed / len(labels) * 1e6:.1f} us per frame")
+    return True
+
+
+def hand_roi_masks(rng, count, blobs, jagged=False):
+    """
+    Hand masks like segmenter returns them: a hand with skin coloured speckles around it, cut to
+    the grown hand box and placed back in a full frame of zeros.
+
+    Returns:
+        list: (hand mask of the ROI, hand mask in full frame coordinates, (x, y, w, h) of the ROI).
+    """
+    masks = []
+    for _ in range(count):
+        mask = synthetic_hand_mask(rng, jagged=jagged)
+        for _ in range(blobs):
+            center = (int(rng.integers(0, mask.shape[1])), int(rng.integers(0, mask.shape[0])))
+            cv2.circle(mask, center, int(rng.integers(2, 12)), 255, -1)
+        box = grow_box(cv2.boundingRect(dense_contour(mask)), 0.25, mask.shape)
+        x, y, w, h = box
+        roi_mask = mask[y:y + h, x:x + w].copy()
+        full_mask = np.zeros_like(mask)
+        full_mask[y:y + h, x:x + w] = roi_mask
+        masks.append((roi_mask, full_mask, box))
+    return masks
+
+
+def largest_blob_contour(mask):
+    """Largest blob picked from cv2.connectedComponentsWithStats, then traced inside its bounding box only."""
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    blob = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+    x, y, w, h = stats[blob, :4]
+    blob_mask = (labels[y:y + h, x:x + w] == blob).astype(np.uint8)
+    return cv2.findContours(blob_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(int(x), int(y)))[0][0]
+
+
+def bench_contours(args):
+    """
+    The contour and palm center the recognition loop gets from largest_contour, against the two
+    RETR_TREE passes (ROI and full frame mask) it replaced and against each of the two paths it
+    chooses between: picking the blob from connected component stats and tracing the outer contours.
+    """
+    masks = hand_roi_masks(np.random.default_rng(args.seed), args.frames, args.blobs, args.jagged)
+
+    def original(roi_mask, full_mask, box):
+        contours, _ = cv2.findContours(roi_mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+        contours_full, _ = cv2.findContours(full_mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+        contour = max(contours, key=cv2.contourArea)
+        return contour, ContourFeatures(max(contours_full, key=cv2.contourArea)).palm_center
+
+    def offset_palm_center(contour, box):
+        ## the full frame mask is the ROI mask moved by the ROI position, so is its palm center
+        center = ContourFeatures(contour).palm_center
+        return contour, (center[0] + box[0], center[1] + box[1])
+
+    selections = (
+        ("RETR_TREE x2", original),
+        ("components", lambda roi_mask, full_mask, box: offset_palm_center(largest_blob_contour(roi_mask), box)),
+        ("outer contours", lambda roi_mask, full_mask, box: offset_palm_center(
+            max(cv2.findContours(roi_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0], key=cv2.contourArea), box)),
+        ("largest_contour", lambda roi_mask, full_mask, box: offset_palm_center(largest_contour(roi_mask), box)),
+    )
+    results = {}
+    for name, select in selections:
+        results[name] = [select(*mask) for mask in masks]
+        elapsed = time_call(lambda: [select(*mask) for mask in masks], args.repeat) / len(masks)
+        print(f"{name:16s}: {elapsed * 1e6:7.1f} us per frame")
+
+    blobs = np.mean([len(cv2.findContours(roi_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0]) for roi_mask, _, _ in masks])
+    print(f"{blobs:.1f} blobs per ROI mask")
+    ok = True
+    for name, _ in selections[1:]:
+        same_contour = sum(np.array_equal(a[0], b[0]) for a, b in zip(results["RETR_TREE x2"], results[name]))
+        same_center = sum(a[1] == b[1] for a, b in zip(results["RETR_TREE x2"], results[name]))
+        print(f"{name}: same hand contour on {same_contour}/{len(masks)} frames, same palm center in the full frame on {same_center}/{len(masks)}")
+        ok = ok and same_center == len(masks)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    defects = subparsers.add_parser("defects", help="convexity_defects parity and timing")
+    defects.add_argument("--contours", type=int, default=200)
+    defects.add_argument("--repeat", type=int, default=20)
+    defects.set_defaults(func=bench_defects)
+
+    fingertips = subparsers.add_parser("fingertips", help="fingertip search in detect_pointing_direction / is_rock_on")
+    fingertips.add_argument("--sizes", type=int, nargs="+", default=[200, 500, 1000, 2000])
+    fingertips.add_argument("--repeat", type=int, default=200)
+    fingertips.set_defaults(func=bench_fingertips)
+
+    scales = subparsers.add_parser("scales", help="fps and gesture agreement for each processing_scale")
+    scales.add_argument("--video", default=None, help="video file to read frames from, synthetic frames if omitted")
+    scales.add_argument("--frames", type=int, default=60)
+    scales.add_argument("--scales", type=float, nargs="+", default=[1.0, 0.5, 0.25])
+    scales.set_defaults(func=bench_scales)
+
+    adaptive = subparsers.add_parser("adaptive", help="candidate mask and accuracy with a learned skin model")
+    adaptive.add_argument("--video", default=None, help="video file to read frames from, synthetic frames if omitted")
+    adaptive.add_argument("--frames", type=int, default=120)
+    adaptive.add_argument("--no-desk", action="store_true", help="do not add the skin coloured desk distractor")
+    adaptive.set_defaults(func=bench_adaptive)
+
+    morphology = subparsers.add_parser("morphology", help="mask IoU and time of each morphology preset against the original chains")
+    morphology.add_argument("--video", default=None, help="video file to read frames from, synthetic frames if omitted")
+    morphology.add_argument("--frames", type=int, default=60)
+    morphology.add_argument("--repeat", type=int, default=5)
+    morphology.set_defaults(func=bench_morphology)
+
+    clahe = subparsers.add_parser("clahe", help="CLAHE engine timing and parity, pipeline fps per lighting normalization")
+    clahe.add_argument("--video", default=None, help="video file to read frames from, synthetic frames if omitted")
+    clahe.add_argument("--frames", type=int, default=30)
+    clahe.add_argument("--repeat", type=int, default=5)
+    clahe.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    clahe.set_defaults(func=bench_clahe)
+
+    temporal = subparsers.add_parser("temporal", help="temporal lighting normalization against equalizing every frame")
+    temporal.add_argument("--video", default=None, help="video file to read frames from, a drifting synthetic scene if omitted")
+    temporal.add_argument("--frames", type=int, default=120)
+    temporal.set_defaults(func=bench_temporal)
+
+    background = subparsers.add_parser("background", help="background model against the skin mask alone with a static distractor")
+    background.add_argument("--frames", type=int, default=120)
+    background.set_defaults(func=bench_background)
+
+    actions = subparsers.add_parser("actions", help="recognition loop stall of inline actions against the action dispatcher")
+    actions.add_argument("--frames", type=int, default=200)
+    actions.add_argument("--fps", type=float, default=30)
+    actions.add_argument("--key-delay", type=float, default=0.1, help="seconds the backend takes per key, pyautogui pauses 0.1 s")
+    actions.set_defaults(func=bench_actions)
+
+    motion = subparsers.add_parser("motion", help="swipe detection of the original point buffer against MotionRecognizer")
+    motion.add_argument("--trials", type=int, default=200)
+    motion.add_argument("--fps", type=float, default=30)
+    motion.set_defaults(func=bench_motion)
+
+    tracking = subparsers.add_parser("tracking", help="RoiTracker search windows with and without the filtered prediction")
+    tracking.add_argument("--frames", type=int, default=300)
+    tracking.add_argument("--speed", type=int, default=25, help="pixels the hand moves per frame")
+    tracking.add_argument("--margin", type=float, default=0.5, help="search_margin of both trackers")
+    tracking.add_argument("--dropout-every", type=int, default=40, help="the hand is missing for 2 frames this often, 0 for never")
+    tracking.set_defaults(func=bench_tracking)
+
+    stabilizer = subparsers.add_parser("stabilizer", help="actions fired on flickering gestures with the cooldown against the stabilizer")
+    stabilizer.add_argument("--seconds", type=float, default=600)
+    stabilizer.add_argument("--fps", type=float, default=30)
+    stabilizer.add_argument("--flicker", type=float, default=0.3, help="share of frames classified as a confusable gesture")
+    stabilizer.set_defaults(func=bench_stabilizer)
+
+    contours = subparsers.add_parser("contours", help="contour selection of largest_contour against findContours(RETR_TREE) on the ROI and full frame masks")
+    contours.add_argument("--frames", type=int, default=300)
+    contours.add_argument("--blobs", type=int, default=20, help="skin coloured speckles added to every mask")
+    contours.add_argument("--jagged", action="store_true", help="roughen the masks, hundreds of tiny blobs and holes like an unfiltered skin mask")
+    contours.add_argument("--repeat", type=int, default=5)
+    contours.set_defaults(func=bench_contours)
+
+    args = parser.parse_args()
+    ok = args.func(args)
+    raise SystemExit(0 if ok is not False else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+import cv2
+import numpy as np
+
+# A captured frame together with the moment it was grabbed and its position in the stream.
+# seq increases by one for every frame read from the camera, so gaps between the
+# sequence numbers the processing loop sees are the frames it never had to look at.
+# camera is the index of the camera the frame came from, it changes with switch_camera.
+FramePacket = namedtuple("FramePacket", ["frame", "seq", "timestamp", "camera"])
+
+
+class FrameSource:
+    """
+    Grabs frames from a camera on a dedicated thread into a single-slot buffer.
+
+    The slot only ever holds the newest frame: when the processing loop is slower
+    than the camera the older frame is simply overwritten (drop-oldest), so the
+    loop never works on a stale frame that sat in a queue or in the driver buffer.
+
+    Args:
+        camera: Index of the camera passed to cv2.VideoCapture.
+        max_failures: Consecutive failed reads after which the source stops.
+    """
+
+    def __init__(self, camera=0, max_failures=30):
+        self.camera = camera
+        self.max_failures = max_failures
+        self.frames_captured = 0
+        self.frames_dropped = 0
+
+        self._cap = None
+        self._thread = None
+        self._running = False
+        self._pending_camera = None
+        self._packet = None
+        self._consumed_seq = 0
+        self._condition = threading.Condition()
+
+    def start(self):
+        if self._running:
+            return self
+        self._cap = cv2.VideoCapture(self.camera)
+        ## keep the driver queue as short as possible, not every backend honours this
+        self._cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_loop, name="FrameSource", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+        self._thread = None
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+
+    def is_running(self):
+        return self._running
+
+    def switch_camera(self, camera):
+        """Ask the capture thread to reopen the given camera before its next read."""
+        with self._condition:
+            self._pending_camera = camera
+
+    def read(self, last_seq=0, timeout=1.0):
+        """
+        Wait for a frame newer than last_seq and return it.
+
+        Args:
+            last_seq: Sequence number of the last frame the caller processed.
+            timeout: Maximum number of seconds to wait for a new frame.
+
+        Returns:
+            FramePacket: The newest frame, or None if the source stopped or timed out.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._running and (self._packet is None or self._packet.seq <= last_seq):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+            if self._packet is None or self._packet.seq <= last_seq:
+                return None
+            packet = self._packet
+            self._consumed_seq = packet.seq
+            return packet
+
+    def _capture_loop(self):
+        failures = 0
+        while self._running:
+            if self._pending_camera is not None:
+                self._reopen()
+
+            ret, frame = self._cap.read()
+            timestamp = time.perf_counter()
+            if not ret:
+                failures += 1
+                if failures >= self.max_failures:
+                    print("FrameSource: Failed to grab frame. Stopping capture...")
+                    with self._condition:
+                        self._running = False
+                        self._condition.notify_all()
+                    break
+                time.sleep(0.01)
+                continue
+            failures = 0
+
+            with self._condition:
+                self.frames_captured += 1
+                ## the previous frame was never picked up by the processing loop
+                if self._packet is not None and self._packet.seq > self._consumed_seq:
+                    self.frames_dropped += 1
+                self._packet = FramePacket(frame, self.frames_captured, timestamp, self.camera)
+                self._condition.notify_all()
+
+    def _reopen(self):
+        with self._condition:
+            camera, self._pending_camera = self._pending_camera, None
+        self._cap.release()
+        self.camera = camera
+        self._cap = cv2.VideoCapture(camera)
+        self._cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        print(f"FrameSource: switched to camera {camera}")
+
+
+class LatencyMeter:
+    """
+    Keeps a rolling window of capture-to-decision latencies.
+
+    Args:
+        window: Number of most recent samples to keep.
+    """
+
+    def __init__(self, window=100):
+        self._samples = deque(maxlen=window)
+
+    def record(self, capture_timestamp, decision_timestamp=None):
+        """Record the latency of a frame given its FramePacket timestamp, returns it in ms."""
+        if decision_timestamp is None:
+            decision_timestamp = time.perf_counter()
+        latency_ms = (decision_timestamp - capture_timestamp) * 1000.0
+        self._samples.append(latency_ms)
+        return latency_ms
+
+    def summary(self):
+        if not self._samples:
+            return {"count": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        samples = np.fromiter(self._samples, dtype=np.float64)
+        return {
+            "count": len(samples),
+            "mean_ms": float(samples.mean()),
+            "p50_ms": float(np.percentile(samples, 50)),
+            "p95_ms": float(np.percentile(samples, 95)),
+            "max_ms": float(samples.max()),
+        }
+
+
+class StageTimer:
+    """
+    Splits the processing of a frame in named stages and times each of them.
+
+    start() is called when the frame is picked up, mark(name) at the end of every stage:
+    each stage lasts from the previous mark (or start) to its own.
+    """
+
+    def __init__(self):
+        self._last = time.perf_counter()
+        self._timings = {}
+
+    def start(self):
+        self._timings = {}
+        self._last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        ## a stage marked twice (skipped branches, retries) adds up
+        self._timings[stage] = self._timings.get(stage, 0.0) + (now - self._last) * 1000.0
+        self._last = now
+
+    def timings(self):
+        """Milliseconds spent in every stage of the current frame, in the order they were marked."""
+        return {stage: round(ms, 3) for stage, ms in self._timings.items()}
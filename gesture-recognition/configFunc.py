@@ -0,0 +1,63 @@
+import threading
+
+
+class ConfigStore:
+    """
+    Versioned settings and gesture mappings shared by the server and the recognition loop.
+
+    The dicts are never changed in place: an update builds new ones and swaps them in under
+    the lock, then bumps version. The loop compares version with the one it applied on every
+    frame (a plain attribute read) and only takes a snapshot when it changed, so it always
+    sees a whole update and never half of one.
+
+    Args:
+        settings: Settings of the recognition loop, keyed like app.DEFAULT_SETTINGS.
+        mappings: {"gestureMappings": {...}, "directionMappings": {...}, "motionMappings": {...}}.
+    """
+
+    def __init__(self, settings, mappings):
+        self._lock = threading.Lock()
+        self._settings = dict(settings)
+        self._mappings = {group: dict(mapping) for group, mapping in mappings.items()}
+        self.version = 0
+
+    def snapshot(self):
+        """
+        Returns:
+            tuple: (version, settings, mappings), copies that stay consistent with each other.
+        """
+        with self._lock:
+            return self.version, dict(self._settings), {group: dict(mapping) for group, mapping in self._mappings.items()}
+
+    def settings(self):
+        with self._lock:
+            return dict(self._settings)
+
+    def mappings(self):
+        with self._lock:
+            return {group: dict(mapping) for group, mapping in self._mappings.items()}
+
+    def update_settings(self, changes):
+        """Applies all the changes at once, returns the new settings."""
+        with self._lock:
+            settings = {**self._settings, **changes}
+            if settings != self._settings:
+                self._settings = settings
+                self.version += 1
+            return dict(settings)
+
+    def update_mappings(self, changes):
+        """Replaces the mapping groups given in changes, returns the new mappings."""
+        with self._lock:
+            mappings = {**self._mappings, **{group: dict(mapping) for group, mapping in changes.items()}}
+            if mappings != self._mappings:
+                self._mappings = mappings
+                self.version += 1
+            return {group: dict(mapping) for group, mapping in mappings.items()}
+
+
+def changed_settings(previous, current):
+    """Names of the settings that differ between two snapshots, all of them when previous is None."""
+    if previous is None:
+        return set(current)
+    return {key for key, value in current.items() if key not in previous or previous[key] != value}
@@ -2,10 +2,270 @@ import cv2
 import numpy as np
 import math
 
+
+class ContourFeatures:
+    """
+    Lazily computed, cached shape features of a single contour.
+
+    Every feature is computed at most once, on first access, so the segmenter, the
+    classifier and the helpers below can share one object per contour instead of each
+    calling cv2.convexHull / cv2.moments / cv2.contourArea again.
+
+    Args:
+        contour: The contour as returned by cv2.findContours.
+    """
+
+    __slots__ = (
+        "contour",
+        "_hull_indices",
+        "_hull",
+        "_moments",
+        "_area",
+        "_hull_area",
+        "_perimeter",
+        "_bounding_rect",
+        "_defects",
+        "_filtered_defects",
+        "_count_defects",
+        "_palm_center",
+        "_palm_distances",
+        "_fingertip",
+        "_rock_on_tips",
+    )
+
+    def __init__(self, contour):
+        self.contour = contour
+        self._hull_indices = None
+        self._hull = None
+        self._moments = None
+        self._area = None
+        self._hull_area = None
+        self._perimeter = None
+        self._bounding_rect = None
+        self._defects = None
+        self._filtered_defects = None
+        self._count_defects = None
+        self._palm_center = False  # None is a valid (cached) palm center
+        self._palm_distances = None
+        self._fingertip = False
+        self._rock_on_tips = None
+
+    @property
+    def points(self):
+        """Contour points as an (N, 2) array."""
+        return self.contour[:, 0, :]
+
+    @property
+    def hull_indices(self):
+        if self._hull_indices is None:
+            self._hull_indices = cv2.convexHull(self.contour, returnPoints=False).flatten()
+        return self._hull_indices
+
+    @property
+    def hull(self):
+        ## same points and order as cv2.convexHull(contour), without running the hull twice
+        if self._hull is None:
+            self._hull = self.contour[self.hull_indices]
+        return self._hull
+
+    @property
+    def moments(self):
+        if self._moments is None:
+            self._moments = cv2.moments(self.contour)
+        return self._moments
+
+    @property
+    def area(self):
+        if self._area is None:
+            ## m00 of a contour is its area, no need for a separate cv2.contourArea
+            self._area = abs(self.moments["m00"])
+        return self._area
+
+    @property
+    def hull_area(self):
+        if self._hull_area is None:
+            self._hull_area = cv2.contourArea(self.hull)
+        return self._hull_area
+
+    @property
+    def perimeter(self):
+        if self._perimeter is None:
+            self._perimeter = cv2.arcLength(self.contour, True)
+        return self._perimeter
+
+    @property
+    def bounding_rect(self):
+        if self._bounding_rect is None:
+            self._bounding_rect = cv2.boundingRect(self.contour)
+        return self._bounding_rect
+
+    @property
+    def defects(self):
+        if self._defects is None:
+            self._defects = convexity_defects(self.points, self.hull_indices)
+        return self._defects
+
+    @property
+    def filtered_defects(self):
+        """Defects sharper than 90 degrees, the ones that separate two fingers."""
+        if self._filtered_defects is None:
+            self._filtered_defects, self._count_defects = filterDefects(self.defects, self.contour)
+        return self._filtered_defects
+
+    @property
+    def count_defects(self):
+        if self._count_defects is None:
+            self.filtered_defects
+        return self._count_defects
+
+    @property
+    def solidity(self):
+        """Contour area over bounding box area (see calcSolidity)."""
+        _, _, w, h = self.bounding_rect
+        rect_area = w * h
+        return self.area / rect_area if rect_area != 0 else 0
+
+    @property
+    def hull_solidity(self):
+        """Contour area over convex hull area."""
+        return self.area / self.hull_area if self.hull_area > 0 else 0
+
+    @property
+    def palm_center(self):
+        if self._palm_center is False:
+            moments = self.moments
+            if moments['m00'] != 0:
+                self._palm_center = (int(moments['m10'] / moments['m00']), int(moments['m01'] / moments['m00']))
+            else:
+                self._palm_center = None
+        return self._palm_center
+
+    @property
+    def palm_distances(self):
+        """Squared distance of every contour point to the palm center, computed in one go."""
+        if self._palm_distances is None:
+            cx, cy = self.palm_center
+            points = self.points
+            dx = points[:, 0].astype(np.int64) - cx
+            dy = points[:, 1].astype(np.int64) - cy
+            self._palm_distances = dx * dx + dy * dy
+        return self._palm_distances
+
+    @property
+    def fingertip(self):
+        """(point, distance) of the contour point farthest from the palm center, None if there is none."""
+        if self._fingertip is False:
+            self._fingertip = None
+            if self.palm_center is not None:
+                distances = self.palm_distances
+                ## argmax keeps the first farthest point, like the old strict > scan
+                i = int(np.argmax(distances))
+                if distances[i] > 0:
+                    self._fingertip = (_point(self.points[i]), math.sqrt(distances[i]))
+        return self._fingertip
+
+    @property
+    def rock_on_tips(self):
+        """
+        Farthest points above the palm center in the left (pinky) and right (index) halves of the hand.
+
+        Returns:
+            tuple: ((left_point, left_distance), (right_point, right_distance)), a point is None if its half is empty.
+        """
+        if self._rock_on_tips is None:
+            cx, cy = self.palm_center
+            points = self.points
+            distances = self.palm_distances
+            above = points[:, 1] < cy
+            in_left = points[:, 0] < cx
+            tips = []
+            for half in (above & in_left, above & ~in_left):
+                masked = np.where(half, distances, -1)
+                i = int(np.argmax(masked))
+                if masked[i] > 0:
+                    tips.append((_point(points[i]), math.sqrt(masked[i])))
+                else:
+                    tips.append((None, 0))
+            self._rock_on_tips = tuple(tips)
+        return self._rock_on_tips
+
+
+def _point(point):
+    return (int(point[0]), int(point[1]))
+
+
+def as_features(contour):
+    """Wraps a raw contour in ContourFeatures, passes ContourFeatures through unchanged."""
+    if isinstance(contour, ContourFeatures):
+        return contour
+    return ContourFeatures(contour)
+
+
+# Mean number of mask / background transitions along a row above which a mask counts as jagged
+JAGGED_TRANSITIONS_PER_ROW = 8
+
+
+def largest_contour(mask, offset=(0, 0)):
+    """
+    Outer contour of the largest blob of a mask.
+
+    Only the outer contours are traced, without a hierarchy, so the holes of the mask are
+    never traced; the areas are only measured when the mask has more than one blob. A jagged
+    mask (hundreds of speckles, like an unfiltered skin mask) costs more to trace than to
+    label, its largest blob is picked from the connected component stats and only that blob
+    is traced.
+
+    Args:
+        mask: uint8 mask, the hand in nonzero pixels.
+        offset: (x, y) added to every point, e.g. the ROI position to get the contour in the full frame.
+
+    Returns:
+        numpy.ndarray: The contour as returned by cv2.findContours, None if the mask is empty.
+    """
+    ## every 4th row is enough to tell a cleaned up mask (2 to 5 transitions) from a jagged one (more than 12)
+    rows = mask[::4] > 0
+    if rows.size and np.count_nonzero(rows[:, 1:] != rows[:, :-1]) > JAGGED_TRANSITIONS_PER_ROW * len(rows):
+        return _largest_component_contour(mask, offset)
+
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=offset)
+    if not contours:
+        return None
+    ## a cleaned up hand mask is usually a single blob
+    if len(contours) == 1:
+        return contours[0]
+    return max(contours, key=cv2.contourArea)
+
+
+def _largest_component_contour(mask, offset=(0, 0)):
+    """largest_contour of a jagged mask: the blob with the most pixels, traced inside its bounding box only."""
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    if count < 2:
+        return None
+    blob = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+    x, y, w, h = (int(v) for v in stats[blob, :4])
+    blob_mask = (labels[y:y + h, x:x + w] == blob).astype(np.uint8)
+    contours, _ = cv2.findContours(blob_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(x + offset[0], y + offset[1]))
+    return contours[0]
+
+
 def convexity_defects(points, hull):
+    """
+    Computes the convexity defects of a contour, same output as cv2.convexityDefects.
+
+    The perpendicular distance of every contour point to the hull edge enclosing it is
+    computed for all hull edges at once, then the deepest point of each edge is picked
+    with a segmented argmax, instead of walking the contour point by point.
+
+    Args:
+        points: Contour points as an (N, 2) array.
+        hull: Indices of the hull points in the contour (cv2.convexHull with returnPoints=False).
+
+    Returns:
+        list: [start_idx, end_idx, far_idx, depth] for each defect, depth is fixed-point (depth * 256).
+    """
     try:
-        points = np.array(points, dtype=np.int32)
-        hull = np.array(hull, dtype=np.int32)
+        points = np.asarray(points, dtype=np.int32).reshape(-1, 2)
+        hull = np.asarray(hull, dtype=np.int32).ravel()
         ## we dont have a closed shape so we can not compute convexity defects
         npoints = len(points)
         if npoints <= 3:
@@ -17,60 +277,62 @@ def convexity_defects(points, hull):
             print("Not enough hull points to form defects.")
             return []
 
-        # print(f"Number of points: {npoints}, Number of hull points: {hpoints}")
-
-        defects = []
-        if hpoints < 3:
-            print("Hull has less than 3 points, contour is always convex.")
-            return defects
         ## check hull orientation (clockwise or anti) to determine the starting point
-        rev_orientation = ((hull[1] > hull[0]) + (hull[2] > hull[1]) + (hull[0] > hull[2])) != 2
+        ## the comparisons are numpy bools, added as such they would be or-ed instead of counted
+        rev_orientation = (int(hull[1] > hull[0]) + int(hull[2] > hull[1]) + int(hull[0] > hull[2])) != 2
 
-        hcurr = hull[0] if rev_orientation else hull[-1]
+        ## every hull edge goes from hcurr to hnext, walking the contour forwards
+        if rev_orientation:
+            hnext = hull[::-1]
+            hcurr = np.roll(hnext, 1)
+        else:
+            hnext = hull
+            hcurr = np.roll(hull, 1)
 
-        for i in range(hpoints):
-            hnext = hull[hpoints - i - 1] if rev_orientation else hull[i]
-            
-            # notice that: the hull elements are 0-based indices of the convex hull points 
-            # in the contour array (since the set of convex hull points is a subset of the original contour point set).
-            pt0 = points[hcurr]
-            pt1 = points[hnext]
-            dx0 = pt1[0] - pt0[0]
-            dy0 = pt1[1] - pt0[1]
-            
-            ## 1) in case the edge length is 0 (dx = 0 and dy = 0) the scale will be 0 as the distance is 0
-            ## 2) othewise the scale will be 1/edge_length for normalization 
-            ##    as we dont want the edge length to affect the defect depth calculation
-            scale = 0. if dx0 == 0 and dy0 == 0 else 1. / np.sqrt(dx0 * dx0 + dy0 * dy0)
-
-            defect_deepest_point = -1
-            defect_depth = 0
-            is_defect = False
-            j = hcurr
-
-            while True:
-                j += 1
-                if j >= npoints:
-                    j = 0
-                if j == hnext:
-                    break
-
-                dx = points[j][0] - pt0[0]
-                dy = points[j][1] - pt0[1]
-                dist = abs(-dy0 * dx + dx0 * dy) * scale
-
-                if dist > defect_depth:
-                    defect_depth = dist
-                    defect_deepest_point = j
-                    is_defect = True
-
-            if is_defect:
-                idepth = int(round(defect_depth * 256))
-                defects.append([hcurr, hnext, defect_deepest_point, idepth])
-
-            hcurr = hnext
-
-        return defects
+        # notice that: the hull elements are 0-based indices of the convex hull points
+        # in the contour array (since the set of convex hull points is a subset of the original contour point set).
+        pts = points.astype(np.int64)
+        pt0 = pts[hcurr]
+        edge = pts[hnext] - pt0
+        lengths = np.sqrt(edge[:, 0] * edge[:, 0] + edge[:, 1] * edge[:, 1])
+        ## 1) in case the edge length is 0 (dx = 0 and dy = 0) the scale will be 0 as the distance is 0
+        ## 2) othewise the scale will be 1/edge_length for normalization
+        ##    as we dont want the edge length to affect the defect depth calculation
+        scale = np.divide(1.0, lengths, out=np.zeros_like(lengths), where=lengths != 0)
+
+        ## number of contour points strictly between the two ends of each edge (wrapping around the contour)
+        counts = (hnext.astype(np.int64) - hcurr - 1) % npoints
+        total = int(counts.sum())
+        if total == 0:
+            return []
+
+        ## flatten the points of all edges into one batch, edges stay contiguous and in walking order
+        edge_ids = np.repeat(np.arange(hpoints), counts)
+        segment_starts = np.cumsum(counts) - counts
+        offsets = np.arange(total) - np.repeat(segment_starts, counts)
+        idx = (hcurr[edge_ids].astype(np.int64) + 1 + offsets) % npoints
+
+        d = pts[idx] - pt0[edge_ids]
+        edge_d = edge[edge_ids]
+        dist = np.abs(-edge_d[:, 1] * d[:, 0] + edge_d[:, 0] * d[:, 1]) * scale[edge_ids]
+
+        ## deepest point of every non empty edge, the first one wins on ties like in the sequential scan
+        non_empty = np.flatnonzero(counts)
+        max_depth = np.maximum.reduceat(dist, segment_starts[non_empty])
+        depth_per_point = np.zeros(hpoints)
+        depth_per_point[non_empty] = max_depth
+        at_max = np.flatnonzero(dist == depth_per_point[edge_ids])
+        first = np.ones(len(at_max), dtype=bool)
+        first[1:] = edge_ids[at_max[1:]] != edge_ids[at_max[:-1]]
+        deepest = at_max[first]
+
+        ## an edge is a defect only if one of its points lies strictly off the hull
+        deepest = deepest[dist[deepest] > 0]
+        defect_edges = edge_ids[deepest]
+        idepth = np.rint(dist[deepest] * 256).astype(np.int64)
+
+        defects = np.stack((hcurr[defect_edges], hnext[defect_edges], idx[deepest], idepth), axis=1)
+        return defects.tolist()
     except Exception as e:
         print(f"Error in convexity_defects: {e}")
         print(f"Points: {points}")
@@ -86,110 +348,64 @@ def angle_between_points(pt1, pt2, pt0):
     return abs(angle * 180.0 / math.pi)
 
 
-def detect_pointing_direction(frame, contour):
+def detect_pointing_direction(contour):
             """
                 Detect the pointing direction based on the palm center.
                 Args:
-                    frame: The frame to draw on(not the thresholded).
-                    contour: The contour of the hand.
-                
+                    contour: The contour of the hand (or its ContourFeatures).
+
+                Returns:
+                    str: The direction the fingertip points to, None if it can not be found.
             """
+            features = as_features(contour)
             
             ## first we get the center of the palm
-            moments = cv2.moments(contour)
-            if moments['m00'] != 0:
-                cx = int(moments['m10'] / moments['m00'])
-                cy = int(moments['m01'] / moments['m00'])
-                palm_center = (cx, cy)
-
-                # Draw the palm center
-                cv2.circle(frame, palm_center, 5, (255, 0, 0), -1)
-
-                # Detect the fingertip (point farthest from the palm center)
-                fingertip = None
-                max_distance = 0
-                for point in contour:
-                    point = tuple(point[0])  # this gets the (x, y) coordinates
-                    distance = np.linalg.norm(
-                        np.array(point) - np.array(palm_center))  # We Compute the distance from palm center
-                    if distance > max_distance:
-                        max_distance = distance
-                        fingertip = point
-                if fingertip:
-                    cv2.circle(frame, fingertip, 10, (0, 255, 0), -1)
-                    cv2.line(frame, palm_center, fingertip, (255, 0, 0), 2)
-
-                    # Compute pointing direction
-                    pointing_vector = np.array(
-                        [fingertip[0] - palm_center[0], fingertip[1] - palm_center[1]])
-                    pointing_vector = pointing_vector / np.linalg.norm(pointing_vector)
-
-                    # Determine direction of pointing
-                    direction = ""
-                    if abs(pointing_vector[0]) > abs(pointing_vector[1]):
-                        if pointing_vector[0] > 0:
-                            direction = "oneFingerRight"
-                        else:
-                            direction = "oneFingerLeft"
-                    else:
-                        if pointing_vector[1] > 0:
-                            direction = "oneFingerDown"
-                        else:
-                            direction = "oneFingerUp"
-                    return direction
+            palm_center = features.palm_center
+            if palm_center is None:
+                return None
+
+            # Detect the fingertip (point farthest from the palm center)
+            fingertip = features.fingertip
+            if fingertip is None:
+                return None
+            fingertip, _ = fingertip
+
+            # Compute pointing direction, the vector does not need to be normalized to compare its components
+            dx = fingertip[0] - palm_center[0]
+            dy = fingertip[1] - palm_center[1]
+
+            # Determine direction of pointing
+            if abs(dx) > abs(dy):
+                if dx > 0:
+                    return "oneFingerRight"
+                else:
+                    return "oneFingerLeft"
+            else:
+                if dy > 0:
+                    return "oneFingerDown"
+                else:
+                    return "oneFingerUp"
                    
 
-def is_rock_on(contour, drawing, cx, cy, count_defects):
+def is_rock_on(contour, count_defects):
     """
     Detect if the gesture is 'Rock On' (index and pinky extended).
     Args:
-        contour: The contour of the hand.
-        drawing: The image to draw on.
-        cx: The x-coordinate of the palm center.
-        cy: The y-coordinate of the palm center.
+        contour: The contour of the hand (or its ContourFeatures).
         count_defects: The number of convexity defects.
     """
     ## early exit if we have more than 1 defect, (the three, four and five finger gestures) 
     if count_defects > 1:
         return False
-    
-    # Draw the palm center for debugging
-    palm_center = (cx, cy)
-    cv2.circle(drawing, palm_center, 5, (255, 80, 255), -1)
-
-    
-    ## draw vertical line at center of the palm for debugging
-    cv2.line(drawing, (cx, cy), (cx, 0), (255, 255), 2)  # Yellow vertical line
+    features = as_features(contour)
+    palm_center = features.palm_center
+    if palm_center is None:
+        return False
     
     ## Find the furthest points (fingertips) in each half of the hand
     ## then check if they are above the palm center and that each fingertip is far from each other
     ## we also check if one of the fingertips is  is above the other (index and pinky height difference)
-    left_furthest = None
-    right_furthest = None
-    max_left_dist = 0
-    max_right_dist = 0
-
-    for point in contour:
-        ## converts to (x, y) format
-        point = tuple(point[0])  
-        dist_to_palm = np.linalg.norm(np.array(point) - np.array(palm_center))
-
-        if point[1] < palm_center[1]:  # Consider only points above the palm center
-            if point[0] < cx:  # Point in the left half (pinky)
-                if dist_to_palm > max_left_dist:
-                    max_left_dist = dist_to_palm
-                    left_furthest = point
-            else:  # Point in the right half (index)
-                if dist_to_palm > max_right_dist:
-                    max_right_dist = dist_to_palm
-                    right_furthest = point
-
-    # Draw fingertips points
-    if left_furthest:
-        cv2.circle(drawing, left_furthest, 10, (0, 255, 0), -1)  
-    if right_furthest:
-        cv2.circle(drawing, right_furthest, 10, (255, 0, 0), -1)  
-
+    (left_furthest, max_left_dist), (right_furthest, max_right_dist) = features.rock_on_tips
     
     if left_furthest and right_furthest:
         if (
@@ -204,24 +420,57 @@ def is_rock_on(contour, drawing, cx, cy, count_defects):
     return False
 
 
+def draw_pointing_direction(frame, contour):
+    """
+    Debug overlay of detect_pointing_direction: palm center, fingertip and the line between them.
+    Args:
+        frame: The frame to draw on(not the thresholded).
+        contour: The contour of the hand (or its ContourFeatures).
+    """
+    features = as_features(contour)
+    palm_center = features.palm_center
+    if palm_center is None:
+        return
+    cv2.circle(frame, palm_center, 5, (255, 0, 0), -1)
+    if features.fingertip is not None:
+        fingertip, _ = features.fingertip
+        cv2.circle(frame, fingertip, 10, (0, 255, 0), -1)
+        cv2.line(frame, palm_center, fingertip, (255, 0, 0), 2)
+
+
+def draw_rock_on(drawing, contour):
+    """
+    Debug overlay of is_rock_on: palm center, vertical palm line and the fingertip of each half.
+    Args:
+        drawing: The image to draw on.
+        contour: The contour of the hand (or its ContourFeatures).
+    """
+    features = as_features(contour)
+    palm_center = features.palm_center
+    if palm_center is None:
+        return
+    cx, cy = palm_center
+    cv2.circle(drawing, palm_center, 5, (255, 80, 255), -1)
+    cv2.line(drawing, (cx, cy), (cx, 0), (255, 255), 2)  # Yellow vertical line
+
+    (left_furthest, _), (right_furthest, _) = features.rock_on_tips
+    if left_furthest:
+        cv2.circle(drawing, left_furthest, 10, (0, 255, 0), -1)  
+    if right_furthest:
+        cv2.circle(drawing, right_furthest, 10, (255, 0, 0), -1)  
+
+
 def get_palm_center(contour):
-    moments = cv2.moments(contour)
-    if moments['m00'] != 0:
-        cx = int(moments['m10'] / moments['m00'])  
-        cy = int(moments['m01'] / moments['m00'])  
-        return (cx, cy)
-    else:
-        return None
+    return as_features(contour).palm_center
     
 def calcSolidity(contour):
-        x, y, w, h = cv2.boundingRect(contour)
-        rect_area = w * h
-        contour_area = cv2.contourArea(contour)
-        return contour_area / rect_area if rect_area != 0 else 0
+        return as_features(contour).solidity
 
 
 def filterDefects( defects, contour):
         try:
+            if isinstance(contour, ContourFeatures):
+                contour = contour.contour
             filtered_defects= []
             count_defects = 0
             for defect in defects:
@@ -236,4 +485,66 @@ def filterDefects( defects, contour):
             
             return filtered_defects,count_defects 
         except Exception as e:
-            print(e)
\ No newline at end of file
+            print(e)
+
+
+def classify_gesture(features):
+    """
+    Decides the gesture of a hand from its contour features, nothing is drawn (see draw_gesture_overlay).
+    Args:
+        features: ContourFeatures of the hand contour.
+
+    Returns:
+        tuple: (gesture, direction)
+    """
+    count_defects = features.count_defects
+    direction = detect_pointing_direction(features)
+    solidity = features.solidity
+
+    if is_rock_on(features, count_defects) == True and direction != "oneFingerLeft" and direction != "oneFingerRight" and solidity <= 0.6:
+        gesture = "rockOn"
+    elif count_defects == 0:
+        if solidity > 0.6:  # Fist: High solidity (compact shape)
+            gesture = "fist"
+        else:  # hand with one finger pointing
+            gesture = "oneFinger"
+    elif count_defects == 1:
+        gesture = "twoFinger"
+    elif count_defects == 2:
+        gesture = "threeFinger"
+    elif count_defects == 3:
+        gesture = "fourFinger"
+    elif count_defects == 4:
+        gesture = "fiveFinger"
+    else:
+        gesture = "UNKNOWN"
+
+    return gesture, direction
+
+
+def draw_gesture_overlay(frame, drawing, features):
+    """
+    Optional debug overlay of everything classify_gesture looked at.
+    Args:
+        frame: The frame to draw the pointing direction on.
+        drawing: The image to draw the contour, hull, defects and rock on points on.
+        features: ContourFeatures of the hand contour.
+    """
+    contour = features.contour
+    cv2.drawContours(drawing, [contour], -1, (0, 255, 0), 1)
+    cv2.drawContours(drawing, [features.hull], -1, (0, 0, 255), 1)
+
+    # Draw filtered convexity defects (approximately 90 degrees)
+    for defect in features.filtered_defects:
+        start_idx, end_idx, far_idx, depth = defect
+        start = tuple(contour[start_idx][0])
+        end = tuple(contour[end_idx][0])
+        far = tuple(contour[far_idx][0])
+        cv2.line(drawing, start, end, (255, 0, 0), 1)  # Blue line for defect
+        cv2.circle(drawing, far, 5, (0, 255, 255), -1)  # Yellow circle for defect point
+
+    if features.palm_center is not None:
+        cv2.circle(drawing, features.palm_center, 5, (0, 0, 255), -1)
+    if features.count_defects <= 1:
+        draw_rock_on(drawing, features)
+    draw_pointing_direction(frame, features)
@@ -0,0 +1,194 @@
+import threading
+import time
+
+from opencvExp import gesture_recognition_loop
+
+
+class RecognitionState:
+    """
+    Latest result of the recognition loop, written by the loop thread and read by the server.
+
+    Every read returns a copy taken under the lock, so a request never sees a half updated result.
+    When the gesture, direction, stable gesture or motion changes, or an action fires, the new
+    state is also published as an event to the EventBroadcaster, and so are the enter and exit
+    events of the stable gestures.
+
+    Args:
+        events: EventBroadcaster the changes are published to, None for no events.
+    """
+
+    def __init__(self, events=None):
+        self.events = events
+        self._lock = threading.Lock()
+        self._state = {}
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._state = {
+                "gesture": "UNKNOWN",
+                "direction": "UNKNOWN",
+                "stable_gesture": "UNKNOWN",
+                "stable_direction": "UNKNOWN",
+                "dwell_s": 0.0,
+                "hands": [],
+                "motion_detected": "UNKNOWN",
+                "motion_last_detected": "UNKNOWN",
+                "confidence": 0.0,
+                "action": None,
+                "action_last": None,
+                "latency_ms": None,
+                "timings_ms": {},
+                "frame_seq": 0,
+                "frames_processed": 0,
+                "captured_at": None,
+                "timestamp": None,
+            }
+
+    def update(self, gesture, direction, motion_detected, latency_ms=None, frame_seq=0,
+               timings=None, action=None, capture_timestamp=None, stable=None, gesture_events=(), hands=None):
+        """
+        Records the decision made on a frame.
+
+        Args:
+            gesture: Gesture of the frame, "UNKNOWN" without a hand.
+            direction: Pointing direction of a oneFinger gesture.
+            motion_detected: Motion that ended on this frame, None or "UNKNOWN" without one.
+            latency_ms: Time from capture to decision.
+            frame_seq: Sequence number of the frame in the FrameSource.
+            timings: Milliseconds spent in each stage of the frame (captureFunc.StageTimer).
+            action: Action fired on this frame, None if none.
+            capture_timestamp: time.perf_counter() of the capture (FramePacket.timestamp).
+            stable: GestureStabilizer.status() of the frame, None to leave the stable gesture as is.
+            gesture_events: stabilizerFunc.GestureEvent of the frame, the enters and exits are published.
+            hands: HandTracker.status() in multi hand mode, None otherwise.
+        """
+        now = time.time()
+        if motion_detected is None:
+            motion_detected = "UNKNOWN"
+        with self._lock:
+            state = self._state
+            changed = (gesture != state["gesture"] or direction != state["direction"]
+                       or motion_detected != state["motion_detected"])
+            if stable is not None:
+                changed = changed or stable["stable_gesture"] != state["stable_gesture"] or stable["stable_direction"] != state["stable_direction"]
+                ## the share of the vote window that agrees with this frame, a flickering gesture scores low
+                state.update(stable)
+            if hands is not None:
+                ## a hand appearing, leaving or changing its stable gesture is news, its box moving is not
+                summary = [(hand["id"], hand["stable_gesture"], hand["motion_detected"]) for hand in hands]
+                changed = changed or summary != [(hand["id"], hand["stable_gesture"], hand["motion_detected"]) for hand in state["hands"]]
+                state["hands"] = hands
+            state["gesture"] = gesture
+            state["direction"] = direction
+            state["motion_detected"] = motion_detected
+            ## the last real motion stays until another one is detected
+            if motion_detected != "UNKNOWN":
+                state["motion_last_detected"] = motion_detected
+            state["action"] = action
+            if action is not None:
+                state["action_last"] = action
+            state["latency_ms"] = latency_ms
+            state["timings_ms"] = timings or {}
+            state["frame_seq"] = frame_seq
+            state["frames_processed"] += 1
+            ## perf_counter has no epoch, the capture time is placed relative to now
+            state["captured_at"] = now - (time.perf_counter() - capture_timestamp) if capture_timestamp is not None else None
+            state["timestamp"] = now
+            snapshot = dict(state) if changed or action is not None else None
+
+        if self.events is None:
+            return
+        for event in gesture_events:
+            if event.kind != "hold":
+                self.events.publish(event.kind, {"gesture": event.gesture, "direction": event.direction or "UNKNOWN",
+                                                 "dwell_s": event.dwell, "timestamp": now})
+        if snapshot is not None:
+            self.events.publish("action" if action is not None else "gesture", snapshot)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._state)
+
+
+class RecognitionEngine:
+    """
+    Owns the camera and runs gesture_recognition_loop on a background thread.
+
+    Args:
+        broadcaster: FrameBroadcaster the annotated frames are published to, None for no stream.
+        events: EventBroadcaster the recognition events are published to, None for no events.
+    """
+
+    def __init__(self, broadcaster=None, events=None):
+        self.broadcaster = broadcaster
+        self.events = events
+        self.state = RecognitionState(events)
+        self.started_at = None
+        self.stopped_at = None
+        self.error = None
+        # set once stop() was called, so a poller does not start the engine again behind the user's back
+        self.stopped_by_user = False
+
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, **loop_arguments):
+        """
+        Starts the recognition loop with the given gesture_recognition_loop arguments.
+
+        Returns:
+            bool: False if the engine was already running.
+        """
+        with self._lock:
+            if self.is_running():
+                return False
+            self._stop_event = threading.Event()
+            self.state.reset()
+            self.error = None
+            self.started_at = time.time()
+            self.stopped_at = None
+            self.stopped_by_user = False
+            arguments = dict(loop_arguments, safe_to_run=True, broadcaster=self.broadcaster,
+                             stop_event=self._stop_event, state=self.state)
+            self._thread = threading.Thread(target=self._run, args=(arguments,), name="RecognitionEngine", daemon=True)
+            self._thread.start()
+        if self.events is not None:
+            self.events.publish("engine", self.status())
+        return True
+
+    def stop(self, timeout=5.0):
+        """Asks the loop to stop and waits for it to release the camera."""
+        with self._lock:
+            self.stopped_by_user = True
+            self._stop_event.set()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _run(self, arguments):
+        try:
+            gesture_recognition_loop(**arguments)
+        except Exception as e:
+            print(f"RecognitionEngine: recognition loop failed: {e}")
+            self.error = str(e)
+        finally:
+            self.stopped_at = time.time()
+            if self.events is not None:
+                ## the thread is still alive while it reports its own end
+                self.events.publish("engine", dict(self.status(), running=False))
+
+    def status(self):
+        snapshot = self.state.snapshot()
+        return {
+            "running": self.is_running(),
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+            "error": self.error,
+            "frames_processed": snapshot["frames_processed"],
+            "latency_ms": snapshot["latency_ms"],
+        }
@@ -0,0 +1,278 @@
+import numpy as np
+
+from customAlgos import ContourFeatures, classify_gesture, largest_contour
+from motionFunc import MotionRecognizer
+from segmenterFunc import segmenter_hands
+from stabilizerFunc import GestureStabilizer
+from trackFunc import AlphaBetaFilter
+
+# Which track is the dominant hand, the one bound to the regular mappings:
+# "first" the hand that has been tracked the longest, "right" / "left" the one on that side of the
+# (mirrored) frame, so the user's right or left hand
+DOMINANT_HANDS = ("first", "right", "left")
+# Boxes overlapping a predicted box by at least this IoU are matched to its track
+MIN_IOU = 0.1
+# Frames a track coasts on its prediction without a matching box before it is dropped
+MAX_MISSED_FRAMES = 5
+
+
+def box_iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes."""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    w = min(ax + aw, bx + bw) - max(ax, bx)
+    h = min(ay + ah, by + bh) - max(ay, by)
+    if w <= 0 or h <= 0:
+        return 0.0
+    intersection = w * h
+    return intersection / float(aw * ah + bw * bh - intersection)
+
+
+class HandTrack:
+    """
+    One hand followed across frames, with its own gesture and motion state.
+
+    Args:
+        track_id: Number of the track, never reused while the tracker lives.
+        box: (x, y, w, h) the hand was first found at.
+        frame: Frame counter of the tracker when it was found.
+        alpha, beta, max_coast: AlphaBetaFilter of the box center and size.
+    """
+
+    def __init__(self, track_id, box, frame, alpha=0.7, beta=0.3, max_coast=MAX_MISSED_FRAMES):
+        self.id = track_id
+        self.box = box
+        self.role = "secondary"
+        self.frames_seen = 0
+        self.filter = AlphaBetaFilter(alpha, beta, max_coast)
+        self.stabilizer = GestureStabilizer()
+        self.motion = MotionRecognizer()
+        self.reset_state()
+        self.observe_box(box, frame)
+
+    def reset_state(self):
+        """Forgets the gestures and the trajectory, e.g. when the track changes role."""
+        self.stabilizer.reset()
+        self.motion.reset()
+        self.gesture = "UNKNOWN"
+        self.direction = "UNKNOWN"
+        self.motion_detected = None
+        self.events = []
+        # hand mask of the ROI on the current frame, None when the track is coasting
+        self.mask = None
+
+    def predicted_box(self, frame):
+        cx, cy, w, h = self.filter.predict(frame)
+        w, h = max(1.0, w), max(1.0, h)
+        return (int(round(cx - w / 2)), int(round(cy - h / 2)), int(round(w)), int(round(h)))
+
+    def observe_box(self, box, frame):
+        x, y, w, h = box
+        self.filter.update((x + w / 2, y + h / 2, w, h), frame)
+        self.box = box
+        self.frames_seen += 1
+
+    def status(self, timestamp):
+        return dict(self.stabilizer.status(timestamp), id=self.id, role=self.role, box=list(self.box),
+                    gesture=self.gesture, direction=self.direction, motion_detected=self.motion_detected or "UNKNOWN")
+
+
+class HandTracker:
+    """
+    Keeps up to max_hands hand tracks with stable IDs across frames.
+
+    Every frame all the hand candidates are matched to the tracks: by IoU with the box each track
+    predicts for the frame (greedy, best overlap first), then the boxes left over by nearest
+    centroid within a box size of the prediction. The boxes still left start new tracks while
+    there is room, a track without a box coasts for max_missed frames before it is dropped.
+
+    The dominant track is the primary hand: its masks go down the regular single hand path of the
+    recognition loop (segment returns them like segmenterFunc.segmenter), the gesture and motion
+    state there is reset when another track becomes primary. The other tracks are recognized by
+    recognize_secondary, each with its own GestureStabilizer and MotionRecognizer.
+
+    Args:
+        max_hands: Number of hands tracked at once.
+        dominant_hand: One of DOMINANT_HANDS.
+        min_iou: Overlap a box needs with a prediction to be matched by IoU.
+        max_missed: Frames a track survives without a box.
+    """
+
+    def __init__(self, max_hands=2, dominant_hand="first", min_iou=MIN_IOU, max_missed=MAX_MISSED_FRAMES):
+        self.max_hands = max_hands
+        self.dominant_hand = dominant_hand
+        self.min_iou = min_iou
+        self.max_missed = max_missed
+        self.tracks = []
+        self.primary = None
+        self.frame = 0
+        self.tracks_started = 0
+        # tracks dropped after coasting for max_missed frames
+        self.tracks_lost = 0
+        self.primary_changes = 0
+        # stabilizer settings given to every track, see configure_stabilizers
+        self._stabilizer_settings = {}
+
+    def configure_stabilizers(self, **settings):
+        """Sets window, min_votes, enter_dwell... on the GestureStabilizer of every track, current and future."""
+        self._stabilizer_settings = settings
+        for track in self.tracks:
+            self._configure(track)
+
+    def _configure(self, track):
+        for name, value in self._stabilizer_settings.items():
+            setattr(track.stabilizer, name, value)
+
+    def update(self, boxes):
+        """
+        Matches the boxes of a frame to the tracks.
+
+        Args:
+            boxes: (x, y, w, h) of the hands found on the frame.
+
+        Returns:
+            list: (track, index of its box in boxes) of the tracks matched on this frame.
+        """
+        self.frame += 1
+        predictions = [track.predicted_box(self.frame) for track in self.tracks]
+        unmatched_tracks = set(range(len(self.tracks)))
+        unmatched_boxes = set(range(len(boxes)))
+        matches = []
+
+        ## greedy assignment, there are only a handful of tracks and boxes
+        pairs = sorted(((box_iou(predictions[t], boxes[b]), t, b) for t in unmatched_tracks for b in unmatched_boxes), reverse=True)
+        for iou, t, b in pairs:
+            if iou < self.min_iou:
+                break
+            if t in unmatched_tracks and b in unmatched_boxes:
+                matches.append((t, b))
+                unmatched_tracks.discard(t)
+                unmatched_boxes.discard(b)
+
+        pairs = []
+        for t in unmatched_tracks:
+            px, py, pw, ph = predictions[t]
+            for b in unmatched_boxes:
+                x, y, w, h = boxes[b]
+                distance = np.hypot((x + w / 2) - (px + pw / 2), (y + h / 2) - (py + ph / 2))
+                if distance <= max(pw, ph):
+                    pairs.append((distance, t, b))
+        for _, t, b in sorted(pairs):
+            if t in unmatched_tracks and b in unmatched_boxes:
+                matches.append((t, b))
+                unmatched_tracks.discard(t)
+                unmatched_boxes.discard(b)
+
+        for t, b in matches:
+            self.tracks[t].observe_box(boxes[b], self.frame)
+        kept = []
+        for t, track in enumerate(self.tracks):
+            if t in unmatched_tracks:
+                track.mask = None
+                if not track.filter.miss():
+                    ## a flickering candidate starts and loses tracks all the time, only counted
+                    self.tracks_lost += 1
+                    continue
+                ## the box follows the prediction, so the overlay and the next match stay close
+                track.box = track.predicted_box(self.frame)
+            kept.append(track)
+        matched = [(self.tracks[t], b) for t, b in matches]
+
+        ## boxes come best scored first, the best ones start the new tracks
+        for b in sorted(unmatched_boxes):
+            if len(kept) >= self.max_hands:
+                break
+            track = HandTrack(self.tracks_started, boxes[b], self.frame, max_coast=self.max_missed)
+            self._configure(track)
+            self.tracks_started += 1
+            kept.append(track)
+            matched.append((track, b))
+        self.tracks = kept
+        self._choose_primary()
+        return matched
+
+    def _choose_primary(self):
+        previous = self.primary
+        if not self.tracks:
+            self.primary = None
+        elif self.dominant_hand == "right":
+            self.primary = max(self.tracks, key=lambda track: track.box[0] + track.box[2] / 2)
+        elif self.dominant_hand == "left":
+            self.primary = min(self.tracks, key=lambda track: track.box[0] + track.box[2] / 2)
+        else:
+            self.primary = min(self.tracks, key=lambda track: track.id)
+        for track in self.tracks:
+            role = "primary" if track is self.primary else "secondary"
+            if track.role != role:
+                ## the state a track built in one role does not carry over to the other
+                track.role = role
+                track.reset_state()
+        if self.primary is not previous:
+            self.primary_changes += 1
+
+    def segment(self, capturedFrame, mode='HSV', increase_ratio=0.25, processing_scale=1.0, background=None):
+        """
+        Finds the hands of a frame and updates the tracks.
+
+        Returns:
+            tuple: The primary hand's masks like segmenterFunc.segmenter returns them: (hand mask of
+                   the ROI, ROI, preprocessed frame, hand mask in full frame coordinates, ROI box), or
+                   (skin mask of the frame, preprocessed frame) when the primary hand is not on it.
+        """
+        hands, preprocessed, thresh_frame = segmenter_hands(capturedFrame, mode, increase_ratio, self.max_hands,
+                                                            processing_scale, background)
+        primary_result = None
+        for track, b in self.update([hand[0] for hand in hands]):
+            box, hand, roi, isolated_hand_mask = hands[b]
+            track.mask = hand
+            if track is self.primary:
+                primary_result = (hand, roi, preprocessed, isolated_hand_mask, box)
+        if primary_result is None:
+            return thresh_frame, preprocessed
+        return primary_result
+
+    def recognize_secondary(self, frame_size, timestamp):
+        """
+        Classifies the gesture and follows the motion of every track but the primary one.
+
+        Args:
+            frame_size: (width, height) of the frame, for the motion thresholds.
+            timestamp: Capture time of the frame (FramePacket.timestamp).
+
+        Returns:
+            list: The secondary tracks, with gesture, direction, motion_detected and the
+                  GestureEvent list of this frame in events.
+        """
+        secondary = [track for track in self.tracks if track is not self.primary]
+        for track in secondary:
+            track.gesture, track.direction, track.motion_detected = "UNKNOWN", "UNKNOWN", None
+            contour = largest_contour(track.mask) if track.mask is not None else None
+            if contour is not None:
+                features = ContourFeatures(contour)
+                if features.palm_center is not None:
+                    track.gesture, track.direction = classify_gesture(features)
+                    ## the ROI mask contour offset by its box is the contour in the full frame
+                    x, y, _, _ = track.box
+                    track.motion_detected = track.motion.add((features.palm_center[0] + x, features.palm_center[1] + y),
+                                                             frame_size, timestamp)
+            else:
+                track.motion.miss()
+            track.events = track.stabilizer.update(track.gesture, track.direction, timestamp)
+        return secondary
+
+    def status(self, timestamp, primary_state=None):
+        """
+        The tracks as dicts for the server, primary first.
+
+        Args:
+            timestamp: Capture time of the frame.
+            primary_state: gesture, direction, motion_detected and GestureStabilizer.status() of the
+                           dominant hand, which the recognition loop follows itself.
+        """
+        states = []
+        for track in sorted(self.tracks, key=lambda track: track.role != "primary"):
+            state = track.status(timestamp)
+            if track is self.primary and primary_state is not None:
+                state.update(primary_state)
+            states.append(state)
+        return states
@@ -0,0 +1,256 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+# How enhance_frame evens out the lighting of a frame
+#   "histogram": global histogram equalization of the luma
+#   "clahe": contrast limited adaptive histogram equalization of the luma
+#   "temporal": global histogram equalization with a table only recomputed when the lighting changes
+LIGHTING_NORMALIZATIONS = ("histogram", "clahe", "temporal")
+DEFAULT_LIGHTING_NORMALIZATION = "histogram"
+# Row bands of a CLAHE pass processed in parallel
+CLAHE_WORKERS = min(4, os.cpu_count() or 1)
+
+lighting_normalization = DEFAULT_LIGHTING_NORMALIZATION
+_clahe_engines = {}
+_temporal_normalizer = None
+# Thread pool shared by every ClaheEngine that splits its work in row bands
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def set_lighting_normalization(mode):
+    """Selects the lighting normalization of enhance_frame, unknown names fall back to the default."""
+    global lighting_normalization, _temporal_normalizer
+    if mode not in LIGHTING_NORMALIZATIONS:
+        print(f"lightingFunc: unknown lighting normalization {mode}, using {DEFAULT_LIGHTING_NORMALIZATION}")
+        mode = DEFAULT_LIGHTING_NORMALIZATION
+    lighting_normalization = mode
+    ## a new session starts from a fresh table
+    _temporal_normalizer = None
+
+
+def get_lighting_normalization():
+    return lighting_normalization
+
+
+def get_clahe_engine(tile_grid_size=8, clip_limit=2.0):
+    """Returns the ClaheEngine of these parameters, its per shape layouts are kept between frames."""
+    key = (tile_grid_size, clip_limit)
+    engine = _clahe_engines.get(key)
+    if engine is None:
+        engine = ClaheEngine(tile_grid_size, clip_limit, CLAHE_WORKERS)
+        _clahe_engines[key] = engine
+    return engine
+
+
+def reset_temporal_normalizer():
+    """Drops the table and luma reference of the frame stream, e.g. when the frames come from another camera."""
+    global _temporal_normalizer
+    _temporal_normalizer = None
+
+
+def get_temporal_normalizer():
+    """Returns the TemporalNormalizer of the frame stream, created on first use."""
+    global _temporal_normalizer
+    if _temporal_normalizer is None:
+        _temporal_normalizer = TemporalNormalizer()
+    return _temporal_normalizer
+
+
+def get_executor(workers):
+    """Returns a thread pool of at least the given size, created on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None or _executor._max_workers < workers:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lighting")
+        return _executor
+
+
+class ClaheEngine:
+    """
+    Contrast limited adaptive histogram equalization of a single uint8 channel.
+
+    The histograms of all tiles are built with a single bincount and the clipped CDF lookup
+    tables of all tiles are computed at once. The tables are laid out as one float image with
+    a row per tile row and, for every value, the tables of a tile row side by side; blending a
+    pixel bilinearly between its four nearest tiles is then a single bilinear cv2.remap gather
+    at (value * tiles + tile x, tile y), so there are no blocks at the tile borders. The gather
+    can be split in row bands over a thread pool.
+
+    Args:
+        tile_grid_size: Number of tiles along each axis.
+        clip_limit: Histogram bins are clipped to clip_limit times the mean bin count of a tile.
+        workers: Number of row bands processed in parallel, 1 to stay on the calling thread.
+    """
+
+    def __init__(self, tile_grid_size=8, clip_limit=2.0, workers=1):
+        self.tile_grid_size = tile_grid_size
+        self.clip_limit = clip_limit
+        self.workers = workers
+        # per image shape: tile ids of the pixels and their position on the tile grid
+        self._layouts = {}
+
+    def _layout(self, shape):
+        layout = self._layouts.get(shape)
+        if layout is not None:
+            return layout
+        ## ROI shapes change every frame, only keep the layouts of a few recent shapes
+        if len(self._layouts) >= 4:
+            self._layouts.clear()
+
+        height, width = shape
+        grid = self.tile_grid_size
+        tile_height = -(-height // grid)
+        tile_width = -(-width // grid)
+        rows = np.arange(height)
+        cols = np.arange(width)
+
+        ## first bin of each pixel's tile in the flattened (tile, 256) histograms
+        tile_rows = np.minimum(rows // tile_height, grid - 1)
+        tile_cols = np.minimum(cols // tile_width, grid - 1)
+        hist_base = ((tile_rows[:, None] * grid + tile_cols[None, :]) * 256).astype(np.intp)
+        tile_area = np.bincount(tile_rows, minlength=grid)[:, None] * np.bincount(tile_cols, minlength=grid)[None, :]
+
+        ## position of every pixel relative to the tile centers as cv2.createCLAHE does it,
+        ## clamped so the pixels past the outer centers only use the outer tiles
+        tile_y = np.clip(rows / tile_height - 0.5, 0, grid - 1).astype(np.float32)
+        tile_x = np.clip(cols / tile_width - 0.5, 0, grid - 1).astype(np.float32)
+        layout = {
+            "hist_base": hist_base,
+            "tile_area": tile_area.ravel(),
+            "map_y": np.repeat(tile_y[:, None], width, axis=1),
+            "tile_x": tile_x,
+        }
+        self._layouts[shape] = layout
+        return layout
+
+    def luts(self, channel, layout=None):
+        """Clipped and equalized lookup table of every tile, as a float32 (tiles, 256) array."""
+        if layout is None:
+            layout = self._layout(channel.shape)
+        tiles = self.tile_grid_size * self.tile_grid_size
+        hist = np.bincount((layout["hist_base"] + channel).ravel(), minlength=tiles * 256).reshape(tiles, 256)
+
+        ## clip every tile and spread what was cut off evenly over the bins, the remainder on the first bins
+        limit = np.maximum((self.clip_limit * layout["tile_area"] / 256.0).astype(np.int64), 1)[:, None]
+        excess = np.maximum(hist - limit, 0).sum(axis=1)
+        hist = np.minimum(hist, limit) + (excess // 256)[:, None]
+        hist += np.arange(256) < (excess % 256)[:, None]
+
+        cdf = np.cumsum(hist, axis=1).astype(np.float32)
+        cdf *= 255.0 / np.maximum(cdf[:, -1:], 1)
+        return cdf
+
+    def _blend(self, channel, table, layout, out, start, stop):
+        map_x = channel[start:stop].astype(np.float32)
+        map_x *= self.tile_grid_size
+        map_x += layout["tile_x"]
+        blended = cv2.remap(table, map_x, layout["map_y"][start:stop], cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+        cv2.convertScaleAbs(blended, dst=out[start:stop])
+
+    def apply(self, channel, out=None):
+        """
+        Args:
+            channel: uint8 single channel image.
+            out: Optional uint8 array of the channel shape to write the result to.
+
+        Returns:
+            numpy.ndarray: The equalized channel.
+        """
+        layout = self._layout(channel.shape)
+        grid = self.tile_grid_size
+        ## table[tile y, value * grid + tile x]: the tiles to blend of a value are neighbours
+        table = np.ascontiguousarray(self.luts(channel, layout).reshape(grid, grid, 256).transpose(0, 2, 1).reshape(grid, 256 * grid))
+        if out is None:
+            out = np.empty_like(channel)
+
+        height = channel.shape[0]
+        if self.workers <= 1 or height < 2 * self.workers:
+            self._blend(channel, table, layout, out, 0, height)
+            return out
+
+        bounds = np.linspace(0, height, self.workers + 1).astype(int)
+        executor = get_executor(self.workers)
+        jobs = [executor.submit(self._blend, channel, table, layout, out, start, stop)
+                for start, stop in zip(bounds[:-1], bounds[1:])]
+        for job in jobs:
+            job.result()
+        return out
+
+
+class TemporalNormalizer:
+    """
+    Histogram equalization of the luma with a lookup table reused across frames.
+
+    Scene brightness changes slowly, so the equalization table is only recomputed from a
+    subsampled histogram every refresh_interval frames, or as soon as the mean luma drifts
+    more than drift_threshold grey levels from the frame the table was made from.
+
+    The table is applied without the YCrCb round trip: changing Y alone shifts B, G and R by
+    the same amount, so every pixel gets lut[Y] - Y added to its three channels (with
+    saturation, like the conversion back to BGR).
+
+    Args:
+        refresh_interval: Maximum number of frames a table is used for.
+        drift_threshold: Change of the mean luma that forces a new table.
+        subsample: Step between the pixels the histogram and the mean are computed on.
+    """
+
+    def __init__(self, refresh_interval=30, drift_threshold=8.0, subsample=4):
+        self.refresh_interval = refresh_interval
+        self.drift_threshold = drift_threshold
+        self.subsample = subsample
+        self.refreshes = 0
+        self.frames = 0
+
+        self._reference_mean = None
+        self._age = 0
+        # lut[Y] - Y split in what to add and what to subtract, cv2.add / cv2.subtract saturate
+        self._brighten = None
+        self._darken = None
+
+    def refresh(self, luma):
+        """Computes the table that equalizes the histogram of luma, as cv2.equalizeHist would."""
+        sample = luma[::self.subsample, ::self.subsample]
+        hist = np.bincount(sample.ravel(), minlength=256)
+        cdf = np.cumsum(hist)
+        first = hist[np.flatnonzero(hist)[0]]
+        scale = 255.0 / max(cdf[-1] - first, 1)
+        lut = np.clip(np.rint((cdf - first) * scale), 0, 255)
+        delta = lut - np.arange(256)
+        self._brighten = np.maximum(delta, 0).astype(np.uint8)
+        self._darken = np.maximum(-delta, 0).astype(np.uint8)
+        self._reference_mean = float(sample.mean())
+        self._age = 0
+        self.refreshes += 1
+
+    def normalize(self, frame, update=True):
+        """
+        Args:
+            frame: BGR uint8 image.
+            update: Let this frame refresh the table, False to only apply the current one
+                    (for crops of a frame that was already normalized).
+
+        Returns:
+            numpy.ndarray: The normalized frame.
+        """
+        luma = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if update:
+            self.frames += 1
+            self._age += 1
+            if self._brighten is None or self._age > self.refresh_interval:
+                self.refresh(luma)
+            elif abs(float(luma[::self.subsample, ::self.subsample].mean()) - self._reference_mean) > self.drift_threshold:
+                self.refresh(luma)
+        elif self._brighten is None:
+            self.refresh(luma)
+
+        brighten = cv2.cvtColor(cv2.LUT(luma, self._brighten), cv2.COLOR_GRAY2BGR)
+        darken = cv2.cvtColor(cv2.LUT(luma, self._darken), cv2.COLOR_GRAY2BGR)
+        normalized = cv2.add(frame, brighten)
+        cv2.subtract(normalized, darken, dst=normalized)
+        return normalized
@@ -0,0 +1,167 @@
+import cv2
+import numpy as np
+
+# Structuring element shapes a pipeline step can use
+KERNEL_SHAPES = {
+    "ellipse": cv2.MORPH_ELLIPSE,
+    "rect": cv2.MORPH_RECT,
+    "cross": cv2.MORPH_CROSS,
+}
+
+# Clean-up chains of the skin masks.
+#   "frame": the skin mask of the whole frame, only used to find the hand candidates.
+#   "hand": the skin mask of the hand ROI, its contour is what the gesture is read from.
+#   "refined": run first on the frame skin mask narrowed by the adaptive skin model, which
+#              breaks up into specks that would each be scored as a candidate.
+# Steps are ("median", ksize), ("gaussian", ksize) or (operation, shape, ksize, iterations)
+# with operation one of erode, dilate, open, close. Morphology kernels are sized for full
+# resolution and shrink with the processing scale.
+MORPHOLOGY_PRESETS = {
+    ## the original chains, kept bit exact
+    "quality": {
+        "frame": [("close", "ellipse", 11, 4), ("gaussian", 5)],
+        "hand": [("median", 5), ("gaussian", 5),
+                 ("erode", "ellipse", 5, 2), ("dilate", "ellipse", 5, 3), ("erode", "ellipse", 5, 2),
+                 ("close", "ellipse", 3, 6)],
+        "refined": [("open", "ellipse", 5, 1)],
+    },
+    ## rectangular kernels: repeated passes collapse into a single separable pass
+    "performance": {
+        "frame": [("close", "rect", 11, 4), ("gaussian", 5)],
+        "hand": [("median", 5), ("gaussian", 5),
+                 ("erode", "ellipse", 5, 2), ("dilate", "ellipse", 5, 3), ("erode", "ellipse", 5, 2),
+                 ("close", "rect", 3, 6)],
+        "refined": [("open", "ellipse", 5, 1)],
+    },
+}
+DEFAULT_MORPHOLOGY_PRESET = "quality"
+
+morphology_preset = DEFAULT_MORPHOLOGY_PRESET
+_pipelines = {}
+
+
+def scaled_kernel_size(size, scale):
+    """Odd kernel size covering the same area of the scene on a frame resized by scale."""
+    return max(3, int(round(size * scale)) | 1)
+
+
+def set_morphology_preset(preset):
+    """Selects the preset used by get_morphology_pipeline, unknown names fall back to the default."""
+    global morphology_preset
+    if preset not in MORPHOLOGY_PRESETS:
+        print(f"morphFunc: unknown morphology preset {preset}, using {DEFAULT_MORPHOLOGY_PRESET}")
+        preset = DEFAULT_MORPHOLOGY_PRESET
+    morphology_preset = preset
+
+
+def get_morphology_pipeline(stage, scale=1.0, preset=None):
+    """
+    Returns the compiled pipeline of a stage ("frame" or "hand"), compiled once per preset and scale.
+
+    Args:
+        stage: Key of the chain in the preset.
+        scale: Processing scale of the masks the pipeline will run on.
+        preset: Name of the preset, the one selected with set_morphology_preset if None.
+    """
+    if preset is None:
+        preset = morphology_preset
+    key = (preset, stage, scale)
+    pipeline = _pipelines.get(key)
+    if pipeline is None:
+        pipeline = MorphologyPipeline(MORPHOLOGY_PRESETS[preset][stage], scale)
+        _pipelines[key] = pipeline
+    return pipeline
+
+
+class MorphologyPipeline:
+    """
+    A chain of blurs and morphological operations compiled once and run on every frame.
+
+    Structuring elements are built at compile time, the intermediate images go to buffers
+    reused between frames of the same shape, and passes that can be merged without changing
+    the result are: n passes (or consecutive passes) of a rectangle are one pass of a bigger
+    rectangle. Open and close are expanded to their erode and dilate passes, exactly like
+    cv2.morphologyEx runs them.
+
+    Args:
+        steps: List of steps, see MORPHOLOGY_PRESETS.
+        scale: Processing scale, morphology kernels are resized with scaled_kernel_size.
+    """
+
+    def __init__(self, steps, scale=1.0):
+        self.steps = self._compile(steps, scale)
+        # (ping, pong) buffers of each mask shape seen
+        self._buffers = {}
+
+    @staticmethod
+    def _compile(steps, scale):
+        expanded = []
+        for step in steps:
+            name = step[0]
+            if name in ("median", "gaussian"):
+                expanded.append((name, None, step[1], 1))
+                continue
+            _, shape, ksize, iterations = step
+            if scale != 1.0:
+                ksize = scaled_kernel_size(ksize, scale)
+            if name == "close":
+                expanded += [("dilate", shape, ksize, iterations), ("erode", shape, ksize, iterations)]
+            elif name == "open":
+                expanded += [("erode", shape, ksize, iterations), ("dilate", shape, ksize, iterations)]
+            else:
+                expanded.append((name, shape, ksize, iterations))
+
+        compiled = []
+        for name, shape, ksize, iterations in expanded:
+            if shape == "rect":
+                ## n passes of a k wide box are exactly one pass of a (k - 1) * n + 1 wide box
+                ksize, iterations = (ksize - 1) * iterations + 1, 1
+                previous = compiled[-1] if compiled else None
+                if previous is not None and previous[0] == name and previous[1] == "rect":
+                    ## same for two consecutive boxes
+                    ksize = previous[2] + ksize - 1
+                    compiled.pop()
+            compiled.append((name, shape, ksize, iterations))
+
+        return [(name, shape, ksize, iterations,
+                 None if shape is None else cv2.getStructuringElement(KERNEL_SHAPES[shape], (ksize, ksize)))
+                for name, shape, ksize, iterations in compiled]
+
+    def run(self, mask, out=None):
+        """
+        Args:
+            mask: uint8 single channel mask.
+            out: Optional array of the mask shape to write the result to, a new array otherwise.
+
+        Returns:
+            numpy.ndarray: The cleaned mask, never one of the reused buffers.
+        """
+        if out is None:
+            out = np.empty_like(mask)
+        if not self.steps:
+            out[...] = mask
+            return out
+
+        shape = mask.shape
+        buffers = self._buffers.get(shape)
+        if buffers is None:
+            ## ROI shapes change every frame, only keep the buffers of a few recent shapes
+            if len(self._buffers) >= 4:
+                self._buffers.clear()
+            buffers = (np.empty(shape, np.uint8), np.empty(shape, np.uint8))
+            self._buffers[shape] = buffers
+
+        src = mask
+        last = len(self.steps) - 1
+        for i, (name, _, ksize, iterations, kernel) in enumerate(self.steps):
+            dst = out if i == last else buffers[i % 2]
+            if name == "median":
+                cv2.medianBlur(src, ksize, dst=dst)
+            elif name == "gaussian":
+                cv2.GaussianBlur(src, (ksize, ksize), 0, dst=dst)
+            elif name == "erode":
+                cv2.erode(src, kernel, dst=dst, iterations=iterations)
+            elif name == "dilate":
+                cv2.dilate(src, kernel, dst=dst, iterations=iterations)
+            src = dst
+        return out
@@ -1,82 +1,207 @@
-# Centroid point buffer
-point_buffer = []
+import time
+
+import numpy as np
+
+from trackFunc import AlphaBetaFilter
+
+# Samples the trajectory ring buffer holds, more than a swipe window at the camera frame rate
+BUFFER_CAPACITY = 64
+
+# Swipes are judged over the last SWIPE_WINDOW seconds of the trajectory
+SWIPE_WINDOW = 0.5
+# Displacement over the window that counts as a swipe, as a fraction of the frame width / height
+SWIPE_MIN_DISPLACEMENT = 0.25
+# The swipe axis must move this many times more than the other one
+SWIPE_DOMINANCE = 1.5
+# Consecutive frames the swipe must still be seen on, a one frame segmentation glitch jumps back before that
+SWIPE_CONFIRM_FRAMES = 2
+# A single step longer than this (fraction of the frame) is a jump to another blob, the trajectory restarts there
+MAX_STEP = 0.4
+# Constant velocity filter of the palm center: weight of a new measurement in the position and in the velocity
+POSITION_ALPHA = 0.6
+POSITION_BETA = 0.2
+# Frames without a hand the filter coasts through before the trajectory is dropped
+MAX_COAST_FRAMES = 5
+
+
+class MotionRecognizer:
+    """
+    Recognizes swipes from the trajectory of the palm center, in O(1) per frame.
+
+    The points are kept normalized to the frame size with their timestamps in a preallocated
+    ring buffer. The start of the swipe window is a pointer that only moves forward, so the
+    displacement over the window is the newest sample minus the sample under the pointer,
+    without rescanning the trajectory. A swipe is reported when the displacement along one
+    axis reaches SWIPE_MIN_DISPLACEMENT and dominates the other axis on SWIPE_CONFIRM_FRAMES
+    consecutive frames: slow swipes spread over many frames are seen, a single jumping frame
+    is not.
+
+    The palm centers go through a constant velocity filter before they are stored, mask noise
+    is smoothed out and the velocity is the filter's estimate. A few frames without a hand are
+    coasted through (see miss), the trajectory is only dropped after MAX_COAST_FRAMES.
+
+    Args:
+        capacity: Size of the ring buffer.
+        window: Seconds of trajectory a swipe is judged over.
+        min_displacement: Displacement of a swipe, as a fraction of the frame size.
+        dominance: Ratio between the swipe axis and the other axis.
+        confirm_frames: Consecutive frames a swipe must be seen on before it is reported.
+        max_step: Step (fraction of the frame) after which the trajectory restarts.
+        alpha: Filter weight of a measured palm center, 1 to use the raw points.
+        beta: Filter weight of the prediction error in the velocity.
+        max_coast: Frames without a hand before the trajectory is dropped.
+    """
+
+    def __init__(self, capacity=BUFFER_CAPACITY, window=SWIPE_WINDOW, min_displacement=SWIPE_MIN_DISPLACEMENT,
+                 dominance=SWIPE_DOMINANCE, confirm_frames=SWIPE_CONFIRM_FRAMES, max_step=MAX_STEP,
+                 alpha=POSITION_ALPHA, beta=POSITION_BETA, max_coast=MAX_COAST_FRAMES):
+        self.capacity = capacity
+        self.window = window
+        self.min_displacement = min_displacement
+        self.dominance = dominance
+        self.confirm_frames = confirm_frames
+        self.max_step = max_step
+
+        # x, y (normalized, filtered) and timestamp of every sample
+        self._samples = np.zeros((capacity, 3), np.float64)
+        self.filter = AlphaBetaFilter(alpha, beta, max_coast)
+        # trajectories restarted because the hand jumped, reported with the loop statistics
+        self.jumps = 0
+        self.reset()
+
+    def reset(self):
+        """Forgets the trajectory, the next point starts a new one."""
+        self._count = 0
+        self._head = 0
+        self._tail = 0
+        self._candidate = None
+        self._candidate_frames = 0
+        self.filter.reset()
+
+    @property
+    def velocity(self):
+        """Filtered velocity of the palm in frame sizes per second, (0, 0) without a trajectory."""
+        return self.filter.velocity if self.filter.active else np.zeros(2)
+
+    def miss(self):
+        """No hand on this frame, the trajectory is dropped after max_coast of them in a row."""
+        if self._count and not self.filter.miss():
+            self.reset()
+
+    def __len__(self):
+        return self._count
+
+    def displacement(self):
+        """Normalized (dx, dy) between the start of the window and the newest sample."""
+        if self._count == 0:
+            return 0.0, 0.0
+        newest = self._samples[(self._head - 1) % self.capacity]
+        oldest = self._samples[self._tail]
+        return newest[0] - oldest[0], newest[1] - oldest[1]
+
+    def add(self, point, frame_size, timestamp=None):
+        """
+        Adds the palm center of a frame.
+
+        Args:
+            point: (x, y) in pixels.
+            frame_size: (width, height) of the frame the point is in.
+            timestamp: Seconds (time.perf_counter), now if None.
+
+        Returns:
+            str: "LEFT", "RIGHT", "UP" or "DOWN" when this frame completes a swipe, None otherwise.
+        """
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        x = point[0] / frame_size[0]
+        y = point[1] / frame_size[1]
+
+        if self._count:
+            previous = self._samples[(self._head - 1) % self.capacity]
+            if abs(x - previous[0]) > self.max_step or abs(y - previous[1]) > self.max_step:
+                self.jumps += 1
+                self.reset()
+        x, y = self.filter.update((x, y), timestamp)
+
+        ## a full buffer overwrites its oldest sample, the window start moves along
+        if self._count == self.capacity and self._tail == self._head:
+            self._tail = (self._tail + 1) % self.capacity
+        self._samples[self._head] = (x, y, timestamp)
+        self._head = (self._head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+        ## the window start only ever moves forward, O(1) per frame on average
+        newest = (self._head - 1) % self.capacity
+        while self._tail != newest and self._samples[self._tail, 2] < timestamp - self.window:
+            self._tail = (self._tail + 1) % self.capacity
+
+        direction = self._classify(*self.displacement())
+        if direction != self._candidate:
+            self._candidate = direction
+            self._candidate_frames = 0
+        if direction is None:
+            return None
+        self._candidate_frames += 1
+        if self._candidate_frames < self.confirm_frames:
+            return None
+        ## the swipe is consumed, the next one starts from here
+        self.reset()
+        return direction
+
+    def _classify(self, dx, dy):
+        if abs(dx) >= self.min_displacement and abs(dx) >= self.dominance * abs(dy):
+            return "RIGHT" if dx > 0 else "LEFT"
+        if abs(dy) >= self.min_displacement and abs(dy) >= self.dominance * abs(dx):
+            return "DOWN" if dy > 0 else "UP"
+        return None
+
+
+# Recognizer of the palm center trajectory used by the recognition loop
+recognizer = MotionRecognizer()
+# Swipe completed by the last point added, returned once by motion_track_points
+last_motion = None
 
-BUFFER_LIMIT = 40
-
-# Pixel deltas that if surpassed indicate movement
-X_THRESHOLD = 120
-Y_THRESHOLD = 120
-
-# Last detected consecutive points
-# They are only accessed when motion is successfully detected
-point_1 = 0,0
-point_2 = 0,0
 
 def motion_handle_buffer_reset():
-    global point_buffer
     print("Motion detected. Resetting point buffer.")
-    point_buffer.clear()
-
-def motion_add_point_to_buffer(point):
-    global point_buffer
-    point_buffer.append(point)
-
-    if len(point_buffer) > BUFFER_LIMIT:
-        print("Buffer limit exceeded. Resetting buffer but retaining last 4 points.")
-        point_buffer = point_buffer[-4:]
+    recognizer.reset()
 
-def motion_detected():
-    global point_buffer, point_1, point_2
 
-    # If the buffer has fewer than 2 points, no motion can be detected
-    if len(point_buffer) < 2:
-        return False
+def motion_reset():
+    """Forgets the trajectory, e.g. when another hand takes over (handsFunc)."""
+    global last_motion
+    recognizer.reset()
+    last_motion = None
 
-    for i in range(1, len(point_buffer)):
-        current_point = point_buffer[i]
-        previous_point = point_buffer[i - 1]
 
-        # Between each two consecutive points
-        move_x = abs(current_point[0] - previous_point[0])
-        move_y = abs(current_point[1] - previous_point[1])
+def motion_missed_point():
+    """Tells the recognizer the frame had no hand, it coasts through a few of them."""
+    recognizer.miss()
 
-        # If either X or Y movement exceeds the threshold, motion is detected
-        if move_x > X_THRESHOLD or move_y > Y_THRESHOLD:
-            point_1 = previous_point
-            point_2 = current_point
-            return True
 
-    return False  # No significant motion
+def motion_add_point_to_buffer(point, frame_size=(640, 480), timestamp=None):
+    """
+    Adds the palm center of a frame to the trajectory.
 
-def motion_detect_direction(prev_point, curr_point):
-    print(f"Previous point: {prev_point}, Current point: {curr_point}")
-    prev_x, prev_y = prev_point
-    curr_x, curr_y = curr_point
+    Args:
+        point: (x, y) in pixels.
+        frame_size: (width, height) of the frame, the swipe thresholds are fractions of it.
+        timestamp: Capture time of the frame (time.perf_counter), now if None.
+    """
+    global last_motion
+    motion = recognizer.add(point, frame_size, timestamp)
+    if motion is not None:
+        last_motion = motion
 
-    # Compare X positions
-    if curr_x > prev_x + X_THRESHOLD:
-        return "RIGHT"
-    elif curr_x < prev_x - X_THRESHOLD:
-        return "LEFT"
 
-    # Compare Y positions
-    elif curr_y > prev_y + Y_THRESHOLD:
-        return "DOWN"
-    elif curr_y < prev_y - Y_THRESHOLD:
-        return "UP"
+def motion_jumps():
+    """Number of times the trajectory restarted because the hand jumped to another blob."""
+    return recognizer.jumps
 
-    return "NO MOTION"
 
 def motion_track_points():
-    """Track the motion of points and detect motion direction based on the buffer."""
-    global point_buffer, point_1, point_2
-
-    if len(point_buffer) > 1:
-        # Was there a change in centroid of the hand that has surpassed the threshold?
-        if motion_detected():
-            # If yes, a motion has happened, lets see in which direction
-            motion_direction = motion_detect_direction(point_1, point_2)
-            if motion_direction != "NO MOTION":
-                print(f"Motion detected: {motion_direction}")
-                motion_handle_buffer_reset()
-                return motion_direction
\ No newline at end of file
+    """Returns the swipe completed since the last call, None if there was none."""
+    global last_motion
+    motion, last_motion = last_motion, None
+    if motion is not None:
+        print(f"Motion detected: {motion}")
+    return motion
@@ -1,22 +1,34 @@
 import cv2
 import numpy as np
 import math
-from segmenterFunc import segmenter
-from customAlgos import convexity_defects, angle_between_points, get_palm_center, is_rock_on, detect_pointing_direction, calcSolidity, filterDefects
-from motionFunc import motion_add_point_to_buffer, motion_handle_buffer_reset, motion_track_points
-from systemActions import perform_action
+import time
+from segmenterFunc import segmenter, RoiTracker
+from customAlgos import ContourFeatures, classify_gesture, draw_gesture_overlay, largest_contour
+from motionFunc import motion_add_point_to_buffer, motion_handle_buffer_reset, motion_jumps, motion_missed_point, motion_reset, motion_track_points
+from systemActions import ActionTable
+from stabilizerFunc import GestureStabilizer
+from handsFunc import HandTracker
+from captureFunc import FrameSource, LatencyMeter, StageTimer
+from skinFunc import AdaptiveSkinModel, set_adaptive_model
+from morphFunc import set_morphology_preset
+from lightingFunc import reset_temporal_normalizer, set_lighting_normalization
+from sceneFunc import BackgroundModel, MotionGate
+from configFunc import ConfigStore, changed_settings
 # debug related stuff
 # current_camera = 0 # default webcam
 pause = False
 quit = False
 
+# Number of processed frames between two latency reports
+LATENCY_REPORT_INTERVAL = 100
+# Longest wait for a frame while paused, the quit / stop checks run at least this often
+PAUSE_POLL_INTERVAL = 0.1
+
 # Initialize webcam
 
 def toggle_camera():
     # Using the global variables
-    global cap, g_current_camera
-    # Release the current camera
-    cap.release()
+    global source, g_current_camera
     
     # Switch between cameras
     if g_current_camera == 0:
@@ -24,8 +36,8 @@ def toggle_camera():
     else:
         g_current_camera = 0
 
-    # Reinitialize the capture with the new camera
-    cap = cv2.VideoCapture(g_current_camera)
+    # The capture thread reopens the camera before its next read
+    source.switch_camera(g_current_camera)
 
 def toggle_pause():
     global pause
@@ -37,45 +49,207 @@ def toggle_pause():
         print('System paused')
 
 def handle_key():
+    # Poll the keyboard once per frame, every extra waitKey blocks the loop
+    key = cv2.waitKey(1) & 0xFF
     # Exit on pressing 'q'
-    if cv2.waitKey(1) & 0xFF == ord('q'):
+    if key == ord('q'):
         global quit
         quit = True
     # Switch camera if 's' pressed
-    elif cv2.waitKey(1) & 0xFF == ord('s'):
+    elif key == ord('s'):
         toggle_camera()
-    elif cv2.waitKey(1) & 0xFF == ord('p'):
+    elif key == ord('p'):
         toggle_pause()
 
-cap = cv2.VideoCapture(0)
+source = None
 g_current_camera = 0
-def gesture_recognition_loop(gesture_mappings,direction_mappings,motion_mappings,debug=True,frame=None,current_camera=0,color_mode="HSV",increased_ratio=0.25, safe_to_run = False):
+def gesture_recognition_loop(gesture_mappings=None,direction_mappings=None,motion_mappings=None,debug=True,frame=None,current_camera=0,color_mode="HSV",increased_ratio=0.25, safe_to_run = False, enable_actions=False,
+                             tracking_mode=False, tracking_keyframe_interval=15, tracking_search_margin=0.5, tracking_max_area_change=2.0,
+                             processing_scale=1.0, adaptive_skin=False, adaptive_skin_decay=0.05,
+                             morphology_preset="quality", lighting_normalization="histogram",
+                             motion_gate=False, motion_gate_idle_after=3.0, motion_gate_idle_fps=5,
+                             background_subtraction=False, background_learning_rate=0.02,
+                             gesture_vote_window=5, gesture_min_votes=3, gesture_enter_dwell=0.1, gesture_exit_dwell=0.25,
+                             gesture_repeat_on_hold=True, gesture_repeat_delay=0.5,
+                             multi_hand=False, max_hands=2, dominant_hand="first", broadcaster=None,
+                             stop_event=None, state=None, config=None):
     if not safe_to_run:
         print("opencvExp: Autolaunch prevented!")
         print("opencvExp: Please set safe_to_run to True to run the gesture recognition loop.")
         return
     
-    global cap, g_current_camera
+    global source, g_current_camera, quit, pause
     
-    g_current_camera = current_camera
-    cap = cv2.VideoCapture(g_current_camera)
-    print(gesture_mappings)
+    # a previous run may have been quit or paused from the keyboard
+    quit = False
+    pause = False
+    # Settings and mappings are read from a ConfigStore (configFunc): the server's one, so its changes
+    # reach the running loop, or one made of the arguments when the loop is started on its own
+    if config is None:
+        config = ConfigStore({
+            "camera": current_camera, "color_mode": color_mode, "bounded_ratio": increased_ratio,
+            "tracking_mode": tracking_mode, "tracking_keyframe_interval": tracking_keyframe_interval,
+            "tracking_search_margin": tracking_search_margin, "tracking_max_area_change": tracking_max_area_change,
+            "processing_scale": processing_scale, "adaptive_skin": adaptive_skin, "adaptive_skin_decay": adaptive_skin_decay,
+            "morphology_preset": morphology_preset, "lighting_normalization": lighting_normalization,
+            "motion_gate": motion_gate, "motion_gate_idle_after": motion_gate_idle_after, "motion_gate_idle_fps": motion_gate_idle_fps,
+            "background_subtraction": background_subtraction, "background_learning_rate": background_learning_rate,
+            "gesture_vote_window": gesture_vote_window, "gesture_min_votes": gesture_min_votes,
+            "gesture_enter_dwell": gesture_enter_dwell, "gesture_exit_dwell": gesture_exit_dwell,
+            "gesture_repeat_on_hold": gesture_repeat_on_hold, "gesture_repeat_delay": gesture_repeat_delay,
+            "multi_hand": multi_hand, "max_hands": max_hands, "dominant_hand": dominant_hand,
+        }, {"gestureMappings": gesture_mappings or {}, "directionMappings": direction_mappings or {}, "motionMappings": motion_mappings or {}})
+    config_version = None
+    settings = None
+    # Frames are grabbed on their own thread, the loop always picks up the newest one
+    source = None
+    latency = LatencyMeter()
+    # Time spent in each stage of the current frame, reported with the recognition events
+    timer = StageTimer()
+    # Between keyframes only the area around the last hand box is searched
+    tracker = None
+    # Frames of a static scene are not processed, only compared with the previous one until something moves
+    gate = None
+    # Static skin coloured regions (faces, furniture) are removed from the skin mask
+    background = None
+    # Skin colours of the user learned from confident detections, carried over from previous sessions
+    skin_model = None
+    # Actions fire when a gesture is entered or held (stabilizerFunc), not on every frame it is seen on
+    stabilizer = GestureStabilizer()
+    # Up to max_hands hands with their own tracks, only the dominant one otherwise
+    hands = None
+    primary_changes = 0
+    last_seq = 0
+    # Camera the last frame came from, per camera state is dropped when it changes
+    frame_camera = None
+    frames_processed = 0
     while True:
-        # Capture the frame twice a second
+        # The settings are applied before the first frame, and again between two frames whenever
+        # the server changes them: only what a changed setting affects is rebuilt
+        if config.version != config_version:
+            previous = settings
+            config_version, settings, mappings = config.snapshot()
+            changed = changed_settings(previous, settings)
+            if previous is None:
+                print(mappings)
+            elif changed:
+                print(f"opencvExp: applying changed settings {sorted(changed)}")
+
+            if "camera" in changed:
+                g_current_camera = settings["camera"]
+                if source is None:
+                    source = FrameSource(g_current_camera).start()
+                else:
+                    ## the capture thread reopens the camera, the loop keeps running
+                    source.switch_camera(g_current_camera)
+            color_mode = settings["color_mode"]
+            increased_ratio = settings["bounded_ratio"]
+            processing_scale = settings["processing_scale"]
+            # the mappings compiled to direct lookups, a frame only looks its gesture up
+            action_table = ActionTable(mappings, repeat_on_hold=settings["gesture_repeat_on_hold"],
+                                       repeat_delay=settings["gesture_repeat_delay"])
+            stabilizer.window = settings["gesture_vote_window"]
+            stabilizer.min_votes = settings["gesture_min_votes"]
+            stabilizer.enter_dwell = settings["gesture_enter_dwell"]
+            stabilizer.exit_dwell = settings["gesture_exit_dwell"]
+            if "camera" in changed:
+                stabilizer.reset()
+
+            if changed & {"multi_hand", "camera"}:
+                hands = HandTracker(settings["max_hands"], settings["dominant_hand"]) if settings["multi_hand"] else None
+                primary_changes = 0
+            elif hands is not None:
+                hands.max_hands = settings["max_hands"]
+                hands.dominant_hand = settings["dominant_hand"]
+            if hands is not None:
+                # the other hands recognize their gestures like the dominant one, with their own mapping groups
+                hands.configure_stabilizers(window=stabilizer.window, min_votes=stabilizer.min_votes,
+                                            enter_dwell=stabilizer.enter_dwell, exit_dwell=stabilizer.exit_dwell)
+                secondary_action_table = ActionTable(mappings, repeat_on_hold=settings["gesture_repeat_on_hold"],
+                                                     repeat_delay=settings["gesture_repeat_delay"], hand="secondary")
+
+            if changed & {"tracking_mode", "processing_scale", "color_mode", "camera"}:
+                ## the tracked box belongs to the old frames
+                tracker = RoiTracker(settings["tracking_keyframe_interval"], settings["tracking_search_margin"],
+                                     settings["tracking_max_area_change"]) if settings["tracking_mode"] else None
+            elif tracker is not None:
+                tracker.keyframe_interval = settings["tracking_keyframe_interval"]
+                tracker.search_margin = settings["tracking_search_margin"]
+                tracker.max_area_change = settings["tracking_max_area_change"]
+
+            if changed & {"motion_gate", "camera"}:
+                gate = MotionGate(settings["motion_gate_idle_after"], settings["motion_gate_idle_fps"]) if settings["motion_gate"] else None
+            elif gate is not None:
+                gate.idle_after = settings["motion_gate_idle_after"]
+                gate.idle_fps = settings["motion_gate_idle_fps"]
+
+            if changed & {"background_subtraction", "camera"}:
+                background = BackgroundModel(settings["background_learning_rate"]) if settings["background_subtraction"] else None
+            elif background is not None:
+                background.learning_rate = settings["background_learning_rate"]
 
-        handle_key()
+            # Mask clean-up chains: "quality" keeps the original ones, "performance" trades some precision for speed
+            if "morphology_preset" in changed:
+                set_morphology_preset(settings["morphology_preset"])
+            # "clahe" evens out uneven lighting across the frame, "histogram" only the overall brightness,
+            # "temporal" does what "histogram" does with a table only recomputed when the lighting changes
+            if "lighting_normalization" in changed:
+                set_lighting_normalization(settings["lighting_normalization"])
+
+            if "adaptive_skin" in changed:
+                if skin_model is not None:
+                    skin_model.save()
+                    set_adaptive_model(None)
+                    skin_model = None
+                if settings["adaptive_skin"]:
+                    skin_model = AdaptiveSkinModel(decay=settings["adaptive_skin_decay"])
+                    if skin_model.load():
+                        print(f"AdaptiveSkinModel: restored {skin_model.updates} updates from the previous session")
+                    set_adaptive_model(skin_model)
+            elif skin_model is not None:
+                skin_model.decay = settings["adaptive_skin_decay"]
+
+        # the keys are read from the debug windows, there is nothing to poll without them
+        if debug:
+            handle_key()
         
-        if quit:
+        if quit or (stop_event is not None and stop_event.is_set()):
             print("Quitting...")
             break
         if pause:
+            # the paused frames are consumed unprocessed, waiting for them keeps the loop from spinning
+            packet = source.read(last_seq, PAUSE_POLL_INTERVAL)
+            if packet is not None:
+                last_seq = packet.seq
+            elif not source.is_running():
+                time.sleep(PAUSE_POLL_INTERVAL)
             continue
      
-        cv2.waitKey(50)
-        ret, frame = cap.read()
-        if not ret:
-            print("Failed to grab frame. Exiting...")
-            break
+        packet = source.read(last_seq)
+        if packet is None:
+            if not source.is_running():
+                print("Failed to grab frame. Exiting...")
+                break
+            continue
+        last_seq = packet.seq
+        frame = packet.frame
+        # the camera switch happens on the capture thread, the first frame of the new camera
+        # must not be normalized with the lighting table of the old one
+        if packet.camera != frame_camera:
+            frame_camera = packet.camera
+            reset_temporal_normalizer()
+        # every frame is checked as it arrives so the gate wakes up on the first one that moved,
+        # only the pipeline (and most preview refreshes) are skipped while idle
+        if gate is not None and not gate.check(frame):
+            if (debug or broadcaster is not None) and gate.preview_due():
+                idle_frame = cv2.flip(frame, 1)
+                if broadcaster is not None:
+                    broadcaster.publish(idle_frame)
+                if debug:
+                    cv2.imshow("Frame", idle_frame)
+            continue
+        frames_processed += 1
+        timer.start()
         frame = cv2.flip(frame, 1)
     
         # Draw the ROI rectangle
@@ -84,21 +258,33 @@ def gesture_recognition_loop(gesture_mappings,direction_mappings,motion_mappings
         # Apply image filtering and gesture recognition
         # roi, thresh, contours = imageFiltering(frame)
         frame = cv2.GaussianBlur(frame, (5, 5), 0)
-        results = segmenter(frame,color_mode,increased_ratio)
+        if hands is None:
+            results = segmenter(frame,color_mode,increased_ratio,tracker,processing_scale,background)
+        else:
+            # every hand found is matched to a track (handsFunc), the dominant one goes down the path below
+            results = hands.segment(frame,color_mode,increased_ratio,processing_scale,background)
+            if hands.primary_changes != primary_changes:
+                ## another hand became the dominant one, its gestures and motion start over
+                primary_changes = hands.primary_changes
+                stabilizer.reset()
+                motion_reset()
+        timer.mark("segment")
 
         # At start we may not have a hand in the frame
         if len(results) == 2:
             thresh, roi  = results
             full_frame_segmented = None 
+            hand_box = None
             capturedFrame = np.zeros_like(frame)  
+            if skin_model is not None:
+                skin_model.miss()
+            motion_missed_point()
         else:
-            thresh, roi,capturedFrame ,full_frame_segmented = results
-        contours, _ = cv2.findContours(thresh, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-        
-        # Find the contours of the thresholded hand in the context of the full frame
-        # Since I need the actual locations as well for my motion tracking
-        # - Karim
-        countoursFull , _ = cv2.findContours(full_frame_segmented, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+            thresh, roi,capturedFrame ,full_frame_segmented, hand_box = results
+        # Only the largest blob of the hand mask is traced (customAlgos.largest_contour),
+        # without a hand there is nothing to trace and the frame stays UNKNOWN
+        contour = largest_contour(thresh) if hand_box is not None else None
+        timer.mark("contours")
         
         drawing = np.zeros(roi.shape, np.uint8)
         drawing2 = np.zeros(roi.shape, np.uint8)
@@ -108,82 +294,96 @@ def gesture_recognition_loop(gesture_mappings,direction_mappings,motion_mappings
         motion_detected = "UNKNOWN"
         direction = "UNKNOWN"
         motion_last_detected = "UNKNOWN"
+        latency_ms = None
+        action = None
         try:
 
-            contour = max(contours, key=lambda c: cv2.contourArea(c), default=0)
-            contourFull = max(countoursFull, key=lambda c: cv2.contourArea(c), default=0)
+            # Hull, moments, defects... are computed once per contour and shared from here on
+            features = ContourFeatures(contour) if contour is not None else None
+            if features is None or features.palm_center is None:
+                # No hand on this frame, or nothing left of it to locate: gesture and motion stay UNKNOWN
+                if hand_box is not None:
+                    motion_missed_point()
+            else:
 
-            palmCenter = get_palm_center(contour)
-            palmCenterFull = get_palm_center(contourFull)
+                # The location of the hand in the context of the full frame
+                # Since I need the actual locations as well for my motion tracking
+                # - Karim
+                # it is the ROI contour moved by the ROI position, so the palm center is moved the same way
+                x, y = hand_box[:2]
+                palmCenterFull = (features.palm_center[0] + x, features.palm_center[1] + y)
 
-            # Add the centroid point of the hand (cx,cy) to a history 
-            motion_add_point_to_buffer((palmCenterFull[0], palmCenterFull[1]))
+                # Add the centroid point of the hand (cx,cy) to a history 
+                motion_add_point_to_buffer((palmCenterFull[0], palmCenterFull[1]), (frame.shape[1], frame.shape[0]), packet.timestamp)
 
-            cv2.circle(drawing, palmCenter, 5, (0, 0, 255), -1)
-            cv2.circle(full_frame_segmented, palmCenterFull, 5, (0, 0, 255), -1)
+                gesture, direction = classify_gesture(features)
+                timer.mark("classify")
+                if gate is not None:
+                    gate.report_hand(gesture != "UNKNOWN")
 
-            hull = cv2.convexHull(contour)
-            cv2.drawContours(drawing, [contour], -1, (0, 255, 0), 1)
-            cv2.drawContours(drawing2, [contourFull], -1, (0, 255, 0), 1)
-            cv2.drawContours(drawing, [hull], -1, (0, 0, 255), 1)
-    
-            hull_indices = cv2.convexHull(contour, returnPoints=False).flatten()
+                # Only a recognised gesture is trusted to tell which colours are the hand
+                if skin_model is not None and gesture != "UNKNOWN":
+                    skin_model.update(capturedFrame, full_frame_segmented)
+                    timer.mark("skin_model")
 
-            defects = convexity_defects(contour[:, 0, :], hull_indices)
-            
-            
-            # Filter defects with approximately 90 degrees
-            filtered_defects, count_defects = filterDefects( defects, contour)
-            
-            # Draw filtered convexity defects
-            for defect in filtered_defects:
-                start_idx, end_idx, far_idx, depth = defect
-                start = tuple(contour[start_idx][0])
-                end = tuple(contour[end_idx][0])
-                far = tuple(contour[far_idx][0])
-                cv2.line(drawing, start, end, (255, 0, 0), 1)  # Blue line for defect
-                cv2.circle(drawing, far, 5, (0, 255, 255), -1)  # Yellow circle for defect point
-            
-            palm_center = get_palm_center(contour)
-            cv2.circle(drawing, palmCenter, 5, (0, 0, 255), -1)
-            direction = detect_pointing_direction(frame, contour)       
-            solidity = calcSolidity(contour)
-            
-            if is_rock_on(contour,drawing,palm_center[0],palm_center[1], count_defects)==True and direction!="oneFingerLeft" and direction!="oneFingerRight" and solidity<=0.6:
-                gesture = "rockOn"
-            elif count_defects == 0:
-                if solidity > 0.6:  # Fist: High solidity (compact shape)
-                    gesture = "fist"
-                else:  # hand with one finger pointing
-                    gesture = "oneFinger"
-                    # check direction
-                    direction = detect_pointing_direction(frame, contour)
-                    cv2.putText(frame, f"Direction: {direction}", (10, 100),
-                                        cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-            elif count_defects == 1:
-                gesture = "twoFinger"
-            elif count_defects == 2:
-                gesture = "threeFinger"
-            elif count_defects == 3:
-                gesture = "fourFinger"
-            elif count_defects == 4:
-                gesture = "fiveFinger"
-            else:
-                gesture = "UNKNOWN"
+                # Debug overlays are drawn separately, the classification itself draws nothing
+                if debug:
+                    cv2.circle(full_frame_segmented, palmCenterFull, 5, (0, 0, 255), -1)
+                    cv2.drawContours(drawing2, [contour + np.array([x, y], np.int32)], -1, (0, 255, 0), 1)
+                    draw_gesture_overlay(frame, drawing, features)
+                    if gesture == "oneFinger":
+                        cv2.putText(frame, f"Direction: {direction}", (10, 100),
+                                            cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+                    timer.mark("overlay")
             
-            motion_detected = motion_track_points()
-            if motion_detected != None:
-                motion_last_detected = motion_detected
+                motion_detected = motion_track_points()
+                if motion_detected != None:
+                    motion_last_detected = motion_detected
+                timer.mark("motion")
             
-            # perform_action(gesture,gesture_mappings,direction_mappings,motion_mappings,direction,motion_detected)
+                # The decision for this frame is made, measure how long it took since capture
+                latency_ms = latency.record(packet.timestamp)
             
-            cv2.putText(frame, f"Gesture: {gesture}", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            cv2.putText(frame, f"Detected Motion: {motion_detected}", (10, 150), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 0), 2)
-            cv2.putText(frame, f"Last Detected Motion: {motion_last_detected}", (10, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
+                cv2.putText(frame, f"Gesture: {gesture}", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+                cv2.putText(frame, f"Detected Motion: {motion_detected}", (10, 150), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 0), 2)
+                cv2.putText(frame, f"Last Detected Motion: {motion_last_detected}", (10, 200), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
+                cv2.putText(frame, f"Latency: {latency_ms:.0f} ms", (10, 250), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
 
         except Exception as e:
             print(f"Error processing frame: {e}")
             pass
+        # the frames without a hand vote too, a held gesture is left once they win
+        gesture_events = stabilizer.update(gesture, direction, packet.timestamp)
+        if enable_actions:
+            ## motion_detected stays "UNKNOWN" when the frame failed before the motion was tracked
+            action = action_table.perform_events(gesture_events, motion_detected if motion_detected != "UNKNOWN" else None)
+            timer.mark("action")
+        stable = stabilizer.status(packet.timestamp)
+        if stable["stable_gesture"] != "UNKNOWN":
+            cv2.putText(frame, f"Held: {stable['stable_gesture']} {stable['dwell_s']:.1f} s", (10, 300), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        hand_states = None
+        if hands is not None:
+            try:
+                for track in hands.recognize_secondary((frame.shape[1], frame.shape[0]), packet.timestamp):
+                    if enable_actions:
+                        action = secondary_action_table.perform_events(track.events, track.motion_detected) or action
+                timer.mark("hands")
+            except Exception as e:
+                print(f"Error processing the other hands: {e}")
+            hand_states = hands.status(packet.timestamp, dict(stable, gesture=gesture, direction=direction, motion_detected=motion_detected or "UNKNOWN"))
+            for track in hands.tracks:
+                x, y, w, h = track.box
+                color = (0, 255, 0) if track is hands.primary else (0, 165, 255)
+                label = stable["stable_gesture"] if track is hands.primary else track.stabilizer.status(packet.timestamp)["stable_gesture"]
+                cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+                cv2.putText(frame, f"#{track.id} {label}", (x, max(20, y - 8)), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+        # the result of this frame for the server (engineFunc.RecognitionState), UNKNOWN when it failed
+        if state is not None:
+            state.update(gesture, direction, motion_detected, latency_ms, packet.seq, timer.timings(), action, packet.timestamp,
+                         stable, gesture_events, hand_states)
+        # the annotated frame goes to the /video_feed clients, encoded on the broadcaster thread
+        if broadcaster is not None:
+            broadcaster.publish(frame)
         # debug mode shows different types for frames
         if (debug == True):
             # display the frames
@@ -196,10 +396,29 @@ def gesture_recognition_loop(gesture_mappings,direction_mappings,motion_mappings
             cv2.imshow("Frame", frame)
         
         # motion_handle_roi_buffer_reset()
+        if frames_processed % LATENCY_REPORT_INTERVAL == 0:
+            stats = latency.summary()
+            print(f"Latency (capture to decision): mean {stats['mean_ms']:.1f} ms, p95 {stats['p95_ms']:.1f} ms, max {stats['max_ms']:.1f} ms. Frames captured: {source.frames_captured}, dropped: {source.frames_dropped}")
+            if tracker is not None:
+                print(f"RoiTracker: keyframes {tracker.keyframes}, full frame searches {tracker.full_searches}, tracked frames {tracker.tracked_frames}, coasted frames {tracker.coasted_frames}, losses {tracker.losses}")
+            print(f"GestureStabilizer: gestures entered {stabilizer.entered}, exited {stabilizer.exited}")
+            print(f"MotionRecognizer: trajectory restarts after a jump {motion_jumps()}")
+            if hands is not None:
+                print(f"HandTracker: {len(hands.tracks)} hands tracked, {hands.tracks_started} tracks started, {hands.tracks_lost} lost, dominant hand changed {hands.primary_changes} times")
+            if gate is not None:
+                print(f"MotionGate: frames processed {gate.frames_processed}, skipped {gate.frames_skipped}")
+            if skin_model is not None:
+                print(f"AdaptiveSkinModel: {skin_model.updates} updates, active: {skin_model.active}")
+                skin_model.save()
       
 
-    cap.release()
-    cv2.destroyAllWindows()
+    if source is not None:
+        source.stop()
+    if skin_model is not None:
+        skin_model.save()
+        set_adaptive_model(None)
+    if debug:
+        cv2.destroyAllWindows()
 
 
 # gesture_recognition_loop(debug=True,gesture_mappings={
@@ -0,0 +1,158 @@
+import time
+
+import cv2
+import numpy as np
+
+from morphFunc import scaled_kernel_size
+
+
+class MotionGate:
+    """
+    Cheap presence check run before the segmenter, so an empty scene is not processed.
+
+    Every frame is shrunk to a thumbnail and compared with the previous one. When nothing
+    changed and no hand was seen for idle_after seconds the gate turns idle: frames still
+    arrive and are checked at the camera rate, only the pipeline is skipped (and the preview
+    only refreshed idle_fps times per second). The first thumbnail that differs wakes the
+    gate up and that same frame is processed.
+
+    Args:
+        idle_after: Seconds without motion or hand before going idle.
+        idle_fps: Frames per second of the preview while idle.
+        size: (width, height) of the thumbnails that are compared.
+        pixel_threshold: Grey level difference for a thumbnail pixel to count as changed.
+        min_changed: Fraction of changed thumbnail pixels that counts as motion.
+    """
+
+    def __init__(self, idle_after=3.0, idle_fps=5, size=(80, 60), pixel_threshold=15, min_changed=0.005):
+        self.idle_after = idle_after
+        self.idle_fps = idle_fps
+        self.size = size
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+
+        self.idle = False
+        self.frames_processed = 0
+        self.frames_skipped = 0
+        self._previous = None
+        self._last_activity = time.monotonic()
+        self._last_preview = 0.0
+
+    def check(self, frame):
+        """
+        Args:
+            frame: BGR frame straight from the camera.
+
+        Returns:
+            bool: True if the frame should be processed, False while idle.
+        """
+        gray = cv2.cvtColor(cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        now = time.monotonic()
+        if self._previous is not None:
+            changed = np.count_nonzero(cv2.absdiff(gray, self._previous) > self.pixel_threshold)
+            if changed >= self.min_changed * gray.size:
+                self._last_activity = now
+        self._previous = gray
+
+        idle = now - self._last_activity > self.idle_after
+        if idle != self.idle:
+            print("MotionGate: scene is static, going idle" if idle else "MotionGate: activity, waking up")
+            self.idle = idle
+        if idle:
+            self.frames_skipped += 1
+            return False
+        self.frames_processed += 1
+        return True
+
+    def report_hand(self, found):
+        """A hand held still is activity too, the loop reports whether the last frame had one."""
+        if found:
+            self._last_activity = time.monotonic()
+
+    def preview_due(self):
+        """Whether a skipped frame should refresh the preview, at most idle_fps times per second."""
+        now = time.monotonic()
+        if now - self._last_preview < 1.0 / self.idle_fps:
+            return False
+        self._last_preview = now
+        return True
+
+
+class BackgroundModel:
+    """
+    Running average of the scene, used to drop static regions from the skin mask.
+
+    Faces, skin coloured furniture... that do not move end up in the background, so they
+    never become candidate contours. The area of the hand box is not learned while a hand is
+    tracked, a hand held still stays foreground.
+
+    Args:
+        learning_rate: Weight of a new frame in the running average.
+        threshold: Grey level difference with the background that counts as foreground.
+        warmup: Frames averaged into the background before the model is used.
+        dilation: Size of the ellipse the foreground is grown by (at full resolution), so the
+                  flat inside and the border of a moving hand are kept.
+    """
+
+    def __init__(self, learning_rate=0.02, threshold=20, warmup=15, dilation=15):
+        self.learning_rate = learning_rate
+        self.threshold = threshold
+        self.warmup = warmup
+        self.dilation = dilation
+
+        self.frames = 0
+        # mask returned by the last foreground() call, None while warming up
+        self.last_foreground = None
+        self._background = None
+        self._gray = None
+        self._learn_mask = None
+        self._kernels = {}
+
+    def reset(self):
+        self.frames = 0
+        self._background = None
+
+    def foreground(self, frame, scale=1.0):
+        """
+        Args:
+            frame: BGR frame, before lighting normalization (it changes the grey levels frame to frame).
+            scale: Processing scale of the frame, the dilation shrinks with it.
+
+        Returns:
+            numpy.ndarray: 0/255 mask of what moved, None while warming up.
+        """
+        self._gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self._background is None or self._background.shape != self._gray.shape:
+            self._background = self._gray.astype(np.float32)
+            self.frames = 0
+        self.frames += 1
+        self.last_foreground = None
+        if self.frames <= self.warmup:
+            return None
+
+        difference = cv2.absdiff(self._gray, cv2.convertScaleAbs(self._background))
+        _, foreground = cv2.threshold(difference, self.threshold, 255, cv2.THRESH_BINARY)
+        kernel = self._kernels.get(scale)
+        if kernel is None:
+            size = scaled_kernel_size(self.dilation, scale)
+            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (size, size))
+            self._kernels[scale] = kernel
+        self.last_foreground = cv2.dilate(foreground, kernel)
+        return self.last_foreground
+
+    def learn(self, hand_box=None, other_boxes=()):
+        """Blends the last frame given to foreground() into the background, except the hand box and other_boxes."""
+        if self._gray is None:
+            return
+        ## the first frames are plainly averaged
+        rate = max(self.learning_rate, 1.0 / self.frames)
+        mask = None
+        boxes = ([hand_box] if hand_box is not None else []) + list(other_boxes)
+        if boxes:
+            if self._learn_mask is None or self._learn_mask.shape != self._gray.shape:
+                self._learn_mask = np.empty(self._gray.shape, np.uint8)
+            mask = self._learn_mask
+            mask[...] = 255
+            for x, y, w, h in boxes:
+                mask[y:y + h, x:x + w] = 0
+        cv2.accumulateWeighted(self._gray, self._background, rate, mask)
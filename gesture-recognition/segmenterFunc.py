@@ -4,8 +4,11 @@ from skimage.color import rgb2gray
 from skimage.filters import gaussian, threshold_otsu
 from skimage.measure import label, regionprops
 import numpy as np
-from math import ceil
-from customAlgos import calcSolidity, detect_pointing_direction, angle_between_points, convexity_defects
+from customAlgos import ContourFeatures, detect_pointing_direction
+from skinFunc import get_skin_classifier, is_refining
+from morphFunc import get_morphology_pipeline
+from lightingFunc import get_clahe_engine, get_lighting_normalization, get_temporal_normalizer
+from trackFunc import AlphaBetaFilter
 
 
 def isolate_hand(capturedFrame):
@@ -40,69 +43,330 @@ def isolate_hand(capturedFrame):
         return np.zeros_like(capturedFrame)
 
 
-def segmenter(capturedFrame, mode='HSV',increase_ratio=0.25):
+class RoiTracker:
+    """
+    Remembers the hand box between frames so segment_hand only has to search around it.
+
+    A full frame search runs on keyframes (every keyframe_interval frames) and once the track
+    is dropped, in between only a window around the previous box and the box predicted for
+    this frame is searched. The box center and size go through a constant velocity filter
+    (trackFunc.AlphaBetaFilter), so the window stretches ahead of a moving hand instead of
+    staying where it was on the last frame, and a frame without a hand does not drop the
+    track: the prediction coasts for max_coast frames, only searching its window.
+
+    Args:
+        keyframe_interval: Number of tracked frames between two full frame searches.
+        search_margin: How much the previous and predicted boxes are grown on each side to get the
+                       search window, as a fraction of their size. It is also the largest distance
+                       (same unit) to either of them that is still considered tracked.
+        max_area_change: The hand is lost when its box area grows or shrinks by more than this factor.
+        alpha: Filter weight of the measured box against the predicted one.
+        beta: Filter weight of the prediction error in the velocity.
+        max_coast: Frames without a hand before the track is dropped.
+    """
+
+    def __init__(self, keyframe_interval=15, search_margin=0.5, max_area_change=2.0, alpha=0.7, beta=0.3, max_coast=5):
+        self.keyframe_interval = keyframe_interval
+        self.search_margin = search_margin
+        self.max_area_change = max_area_change
+        self.box = None
+        self.frames_since_keyframe = 0
+        self.keyframes = 0
+        self.tracked_frames = 0
+        self.coasted_frames = 0
+        self.losses = 0
+        self.full_searches = 0
+        # (center x, center y, width, height) of the hand box, the time unit is the frame
+        self.filter = AlphaBetaFilter(alpha, beta, max_coast)
+        self.frame = 0
+
+    def begin_frame(self):
+        """Moves the prediction to the next frame, called once per frame before searching."""
+        self.frame += 1
+
+    def predicted_box(self):
+        """The (x, y, w, h) box the hand is expected at on the current frame, None without a track."""
+        state = self.filter.predict(self.frame)
+        if state is None:
+            return None
+        cx, cy, w, h = state
+        w, h = max(1.0, w), max(1.0, h)
+        return (int(round(cx - w / 2)), int(round(cy - h / 2)), int(round(w)), int(round(h)))
+
+    def candidate_boxes(self):
+        """The boxes the hand is searched around: the last one found and the predicted one."""
+        predicted = self.predicted_box()
+        if predicted is None:
+            return []
+        ## the prediction overshoots when the hand turns around, the last box still covers that
+        return [box for box in (self.box, predicted) if box is not None]
+
+    def search_window(self, frame_shape):
+        """Returns the (x, y, w, h) window to search, None when a full frame search is due."""
+        boxes = self.candidate_boxes()
+        if not boxes or self.frames_since_keyframe >= self.keyframe_interval:
+            return None
+        rows, cols = frame_shape[:2]
+        x1, y1, x2, y2 = cols, rows, 0, 0
+        for x, y, w, h in boxes:
+            margin_x, margin_y = int(w * self.search_margin), int(h * self.search_margin)
+            x1, y1 = min(x1, max(0, x - margin_x)), min(y1, max(0, y - margin_y))
+            x2, y2 = max(x2, min(cols, x + w + margin_x)), max(y2, min(rows, y + h + margin_y))
+        ## the boxes left the frame
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return (x1, y1, x2 - x1, y2 - y1)
+
+    def is_lost(self, box):
+        """Loss criteria of a box found inside the search window."""
+        if box is None:
+            return True
+        return all(self._moved_away(box, reference) for reference in self.candidate_boxes())
+
+    def _moved_away(self, box, reference):
+        x, y, w, h = box
+        px, py, pw, ph = reference
+        area, previous_area = w * h, pw * ph
+        if area == 0 or previous_area == 0:
+            return True
+        if max(area / previous_area, previous_area / area) > self.max_area_change:
+            return True
+        ## a hand that moved further than the margin may have been cut by the window border
+        dx = abs((x + w / 2) - (px + pw / 2))
+        dy = abs((y + h / 2) - (py + ph / 2))
+        return dx > self.search_margin * pw or dy > self.search_margin * ph
+
+    def update(self, box, keyframe):
+        self.box = box
+        x, y, w, h = box
+        self.filter.update((x + w / 2, y + h / 2, w, h), self.frame)
+        if keyframe:
+            self.keyframes += 1
+            self.frames_since_keyframe = 0
+        else:
+            self.tracked_frames += 1
+            self.frames_since_keyframe += 1
+
+    def coast(self, keyframe=False):
+        """No hand on this frame, returns False once it has been missing for too long and the track is dropped."""
+        ## keyframes stay due on schedule while coasting, a keyframe without a hand starts a new interval
+        self.frames_since_keyframe = 0 if keyframe else self.frames_since_keyframe + 1
+        if self.filter.miss():
+            self.coasted_frames += 1
+            return True
+        self.reset()
+        return False
+
+    def reset(self):
+        self.box = None
+        self.frames_since_keyframe = 0
+        self.filter.reset()
+
+
+def locate_hand(thresh_frame, original_frame, increase_ratio=0.25, tracker=None, scale=1.0):
+    """
+    Finds the hand box, in the tracker search window when possible, on the full frame otherwise.
+
+    Args:
+        thresh_frame: The skin mask of the full frame.
+        original_frame: The preprocessed frame.
+        increase_ratio: How much the found box is grown.
+        tracker: RoiTracker, None to always search the full frame.
+        scale: Scale of the frames compared to the camera resolution (see segment_hand).
+
+    Returns:
+        tuple: (x, y, w, h) of the hand in full frame coordinates, None if there is no hand.
+    """
+    if tracker is None:
+        return segment_hand(thresh_frame, original_frame, increase_ratio, scale=scale)
+
+    tracker.begin_frame()
+    window = tracker.search_window(thresh_frame.shape)
+    if window is not None:
+        hand_segment = segment_hand(thresh_frame, original_frame, increase_ratio, window=window, scale=scale)
+        if not tracker.is_lost(hand_segment):
+            tracker.update(hand_segment, keyframe=False)
+            return hand_segment
+        ## counted only, the loop reports the losses with its periodic RoiTracker stats
+        tracker.losses += 1
+        # coasting, the full frame search waits for the next keyframe or for the track to be dropped
+        tracker.coast()
+        return None
+
+    hand_segment = segment_hand(thresh_frame, original_frame, increase_ratio, scale=scale)
+    tracker.full_searches += 1
+    if hand_segment is None:
+        # the next frames are still searched around where the hand should be
+        tracker.coast(keyframe=True)
+    else:
+        tracker.update(hand_segment, keyframe=True)
+    return hand_segment
+
+
+def segmenter(capturedFrame, mode='HSV',increase_ratio=0.25, tracker=None, processing_scale=1.0, background=None):
+    """
+    Finds the hand in the frame and returns its masks.
+
+    With a processing_scale below 1 the skin mask and the candidate scoring run on a downscaled
+    copy of the frame, only the chosen hand ROI is preprocessed and thresholded at native resolution.
+    With a background model (sceneFunc.BackgroundModel) only skin that moved is searched.
+
+    Returns:
+        tuple: (hand mask of the ROI, ROI, preprocessed frame, hand mask in full frame coordinates,
+               (x, y, w, h) of the ROI in the full frame) when a hand is found, (skin mask of the
+               frame, preprocessed frame) otherwise.
+               At processing_scale < 1 the preprocessed frame is the downscaled one.
+    """
+    if processing_scale < 1.0:
+        return segmenter_multiscale(capturedFrame, mode, increase_ratio, tracker, processing_scale, background)
+
     # preprocess the frame
-    capturedFrame, thresh_frame = preprocess_frame(capturedFrame, mode)
-    # segment the hand
-    hand_segment = segment_hand(thresh_frame, capturedFrame, increase_ratio)
+    capturedFrame, thresh_frame = preprocess_frame(capturedFrame, mode, background=background)
+    # segment the hand, the skin mask and the bounding box are computed only once per frame
+    hand_segment = locate_hand(thresh_frame, capturedFrame, increase_ratio, tracker)
+    if background is not None:
+        background.learn(hand_segment)
     if hand_segment is not None and len(hand_segment) == 4:
-        roi = capturedFrame[hand_segment[1]:hand_segment[1] + hand_segment[3], hand_segment[0]:hand_segment[0] + hand_segment[2]]
-        
-        # Set the bottom rows to 0
-        rows_roi, cols_roi, _ = roi.shape
-        if rows_roi > 0 and int(rows_roi * 0.2) > 0:
-            roi[-int(rows_roi * 0.2):] = 0 
-            
-        isolated_hand = isolate_hand(capturedFrame)
-        hand = skin_thresholding(roi) # the mask of the bounded hand (will be used for gesture recognition)
-        isolated_hand_mask = skin_thresholding(isolated_hand)  # get the mask of the hand (will be used for centroid tracking)  
-        return hand, roi, capturedFrame, isolated_hand_mask
+        x, y, w, h = hand_segment
+        roi = capturedFrame[y:y + h, x:x + w]
+        hand, roi, isolated_hand_mask = extract_hand_masks(roi, hand_segment, capturedFrame.shape)
+        return hand, roi, capturedFrame, isolated_hand_mask, hand_segment
     else:
         return thresh_frame, capturedFrame
 
 
-def segment_hand(thresh_frame, original_frame, increase_ratio=0.25, min_score_threshold=0.2):
+def segmenter_multiscale(capturedFrame, mode, increase_ratio, tracker, processing_scale, background=None):
+    """segmenter() on a pyramid level: detect on the downscaled frame, refine the ROI at full resolution."""
+    rows, cols = capturedFrame.shape[:2]
+    small = cv2.resize(capturedFrame, None, fx=processing_scale, fy=processing_scale, interpolation=cv2.INTER_AREA)
+    small, thresh_frame = preprocess_frame(small, mode, processing_scale, background)
+    hand_segment = locate_hand(thresh_frame, small, increase_ratio, tracker, processing_scale)
+    if background is not None:
+        background.learn(hand_segment)
+    if hand_segment is None:
+        # the caller works in full frame coordinates
+        return cv2.resize(thresh_frame, (cols, rows), interpolation=cv2.INTER_NEAREST), small
+
+    hand_segment = scale_box(hand_segment, 1.0 / processing_scale, capturedFrame.shape)
+    x, y, w, h = hand_segment
+    roi = enhance_frame(capturedFrame[y:y + h, x:x + w], reuse_lighting=True)
+    hand, roi, isolated_hand_mask = extract_hand_masks(roi, hand_segment, capturedFrame.shape)
+    return hand, roi, small, isolated_hand_mask, hand_segment
+
+
+def segmenter_hands(capturedFrame, mode='HSV', increase_ratio=0.25, max_hands=2, processing_scale=1.0, background=None):
+    """
+    segmenter() for up to max_hands hands, every one searched on the full frame (no RoiTracker window).
+
+    Returns:
+        tuple: (hands, preprocessed frame, skin mask of the frame). hands is a list of (box, hand mask
+               of the ROI, ROI, hand mask in full frame coordinates), best scored first. The skin mask
+               is at full resolution, the preprocessed frame is the downscaled one at processing_scale < 1.
+    """
+    rows, cols = capturedFrame.shape[:2]
+    if processing_scale < 1.0:
+        small = cv2.resize(capturedFrame, None, fx=processing_scale, fy=processing_scale, interpolation=cv2.INTER_AREA)
+        preprocessed, thresh_frame = preprocess_frame(small, mode, processing_scale, background)
+    else:
+        preprocessed, thresh_frame = preprocess_frame(capturedFrame, mode, background=background)
+    boxes = segment_hands(thresh_frame, preprocessed, increase_ratio, max_hands, scale=processing_scale)
+    if background is not None:
+        background.learn(None, boxes)
+
+    hands = []
+    for box in boxes:
+        if processing_scale < 1.0:
+            box = scale_box(box, 1.0 / processing_scale, capturedFrame.shape)
+            x, y, w, h = box
+            roi = enhance_frame(capturedFrame[y:y + h, x:x + w], reuse_lighting=True)
+        else:
+            x, y, w, h = box
+            ## the boxes may overlap, extract_hand_masks clears the bottom rows of its ROI in place
+            roi = preprocessed[y:y + h, x:x + w].copy()
+        hands.append((box,) + extract_hand_masks(roi, box, capturedFrame.shape))
+    if processing_scale < 1.0:
+        thresh_frame = cv2.resize(thresh_frame, (cols, rows), interpolation=cv2.INTER_NEAREST)
+    return hands, preprocessed, thresh_frame
+
+
+def scale_box(box, factor, frame_shape):
+    """Scales an (x, y, w, h) box by factor and clips it to a frame of frame_shape."""
+    rows, cols = frame_shape[:2]
+    x, y, w, h = box
+    x, y = min(cols - 1, int(x * factor)), min(rows - 1, int(y * factor))
+    w, h = min(cols - x, int(round(w * factor))), min(rows - y, int(round(h * factor)))
+    return (x, y, w, h)
+
+
+def extract_hand_masks(roi, hand_segment, frame_shape):
+    """
+    Derives the ROI mask and the full frame mask of the hand from a single thresholding pass.
+
+    Args:
+        roi (numpy.ndarray): The preprocessed crop of the hand bounding box, its bottom rows are cleared in place.
+        hand_segment (tuple): (x, y, w, h) bounding box of the hand in the full frame.
+        frame_shape (tuple): Shape of the full frame.
+
+    Returns:
+        tuple: (hand mask of the ROI, ROI, hand mask placed in a full frame of zeros).
+               The ROI mask is used for gesture recognition, the full frame one for centroid tracking.
+    """
+    x, y, w, h = hand_segment
+    
+    # Set the bottom rows to 0
+    rows_roi, cols_roi, _ = roi.shape
+    if rows_roi > 0 and int(rows_roi * 0.2) > 0:
+        roi[-int(rows_roi * 0.2):] = 0 
+        
+    hand = skin_thresholding(roi) # the mask of the bounded hand (will be used for gesture recognition)
+    # the same mask at its location in the full frame (will be used for centroid tracking)
+    isolated_hand_mask = np.zeros(frame_shape[:2], np.uint8)
+    isolated_hand_mask[y:y + h, x:x + w] = hand
+    return hand, roi, isolated_hand_mask
+
+
+def score_hand_candidates(thresh_frame, original_frame, min_score_threshold=0.2, window=None, scale=1.0):
+    """
+    Scores every hand-like contour of the skin mask.
+
+    Returns:
+        tuple: (bounding_boxes, scores_list), (final score, (x, y, w, h), contour) of every candidate
+               above min_score_threshold and the detail of its scores, in contour order.
+    """
+    # scale is the size of thresh_frame compared to the camera frame, the pixel based scores
+    # (defect density, distance to center) are converted back to camera pixels with it
     # Convert to 8-bit integer if needed
-    thresh_frame = thresh_frame.astype(np.uint8)
+    thresh_frame = thresh_frame.astype(np.uint8, copy=False)
 
-    # Step 1: Find contours
-    contours, _ = cv2.findContours(thresh_frame, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    # Step 1: Find contours, only inside the (x, y, w, h) window if one is given
+    # contours are offset back to full frame coordinates so the scoring below is unchanged
+    if window is not None:
+        wx, wy, ww, wh = window
+        contours, _ = cv2.findContours(thresh_frame[wy:wy + wh, wx:wx + ww], cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(wx, wy))
+    else:
+        contours, _ = cv2.findContours(thresh_frame, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     
     if not contours:
-        return None  # No hand detected
+        return [], []  # No hand detected
 
     # Step 2: Filter contours by size and shape
     filtered_contours = []
     frame_area = thresh_frame.shape[0] * thresh_frame.shape[1]
 
     for contour in contours:
-        area = cv2.contourArea(contour)
+        # every feature below is computed once and reused by the scoring step
+        features = ContourFeatures(contour)
+        area = features.area
         if area < 0.01 * frame_area or area > 0.8 * frame_area:
             continue  # Ignore contours that are too small or too large
         
-        # calculate defects
-        hull_indices = cv2.convexHull(contour, returnPoints=False).flatten()
-
-        defects = convexity_defects(contour[:, 0, :], hull_indices)
-        
-        count_defects = 0
-        
-        # Filter defects with approximately 90 degrees
-        filtered_defects = []
-        for defect in defects:
-            start_idx, end_idx, far_idx, depth = defect
-            start = tuple(contour[start_idx][0])
-            end = tuple(contour[end_idx][0])
-            far = tuple(contour[far_idx][0])
-            angle = angle_between_points(start, end, far)
-            if  angle < 90:  # Allow a small margin around 90 degrees
-                count_defects += 1
-                filtered_defects.append(defect)
+        # defects with approximately 90 degrees
+        count_defects = features.count_defects
         
         # calculate solidity and direction
-        solidity = calcSolidity(contour)
-        direction = detect_pointing_direction(original_frame, contour)
-        x, y, w, h = cv2.boundingRect(contour)
+        solidity = features.solidity
+        direction = detect_pointing_direction(features)
+        x, y, w, h = features.bounding_rect
         aspect_ratio = w / h
         
         # Filter out faces and other non-hand shapes (rectangular faces)
@@ -116,48 +380,38 @@ def segment_hand(thresh_frame, original_frame, increase_ratio=0.25, min_score_th
 
         # Check aspect ratio of bounding box
         print(f"ACCEPTED Aspect ratio: {aspect_ratio}, Solidity: {solidity}, Defects: {count_defects}, Direction: {direction}")
-        x, y, w, h = cv2.boundingRect(contour)
-        aspect_ratio = w / h
         if 0.3 < aspect_ratio < 3:  # Acceptable aspect ratio range for a hand
-            filtered_contours.append(contour)
+            filtered_contours.append(features)
 
     if not filtered_contours:
-        return None  # No valid hand-like contour found
+        return [], []  # No valid hand-like contour found
 
     # Step 3: Score bounding boxes
     bounding_boxes = []
     scores_list = []
-    for contour in filtered_contours:
-        x, y, w, h = cv2.boundingRect(contour)
+    for features in filtered_contours:
+        contour = features.contour
+        x, y, w, h = features.bounding_rect
+        aspect_ratio = w / h
         cx, cy = x + w // 2, y + h // 2  # Center of the bounding box
 
         # Calculate solidity
-        hull = cv2.convexHull(contour)
-        hull_area = cv2.contourArea(hull)
-        if hull_area > 0:
-            solidity = cv2.contourArea(contour) / hull_area
-        else:
-            solidity = 0
+        solidity = features.hull_solidity
 
         # Calculate circularity
-        perimeter = cv2.arcLength(contour, True)
-        circularity = (4 * np.pi * cv2.contourArea(contour)) / (perimeter ** 2) if perimeter > 0 else 0
-
-        # Calculate convexity defects
-        hull_indices = cv2.convexHull(contour, returnPoints=False)
-        if len(hull_indices) > 3:  # Ensure enough points to compute defects
-            defects = cv2.convexityDefects(contour, hull_indices)
-            if defects is not None:
-                defect_count = defects.shape[0]
-                defect_density = defect_count / perimeter if perimeter > 0 else 0
-            else:
-                defect_density = 0
+        perimeter = features.perimeter / scale
+        circularity = (4 * np.pi * features.area / scale ** 2) / (perimeter ** 2) if perimeter > 0 else 0
+
+        # Calculate convexity defects (same defects as cv2.convexityDefects, already computed in step 2)
+        if len(features.hull_indices) > 3:  # Ensure enough points to compute defects
+            defect_count = len(features.defects)
+            defect_density = defect_count / perimeter if perimeter > 0 else 0
         else:
             defect_density = 0
 
         # Calculate proximity to frame center
         frame_center_x, frame_center_y = original_frame.shape[1] // 2, original_frame.shape[0] // 2
-        distance_to_center = ((cx - frame_center_x) ** 2 + (cy - frame_center_y) ** 2) ** 0.5
+        distance_to_center = ((cx - frame_center_x) ** 2 + (cy - frame_center_y) ** 2) ** 0.5 / scale
 
        # Scoring system
         size_score = w * h / frame_area
@@ -181,6 +435,22 @@ def segment_hand(thresh_frame, original_frame, increase_ratio=0.25, min_score_th
             bounding_boxes.append((final_score, (x, y, w, h), contour))
             scores_list.append([final_score, size_score, aspect_ratio_score, solidity_score, circularity_penalty, defect_score, proximity_score])
 
+    return bounding_boxes, scores_list
+
+
+def grow_box(box, increase_ratio, frame_shape):
+    """Increases the bounding box size by increase_ratio (Default: 25%), clipped to the frame."""
+    x, y, w, h = box
+    x = max(0, x - int(increase_ratio / 2 * w))
+    y = max(0, y - int(increase_ratio / 2 * h))
+    w = min(frame_shape[1] - x, w + int(increase_ratio * w))
+    h = min(frame_shape[0] - y, h + int(increase_ratio * h))
+    return (x, y, w, h)
+
+
+def segment_hand(thresh_frame, original_frame, increase_ratio=0.25, min_score_threshold=0.2, window=None, scale=1.0):
+    bounding_boxes, scores_list = score_hand_candidates(thresh_frame, original_frame, min_score_threshold, window, scale)
+
     # Step 4: Select the best bounding box
     if bounding_boxes:
         _, best_bounding_box, _ = max(bounding_boxes, key=lambda b: b[0])
@@ -188,17 +458,21 @@ def segment_hand(thresh_frame, original_frame, increase_ratio=0.25, min_score_th
         second_best_scores = scores_list[bounding_boxes.index(sorted(bounding_boxes, key=lambda b: b[0])[-1])]
         print(f"BEST SCORES. final_score: {best_scores[0]}, size_score: {best_scores[1]}, aspect_ratio_score: {best_scores[2]}, solidity_score: {best_scores[3]}, circularity_penalty: {best_scores[4]}, defect_score: {best_scores[5]}, proximity_score: {best_scores[6]}")
         print(f"SECOND BEST SCORES. final_score: {second_best_scores[0]}, size_score: {second_best_scores[1]}, aspect_ratio_score: {second_best_scores[2]}, solidity_score: {second_best_scores[3]}, circularity_penalty: {second_best_scores[4]}, defect_score: {second_best_scores[5]}, proximity_score: {second_best_scores[6]}")
-        # Increase the bounding box size, Default: by 25%
-        x, y, w, h = best_bounding_box
-        x = max(0, x - int(increase_ratio / 2 * w))
-        y = max(0, y - int(increase_ratio / 2 * h))
-        w = min(original_frame.shape[1] - x, w + int(increase_ratio * w))
-        h = min(original_frame.shape[0] - y, h + int(increase_ratio * h))
-
-        return (x, y, w, h)
+        return grow_box(best_bounding_box, increase_ratio, original_frame.shape)
     else:
         return None  # No valid hand found above the threshold
-    
+
+
+def segment_hands(thresh_frame, original_frame, increase_ratio=0.25, max_hands=2, min_score_threshold=0.2, scale=1.0):
+    """
+    Like segment_hand, but keeps the max_hands best scored candidates instead of only the best one.
+
+    Returns:
+        list: (x, y, w, h) of the hands, best scored first, empty if there is none.
+    """
+    bounding_boxes, _ = score_hand_candidates(thresh_frame, original_frame, min_score_threshold, scale=scale)
+    bounding_boxes.sort(key=lambda b: b[0], reverse=True)
+    return [grow_box(box, increase_ratio, original_frame.shape) for _, box, _ in bounding_boxes[:max_hands]]
 
 
 def adaptive_thresholding(image):
@@ -212,106 +486,77 @@ def adaptive_thresholding(image):
     return thresh_frame
 
 def skin_thresholding(image, mode='Ycrcb'):
-    if mode.lower() == "hsv":
-        hsv_image = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-        lower_vals = np.array([0, 50, 40], np.uint8)
-        upper_vals = np.array([20, 255, 255], np.uint8)
-        skinMask = cv2.inRange(hsv_image, lower_vals, upper_vals)
-    else:
-        # Constants for finding range of skin
-        min_YCrCb = np.array([0, 133, 77], np.uint8)
-        max_YCrCb = np.array([255, 173, 127], np.uint8)
-        imageYCrCb = cv2.cvtColor(image, cv2.COLOR_BGR2YCR_CB)
-        skinMask = cv2.inRange(imageYCrCb, min_YCrCb, max_YCrCb)
-    # skinMask = cv2.GaussianBlur(skinMask, (5, 5), 0)
-    skinMask = cv2.medianBlur(skinMask, 5)
-    skinMask = cv2.GaussianBlur(skinMask, (5, 5), 0)
-    
-    skinMask = cv2.morphologyEx(skinMask, cv2.MORPH_ERODE, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5)), iterations=2)
-    skinMask = cv2.morphologyEx(skinMask, cv2.MORPH_DILATE, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5)), iterations=3)
-    skinMask = cv2.morphologyEx(skinMask, cv2.MORPH_ERODE, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5)), iterations=2)
+    skinMask = get_skin_classifier(mode).classify(image)
+    # median and gaussian blur, then erosions, dilations and a closing (see morphFunc.MORPHOLOGY_PRESETS)
+    return get_morphology_pipeline("hand").run(skinMask)
 
-    skinMask = cv2.morphologyEx(skinMask, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)), iterations=6)
-    
-    return skinMask
+def enhance_frame(capturedFrame, reuse_lighting=False):
+    """
+    Lighting normalization and denoising done on the frame before looking for skin.
 
-def preprocess_frame(capturedFrame, mode='HSV'):
+    Args:
+        capturedFrame (numpy.ndarray): BGR frame, or a crop of the current frame.
+        reuse_lighting (bool): With the temporal normalization, apply the table of the current
+                               frame instead of letting a crop refresh it.
+    """
     # capturedFrame = white_balance(capturedFrame)
-    #capturedFrame = normalize_lighting_clahe(capturedFrame)
-    capturedFrame = normalize_lighting_histogram(capturedFrame, mode= "YCrCb")
+    lighting = get_lighting_normalization()
+    if lighting == "clahe":
+        capturedFrame = normalize_lighting_clahe(capturedFrame)
+    elif lighting == "temporal":
+        capturedFrame = get_temporal_normalizer().normalize(capturedFrame, update=not reuse_lighting)
+    else:
+        capturedFrame = normalize_lighting_histogram(capturedFrame, mode= "YCrCb")
     capturedFrame = cv2.GaussianBlur(capturedFrame, (3, 3), 0)
     capturedFrame = cv2.medianBlur(capturedFrame, 5)
+    return capturedFrame
+
+def preprocess_frame(capturedFrame, mode='HSV', scale=1.0, background=None):
+    # what moved, compared before the lighting normalization changes the grey levels
+    foreground = background.foreground(capturedFrame, scale) if background is not None else None
+    capturedFrame = enhance_frame(capturedFrame)
     
-    # Constants for finding range of skin color in YCrCb
-    if mode == 'Ycrcb':        
-        min_YCrCb = np.array([0, 133, 77], np.uint8)
-        max_YCrCb = np.array([255, 173, 127], np.uint8)
-        imageYCrCb = cv2.cvtColor(capturedFrame,cv2.COLOR_BGR2YCR_CB)
-        skinMask = np.all(imageYCrCb >= min_YCrCb, axis=-1) & np.all(imageYCrCb <= max_YCrCb, axis=-1)
-        skinMask = skinMask.astype("uint8") * 255  # Convert to 0 and 255
-        # imageYCrCb = cv2.cvtColor(capturedFrame, cv2.COLOR_YCrCb2BGR)
-    else:   
-        # define the upper and lower boundaries of the HSV pixel intensities to be considered 'skin'
-        imageHSV = cv2.cvtColor(capturedFrame, cv2.COLOR_BGR2HSV)
-        lower = np.array([0, 50, 40], dtype="uint8")
-        upper = np.array([20, 255, 255], dtype="uint8")
-        skinMask = np.all(imageHSV >= lower, axis=-1) & np.all(imageHSV <= upper, axis=-1)
-        skinMask = skinMask.astype("uint8") * 255  # Convert to 0 and 255
-        # imageHSV = cv2.cvtColor(capturedFrame, cv2.COLOR_HSV2BGR)
-        
-    
+    # skin pixels of the colour mode, looked up in a precomputed table instead of converting the frame
+    # narrowed down to the colours of the user's hand when an adaptive skin model is trained
+    skinMask = get_skin_classifier(mode).classify(capturedFrame, refine=True)
+    # the narrower mask breaks up into specks, opened away so they are not scored as candidates
+    if is_refining():
+        skinMask = get_morphology_pipeline("refined", scale).run(skinMask)
+    # static skin coloured regions (faces, furniture) are part of the background
+    if foreground is not None:
+        cv2.bitwise_and(skinMask, foreground, dst=skinMask)
     
-    # apply a series of erosions and dilations to the mask
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (11, 11))
-    # skinMask = cv2.dilate(skinMask, kernel, iterations=5)
-    # skinMask = cv2.erode(skinMask, kernel, iterations=2)
-    skinMask = cv2.morphologyEx(skinMask, cv2.MORPH_CLOSE, kernel, iterations=4)
-
-    # blur the mask to help remove noise
-    skinMask = cv2.GaussianBlur(skinMask, (5, 5), 0)
+    # apply a closing to the mask and blur it to help remove noise
+    # the kernels are sized for full resolution, they shrink with downscaled frames
+    skinMask = get_morphology_pipeline("frame", scale).run(skinMask)
     # capturedFrame = cv2.bitwise_and(capturedFrame, capturedFrame, mask=skinMask)
     return capturedFrame, skinMask
 
 def normalize_lighting_clahe(image):
-    # Convert to LAB color space
-    lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
+    # Convert to YCrCb color space, the LAB round trip costs ~10 ms per frame against ~1 ms
+    ycrcb = cv2.cvtColor(image, cv2.COLOR_BGR2YCrCb)
 
-    # Apply CLAHE to the L channel
+    # Apply CLAHE to the Y channel
     #clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    #lab[:, :, 0] = clahe.apply(lab[:, :, 0])
-    lab[:, :, 0] = manual_clahe(lab[:, :, 0], tileGridSize=8, clipLimit=2.0)
+    #ycrcb[:, :, 0] = clahe.apply(ycrcb[:, :, 0])
+    ycrcb[:, :, 0] = manual_clahe(ycrcb[:, :, 0], tileGridSize=8, clipLimit=2.0)
     # Convert back to BGR
-    normalized_image = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+    normalized_image = cv2.cvtColor(ycrcb, cv2.COLOR_YCrCb2BGR)
     return normalized_image
 
 def manual_clahe(channel, tileGridSize=4, clipLimit=2.0):
+    """
+    CLAHE of a single channel, tiles are blended bilinearly (see lightingFunc.ClaheEngine).
+
+    Args:
+        channel (numpy.ndarray): uint8 image.
+        tileGridSize (int): Number of tiles along each axis.
+        clipLimit (float): Histogram clip limit, relative to the mean bin count of a tile.
 
-    height, width = channel.shape
-    tileHeight = ceil(height / tileGridSize)
-    tileWidth = ceil(width / tileGridSize)
-    output = np.zeros_like(channel, dtype=np.uint8)
-
-    for ty in range(tileGridSize):
-        for tx in range(tileGridSize):
-            y1, y2 = ty * tileHeight, min((ty + 1) * tileHeight, height)
-            x1, x2 = tx * tileWidth, min((tx + 1) * tileWidth, width)
-            subregion = channel[y1:y2, x1:x2]
-            hist, _ = np.histogram(subregion, bins=256, range=(0, 256))
-
-            limit = int(clipLimit * (subregion.size / 256.0))
-            excess = np.maximum(hist - limit, 0).sum()
-            hist = np.minimum(hist, limit)
-            spread = excess // 256
-            hist += spread
-            remainder = excess % 256
-            hist[:remainder] += 1
-
-            cdf = np.cumsum(hist).astype(np.float32)
-            cdf = (cdf / cdf[-1]) * 255
-            eq = np.interp(subregion.flatten(), np.arange(256), cdf).reshape(subregion.shape).astype(np.uint8)
-            output[y1:y2, x1:x2] = eq
-
-    return output
+    Returns:
+        numpy.ndarray: The equalized channel.
+    """
+    return get_clahe_engine(tileGridSize, clipLimit).apply(channel)
 
 def normalize_lighting_histogram(image, mode='YCrCb'):
     if mode == 'YCrCb':
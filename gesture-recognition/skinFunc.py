@@ -0,0 +1,345 @@
+import hashlib
+import json
+import os
+
+import cv2
+import numpy as np
+
+# Skin colour bounds of each colour mode, (lower, upper) in the channel order of that colour space
+DEFAULT_SKIN_BOUNDS = {
+    "HSV": ([0, 50, 40], [20, 255, 255]),
+    "YCrCb": ([0, 133, 77], [255, 173, 127]),
+}
+
+# Lookup tables are cached here, keyed by a hash of their configuration
+SKIN_LUT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")
+# Bump when the way tables are built changes so stale cache files are not picked up
+SKIN_LUT_VERSION = 1
+# The learned skin colours of the user, kept between sessions
+SKIN_MODEL_FILE = os.path.join(SKIN_LUT_CACHE_DIR, "skin_model.npz")
+
+skin_bounds = {mode: bounds for mode, bounds in DEFAULT_SKIN_BOUNDS.items()}
+# The classifier of each mode for its current bounds, a table of replaced bounds is dropped (16 MiB each)
+_classifiers = {}
+# AdaptiveSkinModel narrowing down every classifier, None to only use the bounds
+_adaptive_model = None
+
+
+def normalize_mode(mode):
+    """Maps the colour mode names used around the code base ('HSV', 'Ycrcb', 'YCrCb'...) to a DEFAULT_SKIN_BOUNDS key."""
+    return "YCrCb" if str(mode).lower() == "ycrcb" else "HSV"
+
+
+def set_skin_bounds(bounds):
+    """
+    Replaces the skin colour bounds, classifiers of the changed modes are rebuilt on next use.
+
+    Args:
+        bounds: {mode: [lower, upper]}, modes that are not given keep their bounds.
+    """
+    for mode, (lower, upper) in (bounds or {}).items():
+        mode = normalize_mode(mode)
+        skin_bounds[mode] = (list(lower), list(upper))
+
+
+def set_adaptive_model(model):
+    """Makes SkinClassifier.classify(refine=True) intersect the bounds with the colours learned by model (None to disable)."""
+    global _adaptive_model
+    _adaptive_model = model
+
+
+def is_refining():
+    """Whether SkinClassifier.classify(refine=True) currently narrows the bounds down with a trained adaptive model."""
+    return _adaptive_model is not None and _adaptive_model.active
+
+
+def get_skin_classifier(mode):
+    """Returns the SkinClassifier of the mode for the current bounds, building or loading its table if needed."""
+    mode = normalize_mode(mode)
+    lower, upper = skin_bounds[mode]
+    classifier = _classifiers.get(mode)
+    ## the bounds changed since the table was built, going back to older bounds loads it from the disk cache
+    if classifier is None or (classifier.lower.tolist(), classifier.upper.tolist()) != (list(lower), list(upper)):
+        classifier = SkinClassifier(mode, lower, upper)
+        _classifiers[mode] = classifier
+    return classifier
+
+
+class SkinClassifier:
+    """
+    Classifies BGR pixels as skin with a precomputed lookup table over every 24 bit colour.
+
+    The table answers "is this BGR colour inside the bounds once converted to the colour mode",
+    so a frame is classified with one gather and no colour conversion. The full table is only
+    16 MiB, so colours are not quantized and the mask is identical to cvtColor + inRange.
+
+    Args:
+        mode: 'HSV' or 'YCrCb'.
+        lower: Lower bound of each channel in the colour mode.
+        upper: Upper bound of each channel in the colour mode.
+        cache_dir: Where tables are cached between runs, None to disable the cache.
+    """
+
+    def __init__(self, mode="HSV", lower=None, upper=None, cache_dir=SKIN_LUT_CACHE_DIR):
+        self.mode = normalize_mode(mode)
+        default_lower, default_upper = DEFAULT_SKIN_BOUNDS[self.mode]
+        self.lower = np.array(default_lower if lower is None else lower, np.uint8)
+        self.upper = np.array(default_upper if upper is None else upper, np.uint8)
+        self.cache_dir = cache_dir
+        self.lut = self._load_or_build()
+
+        # (bgra, index) buffers of each frame shape seen, reused between frames
+        self._buffers = {}
+        # bounds table intersected with the adaptive model table, and the model version it was made from
+        self._refined_lut = None
+        self._refined_version = None
+
+    @property
+    def config_hash(self):
+        config = {"mode": self.mode, "lower": self.lower.tolist(), "upper": self.upper.tolist(), "version": SKIN_LUT_VERSION}
+        return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+    def _load_or_build(self):
+        path = None
+        if self.cache_dir is not None:
+            path = os.path.join(self.cache_dir, f"skin_lut_{self.mode}_{self.config_hash}.npy")
+            try:
+                ## stored as bits to keep the file at 2 MiB
+                return np.unpackbits(np.load(path)).astype(np.uint8) * 255
+            except (OSError, ValueError):
+                pass
+
+        lut = build_skin_lut(self.mode, self.lower, self.upper)
+        if path is not None:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                np.save(path, np.packbits(lut > 0))
+            except OSError as e:
+                print(f"SkinClassifier: could not cache the lookup table: {e}")
+        return lut
+
+    def current_lut(self, refine=False):
+        """The bounds table, narrowed down by the adaptive model when refine is set and a trained model is set."""
+        if not refine or not is_refining():
+            return self.lut
+        model = _adaptive_model
+        if self._refined_version != model.version:
+            if self._refined_lut is None:
+                self._refined_lut = np.empty_like(self.lut)
+            model.refine(self.lut, out=self._refined_lut)
+            self._refined_version = model.version
+        return self._refined_lut
+
+    def classify(self, frame, out=None, refine=False):
+        """
+        Args:
+            frame: BGR uint8 image.
+            out: Optional uint8 array of the frame height and width to write the mask to.
+            refine: Only keep the skin colours learned by the adaptive model, if one is set.
+
+        Returns:
+            numpy.ndarray: 0/255 skin mask.
+        """
+        shape = frame.shape[:2]
+        buffers = self._buffers.get(shape)
+        if buffers is None:
+            ## ROI shapes change every frame, only keep the buffers of a few recent shapes
+            if len(self._buffers) >= 4:
+                self._buffers.clear()
+            buffers = (np.empty(shape + (4,), np.uint8), np.empty(shape, np.uint32))
+            self._buffers[shape] = buffers
+        bgra, index = buffers
+        if out is None:
+            out = np.empty(shape, np.uint8)
+
+        ## B, G and R packed in one little endian uint32 per pixel give the table index directly
+        cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA, dst=bgra)
+        np.bitwise_and(bgra.view(np.uint32)[..., 0], 0xFFFFFF, out=index)
+        np.take(self.current_lut(refine), index, out=out)
+        return out
+
+
+def build_skin_lut(mode, lower, upper):
+    """
+    Classifies every 24 bit BGR colour once.
+
+    Returns:
+        numpy.ndarray: uint8 table of 2**24 entries (255 for skin), indexed by b | g << 8 | r << 16.
+    """
+    colours = np.arange(1 << 24, dtype=np.uint32)
+    image = np.empty((4096, 4096, 3), np.uint8)
+    image[..., 0] = (colours & 0xFF).reshape(4096, 4096)
+    image[..., 1] = ((colours >> 8) & 0xFF).reshape(4096, 4096)
+    image[..., 2] = (colours >> 16).reshape(4096, 4096)
+    conversion = cv2.COLOR_BGR2HSV if mode == "HSV" else cv2.COLOR_BGR2YCR_CB
+    converted = cv2.cvtColor(image, conversion)
+    return cv2.inRange(converted, np.asarray(lower, np.uint8), np.asarray(upper, np.uint8)).ravel()
+
+
+class AdaptiveSkinModel:
+    """
+    Skin colours of the current user, learned online from confident hand detections.
+
+    Colour histograms of the hand and of the rest of the frame are accumulated with exponential
+    decay. The colours the hand is actually made of (and that are not more common in the rest
+    of the frame) form a table the frame level skin mask is intersected with, so faces, desks...
+    that only match the generic bounds drop out of the candidates.
+
+    Args:
+        decay: Weight of the newest detection in the histograms.
+        coverage: Fraction of the skin histogram mass kept as skin colours, the rarest colours are dropped.
+        min_updates: Number of detections to learn from before the model is used.
+        max_misses: Consecutive frames without a hand after which the model is suspended, so a
+                    badly trained model can not prevent the hand from being found again.
+        rebuild_interval: Number of updates between two rebuilds of the skin colour bins.
+        path: Where the histograms are saved between sessions, None to not persist them.
+    """
+
+    BITS = 4  # bits per channel of the histograms
+
+    def __init__(self, decay=0.05, coverage=0.95, min_updates=30, max_misses=60, rebuild_interval=15, path=SKIN_MODEL_FILE):
+        self.decay = decay
+        self.coverage = coverage
+        self.min_updates = min_updates
+        self.max_misses = max_misses
+        self.rebuild_interval = rebuild_interval
+        self.path = path
+
+        bins = 1 << self.BITS
+        self.skin_hist = np.zeros((bins, bins, bins), np.float32)
+        self.background_hist = np.zeros((bins, bins, bins), np.float32)
+        self.updates = 0
+        self.misses = 0
+        self.version = 0
+        # (r, g, b) 0/255 table of the skin colour bins, None until the first rebuild
+        self.bins = None
+        self._erode_kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (7, 7))
+
+    @property
+    def active(self):
+        return self.bins is not None and self.updates >= self.min_updates and self.misses < self.max_misses
+
+    def _histogram(self, pixels):
+        """Normalized (r, g, b) histogram of an (N, 3) array of BGR pixels."""
+        q = (pixels >> (8 - self.BITS)).astype(np.intp)
+        bins = 1 << self.BITS
+        flat = (q[:, 2] << (2 * self.BITS)) | (q[:, 1] << self.BITS) | q[:, 0]
+        hist = np.bincount(flat, minlength=bins ** 3).astype(np.float32)
+        return hist.reshape(bins, bins, bins) / max(1, len(pixels))
+
+    def update(self, frame, hand_mask):
+        """
+        Learns from a confident detection.
+
+        Args:
+            frame: The preprocessed BGR frame the skin mask was computed from.
+            hand_mask: 0/255 mask of the hand in full frame coordinates, resized to the frame if needed.
+        """
+        if hand_mask.shape != frame.shape[:2]:
+            hand_mask = cv2.resize(hand_mask, (frame.shape[1], frame.shape[0]), interpolation=cv2.INTER_NEAREST)
+        ## every other pixel is plenty for a colour histogram
+        frame, hand_mask = frame[::2, ::2], hand_mask[::2, ::2]
+        ## only trust the inside of the hand and what is clearly away from it
+        inside = cv2.erode(hand_mask, self._erode_kernel) > 0
+        outside = cv2.dilate(hand_mask, self._erode_kernel) == 0
+        ## cleared (black) rows below the hand are neither skin nor background
+        outside &= cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) > 0
+        skin_pixels = frame[inside]
+        if len(skin_pixels) < 50:
+            return
+
+        self.skin_hist *= 1 - self.decay
+        self.skin_hist += self.decay * self._histogram(skin_pixels)
+        background_pixels = frame[outside]
+        if len(background_pixels):
+            self.background_hist *= 1 - self.decay
+            self.background_hist += self.decay * self._histogram(background_pixels)
+        self.updates += 1
+        self.misses = 0
+
+        if self.bins is None or self.updates % self.rebuild_interval == 0:
+            self.rebuild()
+
+    def miss(self):
+        """A frame without a hand."""
+        self.misses += 1
+        if self.misses == self.max_misses:
+            print("AdaptiveSkinModel: hand not found for a while, suspending the learned colours")
+
+    def skin_bins(self):
+        """Boolean (r, g, b) histogram of the colours considered skin."""
+        hist = self.skin_hist
+        total = hist.sum()
+        if total <= 0:
+            return np.zeros(hist.shape, bool)
+        ## most frequent colours first, keep them until coverage of the mass is reached
+        order = np.argsort(hist, axis=None)[::-1]
+        cumulative = np.cumsum(hist.ravel()[order])
+        keep = order[: np.searchsorted(cumulative, self.coverage * total) + 1]
+        skin = np.zeros(hist.size, bool)
+        skin[keep] = True
+        skin = skin.reshape(hist.shape)
+        ## colours that are more common around the hand than on it are background
+        skin &= self.skin_hist >= self.background_hist
+        ## tolerate one quantization step of lighting change in every direction
+        grown = skin.copy()
+        grown[1:] |= skin[:-1]
+        grown[:-1] |= skin[1:]
+        grown[:, 1:] |= skin[:, :-1]
+        grown[:, :-1] |= skin[:, 1:]
+        grown[:, :, 1:] |= skin[:, :, :-1]
+        grown[:, :, :-1] |= skin[:, :, 1:]
+        return grown
+
+    def rebuild(self):
+        """Updates the skin colour bins, the version only changes (and classifiers refresh their tables) if they did."""
+        bins = self.skin_bins().astype(np.uint8) * 255
+        if self.bins is not None and np.array_equal(bins, self.bins):
+            return
+        self.bins = bins
+        self.version += 1
+
+    def refine(self, lut, out=None):
+        """
+        Intersects a SkinClassifier table with the skin colour bins, in one pass over the table.
+
+        Args:
+            lut: 24 bit table indexed by b | g << 8 | r << 16.
+            out: Optional array of the table shape to write the result to.
+
+        Returns:
+            numpy.ndarray: The table with the colours outside the bins cleared.
+        """
+        bins = 1 << self.BITS
+        step = 1 << (8 - self.BITS)
+        if out is None:
+            out = np.empty_like(lut)
+        ## only the (g, b) plane of each red bin is expanded (1 MiB), it is broadcast over the red values of the bin
+        plane = np.repeat(np.repeat(self.bins, step, 1), step, 2).reshape(bins, 1, 1 << 16)
+        np.bitwise_and(lut.reshape(bins, step, 1 << 16), plane, out=out.reshape(bins, step, 1 << 16))
+        return out
+
+    def save(self):
+        if self.path is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            np.savez_compressed(self.path, skin_hist=self.skin_hist, background_hist=self.background_hist, updates=self.updates)
+        except OSError as e:
+            print(f"AdaptiveSkinModel: could not save the model: {e}")
+
+    def load(self):
+        """Restores the histograms of a previous session, returns whether there was one."""
+        if self.path is None:
+            return False
+        try:
+            with np.load(self.path) as data:
+                if data["skin_hist"].shape != self.skin_hist.shape:
+                    return False
+                self.skin_hist = data["skin_hist"].astype(np.float32)
+                self.background_hist = data["background_hist"].astype(np.float32)
+                self.updates = int(data["updates"])
+        except (OSError, KeyError, ValueError):
+            return False
+        self.rebuild()
+        return True
@@ -0,0 +1,165 @@
+from collections import Counter, deque, namedtuple
+
+# Frames a gesture is voted over, and the votes it needs among them to count as present
+VOTE_WINDOW = 5
+MIN_VOTES = 3
+# Votes a held gesture needs to stay present, fewer than to become present (hysteresis)
+KEEP_VOTES = 2
+# Seconds a gesture must keep winning the vote before it is entered, and losing it before it is left
+ENTER_DWELL = 0.1
+EXIT_DWELL = 0.25
+
+# kind is "enter", "hold" (every frame the gesture stays held) or "exit". dwell is the number of
+# seconds the gesture has been held, for "exit" the total. timestamp is the time of the frame.
+GestureEvent = namedtuple("GestureEvent", ["kind", "gesture", "direction", "dwell", "timestamp"])
+
+
+class GestureStabilizer:
+    """
+    Turns the per frame gesture labels into stable gestures with enter / hold / exit events.
+
+    The label of a frame is decided on its own from the contour, a hand between two finger
+    counts flickers between them. A gesture counts as present when it has min_votes of the
+    last window frames; it is entered once it stayed present for enter_dwell seconds, and
+    left once something else (or nothing) has been present for exit_dwell seconds. Once held
+    it stays present with only keep_votes, until another gesture gets min_votes and outvotes
+    it. A flickering pair never stays ahead long enough to be entered, and a held gesture
+    survives a few bad frames.
+
+    The direction of a oneFinger gesture is part of its label: oneFinger pointing up and
+    pointing left are two gestures.
+
+    Args:
+        window: Number of recent frames the votes are counted over.
+        min_votes: Votes a gesture needs in the window to be present.
+        keep_votes: Votes the held gesture needs to stay present, at most min_votes.
+        enter_dwell: Seconds a gesture must be present before it is entered.
+        exit_dwell: Seconds a held gesture must be absent before it is left.
+    """
+
+    def __init__(self, window=VOTE_WINDOW, min_votes=MIN_VOTES, enter_dwell=ENTER_DWELL, exit_dwell=EXIT_DWELL,
+                 keep_votes=KEEP_VOTES):
+        self.window = window
+        self.min_votes = min_votes
+        self.keep_votes = keep_votes
+        self.enter_dwell = enter_dwell
+        self.exit_dwell = exit_dwell
+        self.entered = 0
+        self.exited = 0
+        self.reset()
+
+    def reset(self):
+        """Forgets the votes and drops the held gesture without an exit event."""
+        self._labels = deque()
+        self._votes = Counter()
+        # label present (None for no gesture) and since when
+        self._candidate = None
+        self._candidate_since = None
+        # held label, when it was entered and since when it is absent
+        self._held = None
+        self._held_since = None
+        self._absent_since = None
+        self._last_label = None
+
+    @staticmethod
+    def label(gesture, direction=None):
+        """The label a frame votes for, None for no gesture."""
+        if gesture is None or gesture == "UNKNOWN":
+            return None
+        return (gesture, direction if gesture == "oneFinger" else None)
+
+    @property
+    def gesture(self):
+        """(gesture, direction) held right now, None when no gesture is held."""
+        return self._held
+
+    def confidence(self):
+        """Share of the window that voted like the last frame, 0 without a gesture on it."""
+        if self._last_label is None or not self._labels:
+            return 0.0
+        return self._votes[self._last_label] / len(self._labels)
+
+    def dwell(self, timestamp):
+        """Seconds the held gesture has been held at timestamp, 0 when none is held."""
+        return timestamp - self._held_since if self._held is not None else 0.0
+
+    def status(self, timestamp):
+        """
+        Returns:
+            dict: stable_gesture and stable_direction ("UNKNOWN" when none is held), confidence and dwell_s at timestamp.
+        """
+        gesture, direction = self._held if self._held is not None else ("UNKNOWN", None)
+        return {
+            "stable_gesture": gesture,
+            "stable_direction": direction or "UNKNOWN",
+            "confidence": self.confidence(),
+            "dwell_s": self.dwell(timestamp),
+        }
+
+    def _present(self):
+        if not self._votes:
+            return None
+        label, votes = self._votes.most_common(1)[0]
+        if label is not None and votes >= self.min_votes and (label == self._held or votes > self._votes[self._held]):
+            return label
+        ## hysteresis, the held gesture holds on with fewer votes until another one clearly wins
+        if self._held is not None and self._votes[self._held] >= min(self.keep_votes, self.min_votes):
+            return self._held
+        return None
+
+    def update(self, gesture, direction, timestamp):
+        """
+        Adds the gesture of a frame.
+
+        Args:
+            gesture: Gesture of the frame, "UNKNOWN" without a hand.
+            direction: Pointing direction, only used for oneFinger.
+            timestamp: Time of the frame in seconds (FramePacket.timestamp).
+
+        Returns:
+            list: GestureEvent of this frame, an exit comes before the enter of the next gesture.
+        """
+        label = self.label(gesture, direction)
+        self._last_label = label
+        ## the votes are kept up to date incrementally, O(1) per frame
+        self._labels.append(label)
+        self._votes[label] += 1
+        ## a loop only pops more than one label after window was made smaller
+        while len(self._labels) > self.window:
+            oldest = self._labels.popleft()
+            self._votes[oldest] -= 1
+            if not self._votes[oldest]:
+                del self._votes[oldest]
+        present = self._present()
+        if present != self._candidate:
+            self._candidate = present
+            self._candidate_since = timestamp
+
+        events = []
+        if self._held is not None:
+            if present == self._held:
+                self._absent_since = None
+                events.append(self._event("hold", timestamp))
+                return events
+            if self._absent_since is None:
+                self._absent_since = timestamp
+            if timestamp - self._absent_since < self.exit_dwell:
+                ## a few bad frames, the gesture is still held
+                events.append(self._event("hold", timestamp))
+                return events
+            events.append(self._event("exit", timestamp))
+            self.exited += 1
+            self._held = None
+            self._absent_since = None
+
+        ## the next gesture may have been present for a while already, it is entered right after the exit
+        if present is not None and timestamp - self._candidate_since >= self.enter_dwell:
+            self._held = present
+            self._held_since = timestamp
+            self.entered += 1
+            events.append(self._event("enter", timestamp))
+        return events
+
+    def _event(self, kind, timestamp):
+        gesture, direction = self._held
+        return GestureEvent(kind, gesture, direction, self.dwell(timestamp), timestamp)
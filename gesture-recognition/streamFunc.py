@@ -0,0 +1,170 @@
+import json
+import threading
+from collections import deque
+
+import cv2
+
+
+class FrameBroadcaster:
+    """
+    Encodes the annotated frames of the recognition loop once and fans them out as MJPEG.
+
+    publish() only drops the frame into a single slot (the newest frame wins), the JPEG
+    encoding happens on the broadcaster's own thread and every client gets the encoded bytes
+    through its own short queue that drops the oldest frame when the client is slow. Neither
+    the encoding nor a slow client can hold up the recognition loop.
+
+    Args:
+        quality: JPEG quality, 0 to 100.
+        max_width: Frames wider than this are downscaled before encoding, None to keep the size.
+        queue_size: Frames kept per client before the oldest is dropped.
+    """
+
+    def __init__(self, quality=80, max_width=640, queue_size=2):
+        self.quality = quality
+        self.max_width = max_width
+        self.queue_size = queue_size
+        self.frames_encoded = 0
+
+        self._frame = None
+        # last encoded chunk, resent to idle clients so a disconnect is noticed (see stream)
+        self._last_chunk = None
+        self._clients = []
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def configure(self, quality=None, max_width=None):
+        """Changes the encoding of the next frames, max_width=0 keeps the camera resolution."""
+        with self._condition:
+            if quality is not None:
+                self.quality = int(quality)
+            if max_width is not None:
+                self.max_width = int(max_width) or None
+
+    def has_clients(self):
+        return bool(self._clients)
+
+    def publish(self, frame):
+        """Hands a frame to the encoder, a no-op without clients. The frame must not be changed afterwards."""
+        if not self._clients:
+            return
+        with self._condition:
+            self._frame = frame
+            self._condition.notify_all()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._encode_loop, name="FrameBroadcaster", daemon=True)
+                self._thread.start()
+
+    def _encode_loop(self):
+        while True:
+            with self._condition:
+                while self._frame is None:
+                    self._condition.wait()
+                frame, self._frame = self._frame, None
+                quality, max_width = self.quality, self.max_width
+
+            if max_width and frame.shape[1] > max_width:
+                height = int(round(frame.shape[0] * max_width / frame.shape[1]))
+                frame = cv2.resize(frame, (max_width, height), interpolation=cv2.INTER_AREA)
+            ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if not ok:
+                continue
+            chunk = b"--frame\r\nContent-Type: image/jpeg\r\n\r\n" + jpeg.tobytes() + b"\r\n"
+            self.frames_encoded += 1
+
+            with self._condition:
+                self._last_chunk = chunk
+                for client in self._clients:
+                    ## deque(maxlen) drops the oldest frame of a client that does not keep up
+                    client.append(chunk)
+                self._condition.notify_all()
+
+    def stream(self, timeout=5.0):
+        """
+        Generator of multipart MJPEG chunks for one client, ends when the client disconnects.
+
+        Args:
+            timeout: Seconds without a new frame (engine stopped or gated) after which the last
+                     frame is sent again, writing to the connection is what tells a client went away.
+        """
+        client = deque(maxlen=self.queue_size)
+        with self._condition:
+            self._clients.append(client)
+        try:
+            while True:
+                with self._condition:
+                    ## wakes up on the frames of the other clients too, only returns for this one
+                    self._condition.wait_for(lambda: client, timeout)
+                    chunk = client.popleft() if client else self._last_chunk
+                ## before the first frame there is nothing to send, the first published frame follows
+                if chunk is not None:
+                    yield chunk
+        finally:
+            with self._condition:
+                self._clients.remove(client)
+
+
+class EventBroadcaster:
+    """
+    Fans out recognition events to every connected client as Server-Sent Events.
+
+    Events are serialized once in publish() and appended to a short queue per client, the
+    oldest events of a client that does not read are dropped. Nothing is serialized while no
+    client is connected.
+
+    Args:
+        queue_size: Events kept per client before the oldest is dropped.
+        keepalive: Seconds without events after which a comment is sent, so dead connections are noticed.
+    """
+
+    def __init__(self, queue_size=32, keepalive=15.0):
+        self.queue_size = queue_size
+        self.keepalive = keepalive
+        self.events_published = 0
+
+        self._clients = []
+        self._condition = threading.Condition()
+
+    def has_clients(self):
+        return bool(self._clients)
+
+    @staticmethod
+    def format(event, data, event_id=None):
+        """One SSE message: the event name, an optional id and the data as JSON."""
+        message = f"event: {event}\n"
+        if event_id is not None:
+            message += f"id: {event_id}\n"
+        return message + f"data: {json.dumps(data)}\n\n"
+
+    def publish(self, event, data):
+        """Sends an event to every client, a no-op without clients."""
+        if not self._clients:
+            return
+        with self._condition:
+            self.events_published += 1
+            message = self.format(event, data, self.events_published)
+            for client in self._clients:
+                client.append(message)
+            self._condition.notify_all()
+
+    def stream(self, initial=None):
+        """
+        Generator of SSE messages for one client, ends when the client disconnects.
+
+        Args:
+            initial: Messages sent before the live events, e.g. the current state.
+        """
+        client = deque(initial or (), maxlen=self.queue_size)
+        with self._condition:
+            self._clients.append(client)
+        try:
+            while True:
+                with self._condition:
+                    ## wakes up on the events of the other clients too, only returns for this one
+                    self._condition.wait_for(lambda: client, self.keepalive)
+                    message = client.popleft() if client else None
+                ## the keepalive also lets the server notice a client that went away
+                yield message if message is not None else ": keepalive\n\n"
+        finally:
+            with self._condition:
+                self._clients.remove(client)
@@ -1,65 +1,363 @@
-import pyautogui
+import threading
 import time
-last_action_time = 0
-action_cooldown = 1.5 
+from collections import deque
 
-def perform_action(gesture, gesture_mappings, direction_mappings, motion_mappings, direction=None, movement=None):
-    global last_action_time
-    current_time = time.time()
-    
+# Seconds before a gesture action can fire again, unless the action has its own cooldown.
+# Gestures are also ignored for this long after a motion, the hand is still moving.
+action_cooldown = 1.5
+# Mapping groups and the kind of action their entries can be bound to
+MAPPING_GROUPS = {
+    "gestureMappings": "gesture",
+    "directionMappings": "gesture",
+    "motionMappings": "motion",
+    # Bound to the other hands in multi hand mode (handsFunc), the dominant hand uses the groups above
+    "secondaryGestureMappings": "gesture",
+    "secondaryDirectionMappings": "gesture",
+    "secondaryMotionMappings": "motion",
+}
+# Gesture, direction and motion groups of each hand role
+HAND_MAPPING_GROUPS = {
+    "primary": ("gestureMappings", "directionMappings", "motionMappings"),
+    "secondary": ("secondaryGestureMappings", "secondaryDirectionMappings", "secondaryMotionMappings"),
+}
+UNMAPPED = "unmapped"
+
+_dispatcher = None
+
+
+class Action:
+    """
+    A key press or a hotkey an entry of the mappings can be bound to.
+
+    Args:
+        name: Name of the action in the mappings.
+        keys: Key pressed, or keys of the hotkey.
+        hotkey: Send keys together as a hotkey instead of pressing keys[0].
+        kind: "gesture" for the gesture and direction mappings, "motion" for the motion mappings.
+        cooldown: Seconds before the action can fire again.
+        coalesce: Merge repeats waiting in the dispatcher queue into one call pressing the key several times.
+        repeat: Fire again every cooldown seconds while the gesture is held (see ActionTable.perform_event).
+    """
+
+    def __init__(self, name, keys, hotkey=False, kind="gesture", cooldown=action_cooldown, coalesce=False, repeat=False):
+        self.name = name
+        self.keys = keys
+        self.hotkey = hotkey
+        self.kind = kind
+        self.cooldown = cooldown
+        self.coalesce = coalesce
+        self.repeat = repeat
+
+    def run(self, backend, count=1):
+        """Sends the keys of the action count times through the backend."""
+        if self.hotkey:
+            for _ in range(count):
+                backend.hotkey(*self.keys)
+        else:
+            backend.press(self.keys[0], presses=count)
+
+    def __repr__(self):
+        return f"Action({self.name})"
+
+
+ACTIONS = {action.name: action for action in (
+    # Gesture actions
+    Action("mute", ("volumemute",)),
+    Action("volume_up", ("volumeup",), cooldown=0.25, coalesce=True, repeat=True),
+    Action("volume_down", ("volumedown",), cooldown=0.25, coalesce=True, repeat=True),
+    Action("play_pause", ("playpause",)),
+    Action("next_track", ("n",)),
+    Action("previous_track", ("p",)),
+    Action("fast_forward", ("ctrl", "right"), hotkey=True, cooldown=0.5, repeat=True),
+    Action("rewind", ("ctrl", "left"), hotkey=True, cooldown=0.5, repeat=True),
+    Action("speed_up", ("=",), cooldown=0.5, repeat=True),
+    Action("speed_down", ("-",), cooldown=0.5, repeat=True),
+    # Motion actions
+    Action("fullscreen", ("f",), kind="motion"),
+    Action("close", ("ctrl", "q"), hotkey=True, kind="motion"),
+    Action("changeAudioDevice", ("shift", "a"), hotkey=True, kind="motion"),
+    Action("showTime", ("t",), kind="motion"),
+)}
+# Names accepted for compatibility with mappings written for the old if/elif chains
+ACTION_ALIASES = {
+    "next": "next_track",
+    "previous": "previous_track",
+}
+
+
+def resolve_action(name):
+    """Returns the Action of a mapped name (aliases included), None for unmapped or unknown names."""
+    return ACTIONS.get(ACTION_ALIASES.get(name, name))
+
+
+def validate_mappings(mappings):
+    """
+    Checks the actions of mappings against the registry.
+
+    Args:
+        mappings: {"gestureMappings": {...}, "directionMappings": {...}, "motionMappings": {...}}, groups may be missing.
+
+    Returns:
+        list: Error messages, empty when every entry is bound to an action of its group or unmapped.
+    """
+    errors = []
+    for group, entries in mappings.items():
+        kind = MAPPING_GROUPS.get(group)
+        if kind is None:
+            errors.append(f"unknown mapping group {group}")
+            continue
+        if not isinstance(entries, dict):
+            errors.append(f"{group} must be an object")
+            continue
+        for entry, name in entries.items():
+            if name == UNMAPPED:
+                continue
+            action = resolve_action(name) if isinstance(name, str) else None
+            if action is None:
+                errors.append(f"{group}.{entry}: unknown action {name}")
+            elif action.kind != kind:
+                errors.append(f"{group}.{entry}: {name} is a {action.kind} action")
+    return errors
+
+
+class ActionTable:
+    """
+    The mappings compiled to direct gesture / direction / motion -> Action lookups.
+
+    Compiled once per mappings change, the loop then does a single dict lookup per frame.
+    Entries that are unmapped or bound to unknown actions are left out (validate_mappings reports them).
+
+    Args:
+        mappings: {"gestureMappings": {...}, "directionMappings": {...}, "motionMappings": {...}}.
+        dispatcher: ActionDispatcher the actions are queued on, the shared one if None.
+        repeat_on_hold: Fire the repeat actions again while their gesture is held (perform_event).
+        repeat_delay: Seconds a gesture must be held before its action starts repeating.
+        hand: "primary" for the regular mapping groups, "secondary" for the ones of the other hands.
+    """
+
+    def __init__(self, mappings, dispatcher=None, repeat_on_hold=True, repeat_delay=0.5, hand="primary"):
+        self.dispatcher = dispatcher
+        self.repeat_on_hold = repeat_on_hold
+        self.repeat_delay = repeat_delay
+        gestures, directions, motions = HAND_MAPPING_GROUPS[hand]
+        self.gestures = self._compile(mappings.get(gestures, {}), "gesture")
+        self.directions = self._compile(mappings.get(directions, {}), "gesture")
+        self.motions = self._compile(mappings.get(motions, {}), "motion")
+
+    @staticmethod
+    def _compile(entries, kind):
+        table = {}
+        for entry, name in (entries or {}).items():
+            action = resolve_action(name)
+            if action is not None and action.kind == kind:
+                table[entry] = action
+        return table
+
+    def perform(self, gesture, direction=None, movement=None):
+        """Queues the action mapped to a motion, or else to the gesture, returns its name if one was queued."""
+        dispatcher = self.dispatcher or get_dispatcher()
 
-    try:
         # Handle motions first if present, as it takes precedence
         if movement:
-            movement_action = motion_mappings.get(movement, "unmapped")
-            print(f"Movement: {movement}")
-            print(f"Movement Action: {movement_action}")
-
-            if movement_action == "fullscreen":
-                pyautogui.press('f')
-            elif movement_action == "close":
-                pyautogui.hotkey('ctrl', 'q')
-            elif movement_action == "changeAudioDevice":
-                pyautogui.hotkey('shift', 'a')
-            elif movement_action == "showTime":
-                pyautogui.press('t')
-
-            last_action_time = current_time
-            return 
-        
-        # cooldown
-        if current_time - last_action_time < action_cooldown:
-            return  
-        
+            action = self.motions.get(movement)
+
+            # gestures are ignored for a moment, the hand is still moving
+            dispatcher.hold(action_cooldown)
+            if action is None:
+                return None
+            ## a motion is a single event, it always fires
+            return action.name if dispatcher.submit(action, cooldown=0) else None
+
         # Handle gestures if there is no motion
-        action = gesture_mappings.get(gesture, "unmapped")
+        action = self._gesture_action(gesture, direction)
+        if action is None:
+            return None
+        # cooldown, per action
+        return action.name if dispatcher.submit(action) else None
+
+    def perform_event(self, event):
+        """
+        Queues the action mapped to the gesture of a stabilizerFunc.GestureEvent, returns its name if one was queued.
+
+        The stabilizer already decided an enter is a new gesture, so its action fires right away
+        without waiting for a cooldown. While the gesture stays held, the actions marked repeat
+        fire again every cooldown seconds once it has been held for repeat_delay.
+        """
+        if event.kind == "enter":
+            cooldown = 0
+        elif event.kind == "hold" and self.repeat_on_hold and event.dwell >= self.repeat_delay:
+            cooldown = None
+        else:
+            return None
+        action = self._gesture_action(event.gesture, event.direction)
+        if action is None or (cooldown is None and not action.repeat):
+            return None
+        ## gestures are still ignored for a moment after a motion
+        dispatcher = self.dispatcher or get_dispatcher()
+        return action.name if dispatcher.submit(action, cooldown=cooldown, respect_hold=True) else None
+
+    def perform_events(self, events, movement=None):
+        """
+        Queues the actions of a frame from its GestureEvent list, a motion takes precedence like in perform().
+
+        Returns:
+            str: Name of the last action queued, None if none was.
+        """
+        if movement:
+            return self.perform(None, None, movement)
+        fired = None
+        for event in events:
+            fired = self.perform_event(event) or fired
+        return fired
+
+    def _gesture_action(self, gesture, direction):
         if direction and gesture == "oneFinger":
-            action = direction_mappings.get(direction, "unmapped")
-            print(f"Direction: {direction}")
-            print(f"Action: {action}")
-
-        if action == "mute":
-            pyautogui.press("volumemute")
-        elif action == "volume_up":
-            pyautogui.press("volumeup")
-        elif action == "volume_down":
-            pyautogui.press("volumedown")
-        elif action == "play_pause":
-            pyautogui.press("playpause")
-        elif action == "next":
-            pyautogui.press('n')
-        elif action == "previous":
-            pyautogui.press('p')
-        elif action == "fast_forward":
-            pyautogui.hotkey('ctrl', 'right')
-        elif action == "rewind":
-            pyautogui.hotkey('ctrl', 'left')
-        elif action == "speed_up":
-            pyautogui.press('=')
-        elif action == "speed_down":
-            pyautogui.press('-')
-
-        last_action_time = current_time
+            return self.directions.get(direction)
+        return self.gestures.get(gesture)
 
+
+class PyAutoGuiBackend:
+    """Sends the key presses with pyautogui, imported when the backend is created."""
+
+    def __init__(self):
+        import pyautogui
+        self._pyautogui = pyautogui
+
+    def press(self, key, presses=1):
+        self._pyautogui.press(key, presses=presses)
+
+    def hotkey(self, *keys):
+        self._pyautogui.hotkey(*keys)
+
+
+class RecordingBackend:
+    """Records the key presses instead of sending them, for tests and dry runs."""
+
+    def __init__(self):
+        self.calls = []
+
+    def press(self, key, presses=1):
+        self.calls.append(("press", key, presses))
+
+    def hotkey(self, *keys):
+        self.calls.append(("hotkey",) + keys)
+
+
+class ActionDispatcher:
+    """
+    Runs the actions on its own thread, so the recognition loop only queues them and moves on.
+
+    pyautogui pauses after every call and the OS takes its time to deliver the keys, on the
+    loop thread that stalled the next frame on every fired action. The queue is bounded, an
+    action that does not fit is dropped; a volume step queued right behind the same step is
+    merged into it and the key is pressed several times in one call.
+
+    Args:
+        backend: Object with press(key, presses) and hotkey(*keys), a PyAutoGuiBackend is
+                 created on the dispatcher thread when None.
+        queue_size: Number of actions waiting to run before new ones are dropped.
+    """
+
+    def __init__(self, backend=None, queue_size=8):
+        self.backend = backend
+        self.queue_size = queue_size
+        self.actions_executed = 0
+        self.actions_coalesced = 0
+        self.actions_dropped = 0
+
+        # [Action, count] entries waiting for the dispatcher thread
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._last_fired = {}
+        self._hold_until = 0.0
+
+    def hold(self, seconds):
+        """Ignores the actions submitted with their default cooldown for the given time."""
+        self._hold_until = max(self._hold_until, time.monotonic() + seconds)
+
+    def submit(self, action, cooldown=None, respect_hold=None):
+        """
+        Queues an action unless it is cooling down.
+
+        Args:
+            action: The Action.
+            cooldown: Seconds since the last time it fired before it can fire again, action.cooldown
+                      when None.
+            respect_hold: Drop the action while hold() is active, by default only when cooldown is None.
+
+        Returns:
+            bool: True if the action was queued.
+        """
+        now = time.monotonic()
+        if respect_hold is None:
+            respect_hold = cooldown is None
+        if respect_hold and now < self._hold_until:
+            return False
+        if cooldown is None:
+            cooldown = action.cooldown
+        if now - self._last_fired.get(action.name, float("-inf")) < cooldown:
+            return False
+
+        with self._condition:
+            if action.coalesce and self._queue and self._queue[-1][0] is action:
+                self._queue[-1][1] += 1
+                self.actions_coalesced += 1
+            elif len(self._queue) >= self.queue_size:
+                self.actions_dropped += 1
+                print(f"ActionDispatcher: queue full, dropped {action.name}")
+                return False
+            else:
+                self._queue.append([action, 1])
+            self._last_fired[action.name] = now
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._dispatch_loop, name="ActionDispatcher", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        return True
+
+    def pending(self):
+        with self._condition:
+            return len(self._queue)
+
+    def _dispatch_loop(self):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                action, count = self._queue.popleft()
+            try:
+                if self.backend is None:
+                    self.backend = PyAutoGuiBackend()
+                action.run(self.backend, count)
+                self.actions_executed += 1
+            except Exception as e:
+                print(f"Error performing action: {e}")
+
+
+def get_dispatcher():
+    """Returns the ActionDispatcher the actions are queued on, created on first use."""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = ActionDispatcher()
+    return _dispatcher
+
+
+def set_action_backend(backend):
+    """Replaces the backend the actions are sent through, e.g. a RecordingBackend in tests."""
+    get_dispatcher().backend = backend
+
+
+def perform_action(gesture, gesture_mappings, direction_mappings, motion_mappings, direction=None, movement=None):
+    """
+    Queues the action mapped to a motion, or else to the gesture, returns its name if one was queued.
+
+    Compiles the mappings on every call, a loop should keep an ActionTable and call its perform().
+    """
+    try:
+        table = ActionTable({"gestureMappings": gesture_mappings, "directionMappings": direction_mappings,
+                             "motionMappings": motion_mappings})
+        return table.perform(gesture, direction, movement)
     except Exception as e:
         print(f"Error performing action: {e}")
+        return None
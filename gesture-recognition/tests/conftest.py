@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the modules of gesture-recognition import each other by their flat names (from customAlgos import ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
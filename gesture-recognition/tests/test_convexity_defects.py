@@ -0,0 +1,67 @@
+import cv2
+import numpy as np
+import pytest
+
+from customAlgos import convexity_defects
+
+
+def hand_contour(rng, shape=(240, 320)):
+    """Outer contour of a random palm with 0 to 5 fingers and roughened edges."""
+    mask = np.zeros(shape, np.uint8)
+    cx, cy = int(rng.integers(100, 220)), int(rng.integers(120, 180))
+    radius = int(rng.integers(25, 40))
+    cv2.ellipse(mask, (cx, cy), (radius, int(radius * 1.2)), 0, 0, 360, 255, -1)
+    fingers = int(rng.integers(0, 6))
+    for angle in np.linspace(-70, 70, 5)[:fingers] + rng.normal(0, 5, fingers):
+        theta = np.deg2rad(angle - 90)
+        length = radius * rng.uniform(1.6, 2.3)
+        cv2.line(mask, (cx, cy), (int(cx + length * np.cos(theta)), int(cy + length * np.sin(theta))), 255, max(4, radius // 4))
+    mask[rng.random(shape) < 0.02] ^= 255
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+    return max(contours, key=cv2.contourArea)
+
+
+def random_polygon(rng, points=40):
+    """A star shaped polygon with random radii, a contour with many deep defects."""
+    while True:
+        angles = np.sort(rng.uniform(0, 2 * np.pi, points))
+        radii = rng.uniform(20, 100, points)
+        polygon = np.stack([200 + radii * np.cos(angles), 200 + radii * np.sin(angles)], axis=1)
+        contour = np.round(polygon).astype(np.int32).reshape(-1, 1, 2)
+        ## rounding can make the polygon self-intersecting, OpenCV rejects those contours
+        try:
+            cv2.convexityDefects(contour, cv2.convexHull(contour, returnPoints=False))
+            return contour
+        except cv2.error:
+            continue
+
+
+def cv2_defects(contour, hull):
+    expected = cv2.convexityDefects(contour, hull)
+    return [] if expected is None else expected.reshape(-1, 4).tolist()
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_hand_contours_match_cv2(seed):
+    rng = np.random.default_rng(seed)
+    for _ in range(10):
+        contour = hand_contour(rng)
+        hull = cv2.convexHull(contour, returnPoints=False)
+        ## OpenCV does not report defects of depth 0, neither do we, the order may differ
+        assert sorted(convexity_defects(contour[:, 0, :], hull.flatten())) == sorted(cv2_defects(contour, hull))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_polygons_match_cv2(seed):
+    rng = np.random.default_rng(1000 + seed)
+    for points in (5, 12, 40, 150):
+        contour = random_polygon(rng, points)
+        ## both hull orientations, convexity_defects walks the contour either way
+        for clockwise in (False, True):
+            hull = cv2.convexHull(contour, clockwise=clockwise, returnPoints=False)
+            assert sorted(convexity_defects(contour[:, 0, :], hull.flatten())) == sorted(cv2_defects(contour, hull))
+
+
+def test_too_few_points_have_no_defects():
+    contour = np.array([[[0, 0]], [[10, 0]], [[0, 10]]], np.int32)
+    assert convexity_defects(contour[:, 0, :], [0, 1, 2]) == []
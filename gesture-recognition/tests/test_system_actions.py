@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+from stabilizerFunc import GestureEvent
+from systemActions import ACTIONS, ActionDispatcher, ActionTable, RecordingBackend, validate_mappings
+
+MAPPINGS = {
+    "gestureMappings": {
+        "fist": "mute",
+        "twoFinger": "next_track",
+        "threeFinger": "previous_track",
+        "fourFinger": "next",
+        "fiveFinger": "previous",
+        "rockOn": "fast_forward",
+        "oneFinger": "unmapped",
+    },
+    "directionMappings": {"oneFingerUp": "volume_up", "oneFingerLeft": "rewind"},
+    "motionMappings": {"LEFT": "fullscreen", "RIGHT": "close"},
+}
+
+
+def wait_for(dispatcher, executed, timeout=2.0):
+    """Waits for the dispatcher thread to run the actions queued so far."""
+    deadline = time.monotonic() + timeout
+    while dispatcher.actions_executed < executed and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return dispatcher.backend.calls
+
+
+def table():
+    dispatcher = ActionDispatcher(RecordingBackend())
+    return ActionTable(MAPPINGS, dispatcher=dispatcher), dispatcher
+
+
+@pytest.mark.parametrize("gesture, direction, expected", [
+    ("fist", None, ("press", "volumemute", 1)),
+    ("twoFinger", None, ("press", "n", 1)),
+    ("threeFinger", None, ("press", "p", 1)),
+    # names of the mappings written for the old if/elif chains
+    ("fourFinger", None, ("press", "n", 1)),
+    ("fiveFinger", None, ("press", "p", 1)),
+    ("rockOn", None, ("hotkey", "ctrl", "right")),
+    ("oneFinger", "oneFingerUp", ("press", "volumeup", 1)),
+    ("oneFinger", "oneFingerLeft", ("hotkey", "ctrl", "left")),
+])
+def test_gesture_dispatches_its_keys(gesture, direction, expected):
+    actions, dispatcher = table()
+    assert actions.perform(gesture, direction) is not None
+    assert wait_for(dispatcher, 1) == [expected]
+
+
+def test_unmapped_and_unknown_gestures_send_nothing():
+    actions, dispatcher = table()
+    assert actions.perform("oneFinger") is None
+    assert actions.perform("UNKNOWN") is None
+    assert actions.perform("oneFinger", "oneFingerDown") is None
+    assert dispatcher.pending() == 0 and dispatcher.backend.calls == []
+
+
+def test_motion_takes_precedence_and_holds_the_gestures():
+    actions, dispatcher = table()
+    assert actions.perform("fist", None, "RIGHT") == "close"
+    ## the hand is still moving, the gesture right after the motion is ignored
+    assert actions.perform("fist") is None
+    assert wait_for(dispatcher, 1) == [("hotkey", "ctrl", "q")]
+
+
+def test_cooldown_drops_repeats():
+    actions, dispatcher = table()
+    assert actions.perform("twoFinger") == "next_track"
+    assert actions.perform("twoFinger") is None
+    assert wait_for(dispatcher, 1) == [("press", "n", 1)]
+
+
+def test_stabilized_enter_fires_and_only_repeat_actions_repeat_on_hold():
+    actions, dispatcher = table()
+    enter = GestureEvent("enter", "twoFinger", None, 0.0, 0.0)
+    hold = GestureEvent("hold", "twoFinger", None, 2.0, 2.0)
+    assert actions.perform_event(enter) == "next_track"
+    assert actions.perform_event(hold) is None
+    assert actions.perform_event(GestureEvent("enter", "oneFinger", "oneFingerUp", 0.0, 0.0)) == "volume_up"
+    assert wait_for(dispatcher, 2) == [("press", "n", 1), ("press", "volumeup", 1)]
+
+
+def test_validate_mappings_reports_unknown_and_misplaced_actions():
+    errors = validate_mappings({
+        "gestureMappings": {"fist": "explode", "twoFinger": "fullscreen"},
+        "motionMappings": {"LEFT": "next_track"},
+    })
+    assert errors == [
+        "gestureMappings.fist: unknown action explode",
+        "gestureMappings.twoFinger: fullscreen is a motion action",
+        "motionMappings.LEFT: next_track is a gesture action",
+    ]
+    assert validate_mappings(MAPPINGS) == []
+
+
+def test_every_registered_action_runs_on_the_backend():
+    backend = RecordingBackend()
+    for action in ACTIONS.values():
+        action.run(backend)
+    assert len(backend.calls) == len(ACTIONS)
@@ -0,0 +1,74 @@
+import numpy as np
+
+
+class AlphaBetaFilter:
+    """
+    Constant velocity alpha-beta filter of a measurement vector (a point, a box...).
+
+    Every update first predicts the state at the measurement time from the last position and
+    velocity, then corrects the position by alpha and the velocity by beta times the residual.
+    A missed measurement does not reset the state: the filter coasts on its velocity for up to
+    max_coast misses, the next prediction simply covers the longer gap.
+
+    Args:
+        alpha: Weight of the residual in the position, 1 follows the measurements exactly.
+        beta: Weight of the residual (per time unit) in the velocity, 0 keeps the velocity at zero.
+        max_coast: Consecutive misses after which the state is dropped.
+    """
+
+    def __init__(self, alpha=0.5, beta=0.1, max_coast=5):
+        self.alpha = alpha
+        self.beta = beta
+        self.max_coast = max_coast
+        self.reset()
+
+    def reset(self):
+        self.position = None
+        self.velocity = None
+        self.timestamp = None
+        self.misses = 0
+
+    @property
+    def active(self):
+        return self.position is not None
+
+    def predict(self, timestamp):
+        """State expected at timestamp, None before the first measurement."""
+        if self.position is None:
+            return None
+        return self.position + self.velocity * (timestamp - self.timestamp)
+
+    def update(self, measurement, timestamp):
+        """
+        Args:
+            measurement: The measured vector.
+            timestamp: Time of the measurement, in any unit (seconds, frame numbers...) as long as it is the same for every call.
+
+        Returns:
+            numpy.ndarray: The filtered vector.
+        """
+        measurement = np.asarray(measurement, np.float64)
+        if self.position is None:
+            self.position = measurement.copy()
+            self.velocity = np.zeros_like(measurement)
+        else:
+            dt = timestamp - self.timestamp
+            predicted = self.position + self.velocity * dt
+            residual = measurement - predicted
+            self.position = predicted + self.alpha * residual
+            ## two measurements at the same time carry no information about the velocity
+            if dt > 0:
+                self.velocity = self.velocity + (self.beta / dt) * residual
+        self.timestamp = timestamp
+        self.misses = 0
+        return self.position
+
+    def miss(self):
+        """Records a missed measurement, returns False once the state was dropped."""
+        if self.position is None:
+            return False
+        self.misses += 1
+        if self.misses > self.max_coast:
+            self.reset()
+            return False
+        return True